@@ -1,6 +1,6 @@
 #admin analytic
 from django.contrib import admin
-from .models import StatistiquesVente
+from .models import StatistiquesVente, VenteHoraire, VenteJournaliere
 
 
 @admin.register(StatistiquesVente)
@@ -18,3 +18,23 @@ class StatistiquesVenteAdmin(admin.ModelAdmin):
     search_fields = ("offre__nom_offre", "offre__evenement__nom")
     ordering = ("-date_derniere_maj",)
     readonly_fields = ("date_derniere_maj",)
+
+
+@admin.register(VenteHoraire)
+class VenteHoraireAdmin(admin.ModelAdmin):
+    list_display = ("offre", "debut", "nombre_ventes", "chiffre_affaires")
+    list_filter = ("debut",)
+    list_select_related = ("offre",)
+    raw_id_fields = ("offre",)
+    date_hierarchy = "debut"
+    readonly_fields = ("offre", "debut", "nombre_ventes", "chiffre_affaires")
+
+
+@admin.register(VenteJournaliere)
+class VenteJournaliereAdmin(admin.ModelAdmin):
+    list_display = ("offre", "jour", "nombre_ventes", "chiffre_affaires")
+    list_filter = ("jour",)
+    list_select_related = ("offre",)
+    raw_id_fields = ("offre",)
+    date_hierarchy = "jour"
+    readonly_fields = ("offre", "jour", "nombre_ventes", "chiffre_affaires")
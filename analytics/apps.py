@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 class AnalyticsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
-    name = "analytics"
\ No newline at end of file
+    name = "analytics"
+
+    def ready(self):
+        from . import checks  # noqa: F401 (check --deploy : cache partagé)
@@ -0,0 +1,26 @@
+# analytics/checks.py
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Caches propres à chaque processus : une invalidation faite par traiter_outbox n'y est jamais vue
+CACHES_LOCAUX = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+    "django.core.cache.backends.filebased.FileBasedCache",
+)
+
+
+@register(Tags.caches, deploy=True)
+def cache_partage(app_configs, **kwargs):
+    """manage.py check --deploy : les statistiques en cache exigent un cache partagé entre processus."""
+    backend = settings.CACHES.get("default", {}).get("BACKEND", CACHES_LOCAUX[0])
+    if backend in CACHES_LOCAUX:
+        return [
+            Error(
+                f"Cache par défaut propre à chaque processus ({backend}).",
+                hint="Définir CACHE_URL (Redis) : les statistiques invalidées par traiter_outbox "
+                "resteraient servies périmées par les processus web.",
+                id="analytics.E001",
+            )
+        ]
+    return []
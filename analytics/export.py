@@ -0,0 +1,209 @@
+# analytics/export.py
+"""
+Export brut des ventes pour l'analyse hors ligne (endpoint export/ et commande exporter_donnees).
+
+- Sources : billets (EBillet), lignes (LigneCommande), paiements (Paiement), éventuellement
+  restreintes à un événement ; colonnes plates (ids, montants, statuts, dates).
+- Lecture par values_list(...).iterator() : curseur côté serveur sur PostgreSQL (lignes
+  jamais toutes en mémoire) ; sur MySQL, qui charge tout résultat en mémoire, lecture par
+  pages d'id croissants. Aucun serializer ni instance de modèle par ligne.
+- Formats : CSV (toujours), Arrow IPC en flux et Parquet si pyarrow est installé ;
+  les octets sont produits au fil de l'eau, par paquets de TAILLE_PAQUET lignes.
+"""
+import csv
+import io
+
+from django.db import connection
+
+from billets.models import EBillet
+from commandes.models import Commande, LigneCommande
+from paiements.models import Paiement
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # dépendance optionnelle
+    pa = pq = None
+
+TAILLE_PAQUET = 10_000
+
+# (colonne exportée, lookup values_list, type)
+COLONNES = {
+    "billets": [
+        ("id", "id", "entier"),
+        ("numero_billet", "numero_billet", "texte"),
+        ("evenement_id", "offre__evenement_id", "entier"),
+        ("offre_id", "offre_id", "entier"),
+        ("commande_id", "commande_id", "entier"),
+        ("utilisateur_id", "utilisateur_id", "entier"),
+        ("prix_paye", "prix_paye", "decimal"),
+        ("statut", "statut", "texte"),
+        ("date_achat", "date_achat", "horodatage"),
+        ("date_utilisation", "date_utilisation", "horodatage"),
+    ],
+    "lignes": [
+        ("id", "id", "entier"),
+        ("commande_id", "commande_id", "entier"),
+        ("evenement_id", "offre__evenement_id", "entier"),
+        ("offre_id", "offre_id", "entier"),
+        ("quantite", "quantite", "entier"),
+        ("prix_unitaire", "prix_unitaire", "decimal"),
+        ("sous_total", "sous_total", "decimal"),
+        ("statut_commande", "commande__statut", "texte"),
+        ("date_paiement", "commande__date_paiement", "horodatage"),
+    ],
+    "paiements": [
+        ("id", "id", "entier"),
+        ("commande_id", "commande_id", "entier"),
+        ("utilisateur_id", "utilisateur_id", "entier"),
+        ("montant", "montant", "decimal"),
+        ("statut", "statut", "texte"),
+        ("provider", "provider", "texte"),
+        ("reference", "reference", "texte"),
+        ("date_creation", "date_creation", "horodatage"),
+        ("date_confirmation", "date_confirmation", "horodatage"),
+    ],
+}
+
+FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+def formats_disponibles():
+    return [f for f in FORMATS if f == "csv" or pa is not None]
+
+
+def _queryset(source, evenement_id=None):
+    if source == "billets":
+        qs = EBillet.objects.all()
+        if evenement_id is not None:
+            qs = qs.filter(offre__evenement_id=evenement_id)
+    elif source == "lignes":
+        qs = LigneCommande.objects.all()
+        if evenement_id is not None:
+            qs = qs.filter(offre__evenement_id=evenement_id)
+    else:
+        qs = Paiement.objects.all()
+        if evenement_id is not None:
+            commandes = Commande.objects.filter(lignes__offre__evenement_id=evenement_id)
+            qs = qs.filter(commande_id__in=commandes.values("id"))
+    return qs.order_by()
+
+
+def iter_lignes(source, evenement_id=None, taille=TAILLE_PAQUET):
+    """Tuples des colonnes de COLONNES[source], lus en flux."""
+    lookups = [lookup for _, lookup, _ in COLONNES[source]]
+    qs = _queryset(source, evenement_id).values_list(*lookups)
+
+    if connection.vendor != "mysql":
+        yield from qs.iterator(chunk_size=taille)
+        return
+
+    dernier = 0
+    while True:
+        page = list(qs.filter(id__gt=dernier).order_by("id")[:taille])
+        if not page:
+            return
+        yield from page
+        dernier = page[-1][0]
+
+
+def _paquets(lignes, taille):
+    paquet = []
+    for ligne in lignes:
+        paquet.append(ligne)
+        if len(paquet) >= taille:
+            yield paquet
+            paquet = []
+    if paquet:
+        yield paquet
+
+
+def _csv(source, lignes, taille):
+    tampon = io.StringIO()
+    writer = csv.writer(tampon)
+    writer.writerow([nom for nom, _, _ in COLONNES[source]])
+    for paquet in _paquets(lignes, taille):
+        writer.writerows(paquet)
+        yield tampon.getvalue().encode("utf-8")
+        tampon.seek(0)
+        tampon.truncate()
+    if tampon.tell():
+        yield tampon.getvalue().encode("utf-8")
+
+
+def _schema(source):
+    types = {
+        "entier": pa.int64(),
+        "texte": pa.string(),
+        "decimal": pa.decimal128(12, 2),
+        "horodatage": pa.timestamp("us", tz="UTC"),
+    }
+    return pa.schema([(nom, types[type_]) for nom, _, type_ in COLONNES[source]])
+
+
+class _Flux:
+    """Fichier en écriture seule dont on récupère le contenu au fur et à mesure (pyarrow)."""
+
+    def __init__(self):
+        self.morceaux = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, donnees):
+        donnees = bytes(donnees)
+        self.morceaux.append(donnees)
+        self.position += len(donnees)
+        return len(donnees)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def vider(self):
+        contenu, self.morceaux = b"".join(self.morceaux), []
+        return contenu
+
+
+def _colonnaire(source, lignes, taille, format_):
+    schema = _schema(source)
+    flux = _Flux()
+    sortie = pa.PythonFile(flux, mode="w")
+    if format_ == "parquet":
+        writer = pq.ParquetWriter(sortie, schema)
+        ecrire = writer.write_batch
+    else:
+        writer = pa.ipc.new_stream(sortie, schema)
+        ecrire = writer.write_batch
+
+    for paquet in _paquets(lignes, taille):
+        colonnes = list(zip(*paquet))
+        ecrire(pa.RecordBatch.from_arrays(
+            [pa.array(valeurs, type=champ.type) for valeurs, champ in zip(colonnes, schema)], schema=schema
+        ))
+        if flux.morceaux:
+            yield flux.vider()
+
+    writer.close()
+    yield flux.vider()
+
+
+def exporter(source, format_="csv", evenement_id=None, taille=TAILLE_PAQUET):
+    """Générateur d'octets de l'export. Lève ValueError si la source ou le format est inconnu / indisponible."""
+    if source not in COLONNES:
+        raise ValueError(f"Source inconnue : {source} (choix : {', '.join(COLONNES)}).")
+    if format_ not in formats_disponibles():
+        raise ValueError(f"Format indisponible : {format_} (choix : {', '.join(formats_disponibles())}).")
+
+    lignes = iter_lignes(source, evenement_id, taille)
+    if format_ == "csv":
+        return _csv(source, lignes, taille)
+    return _colonnaire(source, lignes, taille, format_)
@@ -0,0 +1,37 @@
+# analytics/management/commands/exporter_donnees.py
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics import export
+
+
+class Command(BaseCommand):
+    help = "Exporte billets, lignes de commande ou paiements en CSV (ou Arrow / Parquet si pyarrow est installé)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("source", choices=list(export.COLONNES))
+        parser.add_argument("--format", dest="fichier", default="csv", choices=list(export.FORMATS))
+        parser.add_argument("--evenement", type=int, help="Restreint l'export à un événement.")
+        parser.add_argument("--sortie", default="-", help="Fichier de sortie (- = sortie standard).")
+        parser.add_argument("--lot", type=int, default=export.TAILLE_PAQUET, help="Lignes lues par paquet.")
+
+    def handle(self, *args, **options):
+        try:
+            contenu = export.exporter(options["source"], options["fichier"], options["evenement"], options["lot"])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        debut = time.monotonic()
+        taille = 0
+        sortie = sys.stdout.buffer if options["sortie"] == "-" else open(options["sortie"], "wb")
+        try:
+            for morceau in contenu:
+                sortie.write(morceau)
+                taille += len(morceau)
+        finally:
+            if sortie is not sys.stdout.buffer:
+                sortie.close()
+
+        self.stderr.write(f"{taille} octet(s) exporté(s) en {time.monotonic() - debut:.1f}s.")
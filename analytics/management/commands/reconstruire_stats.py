@@ -0,0 +1,55 @@
+# analytics/management/commands/reconstruire_stats.py
+import multiprocessing
+import time
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from analytics import reconstruction
+from analytics.models import PointRepriseStats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule StatistiquesVente, VenteHoraire et VenteJournaliere depuis les commandes payées. "
+        "Reprise possible après interruption (--reprendre) ; arrêter traiter_outbox pendant l'exécution."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=1, help="Processus en parallèle (une plage d'id chacun).")
+        parser.add_argument("--lot", type=int, default=reconstruction.TAILLE_LOT, help="Lignes lues par lot.")
+        parser.add_argument(
+            "--reprendre",
+            action="store_true",
+            help="Reprend les plages non terminées de la dernière exécution au lieu de tout remettre à zéro.",
+        )
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1 or options["lot"] < 1:
+            raise CommandError("--workers et --lot doivent être strictement positifs.")
+
+        if options["reprendre"]:
+            if not PointRepriseStats.objects.exists():
+                raise CommandError("Aucune reconstruction à reprendre.")
+        else:
+            reconstruction.reinitialiser(options["workers"])
+
+        plages = list(PointRepriseStats.objects.filter(termine=False).values_list("pk", flat=True))
+        debut = time.monotonic()
+
+        if options["workers"] == 1 or len(plages) <= 1:
+            lues = sum(reconstruction.traiter_plage(pk, options["lot"]) for pk in plages)
+        else:
+            # Chaque processus ouvre sa propre connexion ; django.setup avant de charger les tâches
+            # (nécessaire quand les processus sont lancés par "spawn", ex. Windows)
+            connections.close_all()
+            with multiprocessing.Pool(min(options["workers"], len(plages)), initializer=django.setup) as pool:
+                lues = sum(pool.starmap(
+                    reconstruction.traiter_plage_processus, [(pk, options["lot"]) for pk in plages]
+                ))
+
+        reconstruction.finaliser()
+        self.stdout.write(
+            f"{lues} ligne(s) agrégée(s) sur {len(plages)} plage(s) en {time.monotonic() - debut:.1f}s."
+        )
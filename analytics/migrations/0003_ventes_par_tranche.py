@@ -0,0 +1,52 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:24
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_initial'),
+        ('offres', '0003_tranches_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VenteHoraire',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre_ventes', models.IntegerField(default=0)),
+                ('chiffre_affaires', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('debut', models.DateTimeField()),
+                ('offre', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='offres.offre')),
+            ],
+            options={
+                'verbose_name': 'Vente horaire',
+                'verbose_name_plural': 'Ventes horaires',
+                'db_table': 'vente_horaire',
+                'ordering': ['debut'],
+                'indexes': [models.Index(fields=['debut'], name='vente_horai_debut_d95966_idx')],
+                'constraints': [models.UniqueConstraint(fields=('offre', 'debut'), name='vente_horaire_offre_debut_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='VenteJournaliere',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre_ventes', models.IntegerField(default=0)),
+                ('chiffre_affaires', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('jour', models.DateField()),
+                ('offre', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='offres.offre')),
+            ],
+            options={
+                'verbose_name': 'Vente journalière',
+                'verbose_name_plural': 'Ventes journalières',
+                'db_table': 'vente_journaliere',
+                'ordering': ['jour'],
+                'indexes': [models.Index(fields=['jour'], name='vente_journ_jour_13c4e9_idx')],
+                'constraints': [models.UniqueConstraint(fields=('offre', 'jour'), name='vente_journaliere_offre_jour_uniq')],
+            },
+        ),
+    ]
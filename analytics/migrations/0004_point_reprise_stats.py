@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0003_ventes_par_tranche'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PointRepriseStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('debut', models.BigIntegerField()),
+                ('fin', models.BigIntegerField()),
+                ('dernier_id', models.BigIntegerField()),
+                ('termine', models.BooleanField(default=False)),
+                ('date_maj', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Point de reprise (statistiques)',
+                'verbose_name_plural': 'Points de reprise (statistiques)',
+                'db_table': 'stats_point_reprise',
+                'ordering': ['debut'],
+            },
+        ),
+    ]
@@ -7,7 +7,7 @@ from django.db.models import Q, CheckConstraint
 class StatistiquesVente(models.Model):
     """
     Statistiques agrégées par offre.
-    - Ces données sont MAJ automatiquement par les signaux de paiements.
+    - Ces données sont MAJ à chaque commande payée (analytics/services.py, via l'outbox).
     - Aucune écriture manuelle via l'API (voir ViewSet en read-only).
     """
     offre = models.OneToOneField(
@@ -19,7 +19,7 @@ class StatistiquesVente(models.Model):
     chiffre_affaires = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
     date_derniere_maj = models.DateTimeField(auto_now=True)
 
-    # Optionnel (facultatif selon ce que vous calculez côté signal / batch)
+    # Recalculés depuis les tranches VenteJournaliere / VenteHoraire (services.recalculer_indicateurs)
     moyenne_ventes_jour = models.DecimalField(max_digits=8, decimal_places=2, default=Decimal("0.00"))
     pic_ventes_heure = models.DateTimeField(null=True, blank=True)
 
@@ -40,3 +40,80 @@ class StatistiquesVente(models.Model):
 
     def __str__(self):
         return f"Stats Offre {self.offre_id} - ventes: {self.nombre_ventes}"
+
+
+class VenteTranche(models.Model):
+    """
+    Ventes d'une offre sur une tranche de temps (base commune des agrégats horaires / journaliers).
+    Alimentées à chaque commande payée (analytics/services.py) : les tableaux de bord lisent
+    ces tranches précalculées au lieu de parcourir les commandes.
+    """
+    offre = models.ForeignKey(
+        'offres.Offre',
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    nombre_ventes = models.IntegerField(default=0)
+    chiffre_affaires = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+
+    class Meta:
+        abstract = True
+
+
+class VenteHoraire(VenteTranche):
+    debut = models.DateTimeField()  # début de l'heure (heure locale)
+
+    class Meta:
+        db_table = 'vente_horaire'
+        constraints = [
+            models.UniqueConstraint(fields=['offre', 'debut'], name='vente_horaire_offre_debut_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['debut']),
+        ]
+        ordering = ['debut']
+        verbose_name = "Vente horaire"
+        verbose_name_plural = "Ventes horaires"
+
+    def __str__(self):
+        return f"Offre {self.offre_id} @ {self.debut:%Y-%m-%d %H:00} - ventes: {self.nombre_ventes}"
+
+
+class VenteJournaliere(VenteTranche):
+    jour = models.DateField()  # jour local
+
+    class Meta:
+        db_table = 'vente_journaliere'
+        constraints = [
+            models.UniqueConstraint(fields=['offre', 'jour'], name='vente_journaliere_offre_jour_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['jour']),
+        ]
+        ordering = ['jour']
+        verbose_name = "Vente journalière"
+        verbose_name_plural = "Ventes journalières"
+
+    def __str__(self):
+        return f"Offre {self.offre_id} @ {self.jour} - ventes: {self.nombre_ventes}"
+
+
+class PointRepriseStats(models.Model):
+    """
+    Avancement de la reconstruction des statistiques (commande reconstruire_stats) :
+    une ligne par plage d'id de LigneCommande, mise à jour dans la transaction de chaque lot.
+    """
+    debut = models.BigIntegerField()
+    fin = models.BigIntegerField()
+    dernier_id = models.BigIntegerField()
+    termine = models.BooleanField(default=False)
+    date_maj = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'stats_point_reprise'
+        ordering = ['debut']
+        verbose_name = "Point de reprise (statistiques)"
+        verbose_name_plural = "Points de reprise (statistiques)"
+
+    def __str__(self):
+        return f"Lignes {self.debut}-{self.fin} : {'terminé' if self.termine else self.dernier_id}"
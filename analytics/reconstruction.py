@@ -0,0 +1,153 @@
+# analytics/reconstruction.py
+"""
+Reconstruction des statistiques de ventes depuis l'historique (commande reconstruire_stats).
+
+- Lit les LigneCommande des commandes PAYEE par lots d'id croissants (pagination par clé,
+  mémoire bornée quel que soit le moteur), agrège chaque lot en mémoire par offre / heure / jour
+  et cumule le résultat par upserts multi-lignes (StatistiquesVente, VenteHoraire, VenteJournaliere).
+- Chaque lot est écrit dans la même transaction que son point de reprise (PointRepriseStats) :
+  après une interruption, --reprendre repart exactement du dernier lot validé.
+- Les plages d'id sont indépendantes : plusieurs workers (processus) les traitent en parallèle.
+- Les commandes dont l'événement COMMANDE_PAYEE attend encore l'outbox sont ignorées : le worker
+  les comptera en les traitant. Arrêter traiter_outbox pendant la reconstruction évite de compter
+  deux fois une commande traitée entre la remise à zéro et la lecture de son lot.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from commandes.models import EvenementOutbox, LigneCommande
+from .models import PointRepriseStats, StatistiquesVente, VenteHoraire, VenteJournaliere
+from .services import (
+    invalider_stats_globales, recalculer_indicateurs, requete_upsert, tranche_horaire, tranche_journaliere,
+)
+
+TAILLE_LOT = 50_000
+LIGNES_PAR_REQUETE = 500
+
+
+def lignes_comptees():
+    en_attente = EvenementOutbox.objects.filter(type_evenement="COMMANDE_PAYEE", statut="EN_ATTENTE")
+    return (
+        LigneCommande.objects.filter(commande__statut="PAYEE")
+        .exclude(commande_id__in=en_attente.values("commande_id"))
+    )
+
+
+def reinitialiser(nb_plages=1):
+    """Remet les statistiques à zéro et découpe les LigneCommande existantes en `nb_plages` plages d'id."""
+    with transaction.atomic():
+        VenteHoraire.objects.all().delete()
+        VenteJournaliere.objects.all().delete()
+        StatistiquesVente.objects.update(
+            nombre_ventes=0, chiffre_affaires=Decimal("0.00"), moyenne_ventes_jour=Decimal("0.00"), pic_ventes_heure=None
+        )
+        PointRepriseStats.objects.all().delete()
+
+        bornes = LigneCommande.objects.aggregate(mini=Min("id"), maxi=Max("id"))
+        if bornes["mini"] is None:
+            return []
+        pas = -(-(bornes["maxi"] - bornes["mini"] + 1) // nb_plages)
+        return PointRepriseStats.objects.bulk_create([
+            PointRepriseStats(debut=debut, fin=min(debut + pas - 1, bornes["maxi"]), dernier_id=debut - 1)
+            for debut in range(bornes["mini"], bornes["maxi"] + 1, pas)
+        ])
+
+
+def _cumuler(cursor, modele, conflit, valeurs, lignes):
+    """Upsert cumulatif de `lignes` (tuples offre_id, nombre_ventes, chiffre_affaires, *valeurs)."""
+    qn = connection.ops.quote_name
+    nb_colonnes = 3 + len(valeurs)
+    par_requete = LIGNES_PAR_REQUETE
+    if connection.features.max_query_params:
+        par_requete = min(par_requete, connection.features.max_query_params // nb_colonnes)
+
+    ligne_sql = "SELECT " + ", ".join(f"%s AS c{i}" for i in range(nb_colonnes))
+    for i in range(0, len(lignes), par_requete):
+        paquet = lignes[i:i + par_requete]
+        selection = " UNION ALL ".join([ligne_sql] * len(paquet))
+        cursor.execute(
+            requete_upsert(connection.vendor, qn, modele, conflit, valeurs, selection),
+            [v for ligne in paquet for v in ligne],
+        )
+
+
+def _ecrire(totaux, horaires, journalieres, maintenant):
+    """
+    Lignes triées par clé de conflit (offre_id, puis tranche) : des workers parallèles
+    verrouillent les lignes de statistiques dans le même ordre, sans interblocage.
+    """
+    ops = connection.ops
+    with connection.cursor() as cursor:
+        _cumuler(
+            cursor, StatistiquesVente, ("offre_id",), ("date_derniere_maj", "moyenne_ventes_jour"),
+            [(o, q, m, ops.adapt_datetimefield_value(maintenant), Decimal("0.00")) for o, (q, m) in sorted(totaux.items())],
+        )
+        _cumuler(
+            cursor, VenteHoraire, ("offre_id", "debut"), ("debut",),
+            [(o, q, m, ops.adapt_datetimefield_value(h)) for (o, h), (q, m) in sorted(horaires.items())],
+        )
+        _cumuler(
+            cursor, VenteJournaliere, ("offre_id", "jour"), ("jour",),
+            [(o, q, m, ops.adapt_datefield_value(j)) for (o, j), (q, m) in sorted(journalieres.items())],
+        )
+
+
+def traiter_lot(point, taille_lot=TAILLE_LOT):
+    """Agrège et écrit le lot suivant de la plage ; retourne le nombre de lignes lues."""
+    with transaction.atomic():
+        lot = (
+            lignes_comptees()
+            .filter(id__gt=point.dernier_id, id__lte=point.fin)
+            .annotate(instant=Coalesce("commande__date_paiement", "commande__date_creation"))
+            .order_by("id")
+            .values_list("id", "offre_id", "quantite", "sous_total", "instant")[:taille_lot]
+        )
+
+        totaux = defaultdict(lambda: [0, Decimal("0.00")])
+        horaires = defaultdict(lambda: [0, Decimal("0.00")])
+        journalieres = defaultdict(lambda: [0, Decimal("0.00")])
+        nb = 0
+        precedent = heure = jour = None
+        for ligne_id, offre_id, quantite, montant, instant in lot.iterator(chunk_size=min(taille_lot, 10_000)):
+            if instant != precedent:  # lignes d'une même commande consécutives : une conversion par commande
+                precedent, heure, jour = instant, tranche_horaire(instant), tranche_journaliere(instant)
+            for cumul in (totaux[offre_id], horaires[offre_id, heure], journalieres[offre_id, jour]):
+                cumul[0] += quantite
+                cumul[1] += montant
+            nb += 1
+            point.dernier_id = ligne_id
+
+        if nb:
+            _ecrire(totaux, horaires, journalieres, timezone.now())
+        if nb < taille_lot:
+            point.dernier_id, point.termine = point.fin, True
+        point.save(update_fields=["dernier_id", "termine", "date_maj"])
+    return nb
+
+
+def traiter_plage(point_id, taille_lot=TAILLE_LOT):
+    """Traite une plage jusqu'au bout ; retourne le nombre de lignes lues."""
+    point = PointRepriseStats.objects.get(pk=point_id)
+    total = 0
+    while not point.termine:
+        total += traiter_lot(point, taille_lot)
+    return total
+
+
+def traiter_plage_processus(point_id, taille_lot):
+    """Tâche d'un processus worker (Django initialisé par le Pool) ; referme sa connexion."""
+    try:
+        return traiter_plage(point_id, taille_lot)
+    finally:
+        connection.close()
+
+
+def finaliser():
+    """Indicateurs dérivés (moyenne par jour, heure de pic) de toutes les offres, une fois les plages terminées."""
+    recalculer_indicateurs()
+    invalider_stats_globales()
@@ -0,0 +1,238 @@
+# analytics/services.py
+"""
+Agrégation incrémentale des ventes.
+
+Appelée par le traitement de l'événement COMMANDE_PAYEE (commandes/outbox.py), donc dans
+la transaction qui marque l'événement TRAITE : une commande payée est comptée une seule
+fois, et seulement si cette transaction est validée.
+
+Pour une commande, quel que soit son nombre d'offres, quatre requêtes :
+- StatistiquesVente (totaux), VenteHoraire et VenteJournaliere (tranche de date_paiement) :
+  un INSERT ... SELECT ... GROUP BY offre depuis les LigneCommande, avec upsert
+  (ON CONFLICT ... DO UPDATE sur PostgreSQL / SQLite, ON DUPLICATE KEY UPDATE sur MySQL) ;
+- puis moyenne_ventes_jour / pic_ventes_heure des offres concernées, relus des tranches.
+
+Les indicateurs globaux (stats_globales) sont servis depuis le cache Django et invalidés
+à chaque vente, après validation de la transaction. L'invalidation est faite par le worker
+traiter_outbox, pas par le processus web qui sert l'endpoint : le cache doit être partagé
+(Redis via CACHE_URL, obligatoire dans core/deployment_settings.py ; vérifié par
+manage.py check --deploy, voir analytics/checks.py). Sans CACHE_URL (dev, tests), chaque
+processus a son propre cache et ne voit que ses propres invalidations.
+"""
+import hashlib
+import json
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Avg, Count, DecimalField, ExpressionWrapper, F, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from commandes.models import LigneCommande
+from .models import StatistiquesVente, VenteHoraire, VenteJournaliere
+
+
+def tranche_horaire(instant):
+    return timezone.localtime(instant).replace(minute=0, second=0, microsecond=0)
+
+
+def tranche_journaliere(instant):
+    return timezone.localdate(instant)
+
+
+def requete_upsert(vendor, qn, modele, conflit, valeurs, selection):
+    """
+    INSERT ... SELECT cumulatif : nombre_ventes / chiffre_affaires sont ajoutés en cas de conflit.
+    `selection` produit les colonnes c0, c1, c2... : offre_id, nombre_ventes, chiffre_affaires,
+    puis `valeurs` (colonnes supplémentaires, écrasées en cas de conflit).
+    """
+    table = qn(modele._meta.db_table)
+    colonnes = ["offre_id", "nombre_ventes", "chiffre_affaires", *valeurs]
+    insertion = f"INSERT INTO {table} ({', '.join(qn(c) for c in colonnes)}) "
+
+    if vendor == "mysql":
+        nouveau = {c: f"v.c{i}" for i, c in enumerate(colonnes)}
+        # Ordre d'une table dérivée non garanti : tri explicite par clé de conflit (ordre des verrous)
+        tri = ", ".join(nouveau[c] for c in conflit)
+        debut, fin = insertion + f"SELECT * FROM ({selection}) AS v ORDER BY {tri} ", "ON DUPLICATE KEY UPDATE "
+    else:
+        nouveau = {c: f"EXCLUDED.{qn(c)}" for c in colonnes}
+        debut, fin = insertion + selection, f" ON CONFLICT ({', '.join(qn(c) for c in conflit)}) DO UPDATE SET "
+
+    affectations = [f"{qn(c)} = {table}.{qn(c)} + {nouveau[c]}" for c in ("nombre_ventes", "chiffre_affaires")]
+    affectations += [f"{qn(c)} = {nouveau[c]}" for c in valeurs if c not in conflit]
+    return debut + fin + ", ".join(affectations)
+
+
+def _selection_commande(qn, nb_valeurs):
+    """Ventes d'une commande par offre ; paramètres : valeurs supplémentaires puis commande_id."""
+    return (
+        f"SELECT {qn('offre_id')} AS c0, SUM({qn('quantite')}) AS c1, SUM({qn('sous_total')}) AS c2"
+        + "".join(f", %s AS c{i}" for i in range(3, 3 + nb_valeurs))
+        + f" FROM {qn(LigneCommande._meta.db_table)} WHERE {qn('commande_id')} = %s GROUP BY {qn('offre_id')}"
+        # Même ordre de verrouillage que les lots de reconstruire_stats (analytics/reconstruction.py)
+        + f" ORDER BY {qn('offre_id')}"
+    )
+
+
+def _upserts(cmd, maintenant):
+    instant = cmd.date_paiement or maintenant
+    adapter = connection.ops
+    return [
+        (
+            StatistiquesVente, ("offre_id",), ("date_derniere_maj", "moyenne_ventes_jour"),
+            [adapter.adapt_datetimefield_value(maintenant), Decimal("0.00")],
+        ),
+        (
+            VenteHoraire, ("offre_id", "debut"), ("debut",),
+            [adapter.adapt_datetimefield_value(tranche_horaire(instant))],
+        ),
+        (
+            VenteJournaliere, ("offre_id", "jour"), ("jour",),
+            [adapter.adapt_datefield_value(tranche_journaliere(instant))],
+        ),
+    ]
+
+
+def recalculer_indicateurs(offre_ids=None):
+    """
+    moyenne_ventes_jour : ventes / nombre de jours ayant eu des ventes ;
+    pic_ventes_heure    : début de l'heure la plus vendeuse (la plus récente en cas d'égalité).
+    Une seule requête UPDATE, lue depuis les tranches (toutes les offres si offre_ids est None).
+    """
+    jours = (
+        VenteJournaliere.objects.filter(offre_id=OuterRef("offre_id"))
+        .values("offre_id")
+        .annotate(n=Count("id"))
+        .values("n")
+    )
+    pic = (
+        VenteHoraire.objects.filter(offre_id=OuterRef("offre_id"))
+        .order_by("-nombre_ventes", "-debut")
+        .values("debut")[:1]
+    )
+    # "* 1.00" : division décimale partout (SQLite diviserait deux entiers en entier)
+    moyenne = ExpressionWrapper(
+        F("nombre_ventes") * Value(Decimal("1.00")) / Subquery(jours),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+    qs = StatistiquesVente.objects.all()
+    if offre_ids is not None:
+        qs = qs.filter(offre_id__in=offre_ids)
+    qs.update(
+        moyenne_ventes_jour=Coalesce(moyenne, Value(Decimal("0.00"))),
+        pic_ventes_heure=Subquery(pic),
+    )
+
+
+def enregistrer_ventes_commande(cmd):
+    """Ajoute les lignes d'une commande payée aux totaux et aux tranches de ses offres."""
+    maintenant = timezone.now()
+    if connection.vendor not in ("postgresql", "mysql", "sqlite"):
+        _enregistrer_ventes_par_offre(cmd, maintenant)
+    else:
+        with connection.cursor() as cursor:
+            qn = connection.ops.quote_name
+            for modele, conflit, valeurs, parametres in _upserts(cmd, maintenant):
+                sql = requete_upsert(
+                    connection.vendor, qn, modele, conflit, valeurs, _selection_commande(qn, len(valeurs))
+                )
+                cursor.execute(sql, [*parametres, cmd.pk])
+
+    recalculer_indicateurs(LigneCommande.objects.filter(commande=cmd).values("offre_id"))
+    transaction.on_commit(invalider_stats_globales)
+
+
+def _enregistrer_ventes_par_offre(cmd, maintenant):
+    """Repli générique (autres moteurs) : quelques requêtes par offre."""
+    instant = cmd.date_paiement or maintenant
+    par_offre = (
+        LigneCommande.objects.filter(commande=cmd)
+        .values("offre_id")
+        .annotate(quantite=Sum("quantite"), montant=Sum("sous_total"))
+        .order_by("offre_id")
+    )
+    for ligne in par_offre:
+        cumul = {
+            "nombre_ventes": F("nombre_ventes") + ligne["quantite"],
+            "chiffre_affaires": F("chiffre_affaires") + ligne["montant"],
+        }
+        for modele, cle in (
+            (StatistiquesVente, {}),
+            (VenteHoraire, {"debut": tranche_horaire(instant)}),
+            (VenteJournaliere, {"jour": tranche_journaliere(instant)}),
+        ):
+            modele.objects.get_or_create(offre_id=ligne["offre_id"], **cle)
+            modele.objects.filter(offre_id=ligne["offre_id"], **cle).update(**cumul)
+        StatistiquesVente.objects.filter(offre_id=ligne["offre_id"]).update(date_derniere_maj=maintenant)
+
+
+# ---------------------------------------------------------------------------
+# Indicateurs globaux (GET /api/statistiques/ventes/global/)
+# ---------------------------------------------------------------------------
+
+CLE_STATS_GLOBALES = "analytics:stats_globales"
+
+
+def calculer_stats_globales():
+    qs = StatistiquesVente.objects.select_related("offre")
+
+    agg = qs.aggregate(
+        ventes_totales=Sum("nombre_ventes"),
+        chiffre_affaires_total=Sum("chiffre_affaires"),
+        moyenne_ventes_jour_globale=Avg("moyenne_ventes_jour"),
+        derniere_mise_a_jour=Max("date_derniere_maj"),
+        nombre_offres_suivies=Count("id"),
+    )
+
+    ventes_totales = agg["ventes_totales"] or 0
+    ca_total = agg["chiffre_affaires_total"] or 0
+    panier_moyen = (ca_total / ventes_totales) if ventes_totales else 0
+
+    # Top 5 par nombre de ventes
+    top_qs = qs.order_by("-nombre_ventes")[:5]
+    top_5_offres = [
+        {
+            "offre_id": s.offre_id,
+            "offre_nom": getattr(s.offre, "nom_offre", None),
+            "nombre_ventes": s.nombre_ventes,
+            "chiffre_affaires": s.chiffre_affaires,
+        }
+        for s in top_qs
+    ]
+
+    return {
+        "ventes_totales": ventes_totales,
+        "chiffre_affaires_total": ca_total,
+        "panier_moyen": panier_moyen,
+        "nombre_offres_suivies": agg["nombre_offres_suivies"] or 0,
+        "moyenne_ventes_jour_globale": agg["moyenne_ventes_jour_globale"] or 0,
+        "derniere_mise_a_jour": agg["derniere_mise_a_jour"],
+        "top_5_offres": top_5_offres,
+    }
+
+
+def stats_globales():
+    """
+    {"donnees", "etag", "derniere_modification" (timestamp ou None)} depuis le cache ;
+    recalculé au plus une fois par ANALYTICS_CACHE_SECONDES en l'absence de ventes.
+    """
+    entree = cache.get(CLE_STATS_GLOBALES)
+    if entree is None:
+        donnees = calculer_stats_globales()
+        empreinte = hashlib.sha256(json.dumps(donnees, cls=DjangoJSONEncoder, sort_keys=True).encode("utf-8"))
+        derniere = donnees["derniere_mise_a_jour"]
+        entree = {
+            "donnees": donnees,
+            "etag": '"stats-%s"' % empreinte.hexdigest()[:32],
+            "derniere_modification": int(derniere.timestamp()) if derniere else None,
+        }
+        cache.set(CLE_STATS_GLOBALES, entree, getattr(settings, "ANALYTICS_CACHE_SECONDES", 30))
+    return entree
+
+
+def invalider_stats_globales():
+    cache.delete(CLE_STATS_GLOBALES)
@@ -1,3 +1,194 @@
+import unittest
+from decimal import Decimal
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from users.models import Utilisateur
+from evenements.models import Evenement
+from offres.models import Offre
+from commandes.models import Commande
+from commandes.services import create_commande_from_items
+from analytics import export
+from analytics.checks import cache_partage
+from analytics.models import StatistiquesVente, VenteHoraire, VenteJournaliere
+from analytics.reconstruction import reinitialiser, traiter_lot
+from analytics.services import enregistrer_ventes_commande
+
+
+def creer_offres(createur, nombre):
+    event = Evenement.objects.create(
+        nom_evenement="Finale 100m",
+        lieu="Stade de France",
+        date_evenement=timezone.localdate(),
+    )
+    return [
+        Offre.objects.create(
+            evenement=event,
+            createur=createur,
+            nom_offre=f"OFFRE {i}",
+            prix=Decimal("10.00"),
+            type_offre="SOLO",
+            stock_total=50,
+            stock_disponible=50,
+            date_debut_vente=timezone.now(),
+            date_fin_vente=timezone.now(),
+        )
+        for i in range(nombre)
+    ]
+
+
+class AgregationVentesTest(TestCase):
+    def setUp(self):
+        self.user = Utilisateur.objects.create_user(username="client", email="client@test.com", password="Test12345!")
+        self.offres = creer_offres(self.user, 3)
+
+    def test_requetes_independantes_du_nombre_d_offres(self):
+        def compter(offres):
+            cmd = create_commande_from_items(self.user, [{"offre": o.id, "quantite": 2} for o in offres])
+            cmd.date_paiement = timezone.now()
+            with CaptureQueriesContext(connection) as ctx:
+                enregistrer_ventes_commande(cmd)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(compter(self.offres[:1]), compter(self.offres))
+
+        stats = StatistiquesVente.objects.get(offre=self.offres[0])
+        self.assertEqual((stats.nombre_ventes, stats.chiffre_affaires), (4, Decimal("40.00")))
+        self.assertEqual(stats.moyenne_ventes_jour, Decimal("4.00"))
+        self.assertEqual(stats.pic_ventes_heure, VenteHoraire.objects.get(offre=self.offres[0]).debut)
+        self.assertEqual(VenteJournaliere.objects.count(), 3)
+
+
+class TranchesVentesAPITest(APITestCase):
+    def setUp(self):
+        self.user = Utilisateur.objects.create_user(
+            username="admin", email="admin@test.com", password="Test12345!", is_staff=True
+        )
+        self.client.force_authenticate(user=self.user)
+        self.offres = creer_offres(self.user, 2)
+
+        for offre, quantite in ((self.offres[0], 3), (self.offres[1], 1)):
+            cmd = create_commande_from_items(self.user, [{"offre": offre.id, "quantite": quantite}])
+            cmd.date_paiement = timezone.now()
+            enregistrer_ventes_commande(cmd)
+
+    def test_courbe_pic_et_totaux_par_evenement(self):
+        res = self.client.get("/api/statistiques/ventes/courbe/", {"pas": "heure"})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([p["nombre_ventes"] for p in res.data], [4])
+
+        res = self.client.get("/api/statistiques/ventes/pic/", {"offre": self.offres[1].id})
+        self.assertEqual(res.data["nombre_ventes"], 1)
+
+        res = self.client.get("/api/statistiques/ventes/par-evenement/")
+        self.assertEqual(res.data[0]["chiffre_affaires"], Decimal("40.00"))
+
+        res = self.client.get("/api/statistiques/ventes/courbe/", {"debut": "hier"})
+        self.assertEqual(res.status_code, 400)
+
+    def test_global_en_cache_et_get_conditionnel(self):
+        cache.clear()
+        res = self.client.get("/api/statistiques/ventes/global/")
+        self.assertEqual(res.data["ventes_totales"], 4)
+        etag = res["ETag"]
+
+        # Rafraîchissement inchangé : 304 servi depuis le cache, sans requête SQL
+        with self.assertNumQueries(0):
+            res = self.client.get("/api/statistiques/ventes/global/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 304)
+
+        # Une vente invalide le cache à la validation
+        cmd = create_commande_from_items(self.user, [{"offre": self.offres[0].id, "quantite": 1}])
+        with self.captureOnCommitCallbacks(execute=True):
+            enregistrer_ventes_commande(cmd)
+        res = self.client.get("/api/statistiques/ventes/global/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data["ventes_totales"], 5)
+
+    def test_check_deploy_exige_un_cache_partage(self):
+        self.assertEqual([e.id for e in cache_partage(None)], ["analytics.E001"])
+        redis = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://x"}}
+        with self.settings(CACHES=redis):
+            self.assertEqual(cache_partage(None), [])
+
+    def test_export_csv_en_flux(self):
+        res = self.client.get(
+            "/api/statistiques/ventes/export/",
+            {"source": "lignes", "evenement": self.offres[0].evenement_id},
+        )
+        self.assertEqual(res.status_code, 200)
+        lignes = b"".join(res.streaming_content).decode("utf-8").splitlines()
+        self.assertEqual(lignes[0].split(",")[:3], ["id", "commande_id", "evenement_id"])
+        self.assertEqual(len(lignes), 3)
+
+        res = self.client.get("/api/statistiques/ventes/export/", {"source": "inconnue"})
+        self.assertEqual(res.status_code, 400)
+
+
+@unittest.skipUnless(export.pa is not None, "pyarrow non installé (dépendance optionnelle).")
+class ExportColonnaireTest(TestCase):
+    def setUp(self):
+        self.user = Utilisateur.objects.create_user(username="client", email="client@test.com", password="Test12345!")
+        offres = creer_offres(self.user, 2)
+        # Paquets de 2 lignes : plusieurs RecordBatch / row groups dans un même fichier
+        for offre, quantite in ((offres[0], 3), (offres[1], 1), (offres[0], 2)):
+            cmd = create_commande_from_items(self.user, [{"offre": offre.id, "quantite": quantite}])
+            Commande.objects.filter(pk=cmd.pk).update(statut="PAYEE", date_paiement=timezone.now())
+
+    def attendu(self):
+        colonnes = [nom for nom, _, _ in export.COLONNES["lignes"]]
+        return sorted((dict(zip(colonnes, ligne)) for ligne in export.iter_lignes("lignes")), key=lambda l: l["id"])
+
+    def test_arrow_aller_retour(self):
+        contenu = b"".join(export.exporter("lignes", "arrow", taille=2))
+        table = export.pa.ipc.open_stream(contenu).read_all()
+        self.assertEqual(table.schema, export._schema("lignes"))
+        self.assertEqual(sorted(table.to_pylist(), key=lambda l: l["id"]), self.attendu())
+
+    def test_parquet_aller_retour(self):
+        contenu = b"".join(export.exporter("lignes", "parquet", taille=2))
+        table = export.pq.read_table(export.pa.BufferReader(contenu))
+        self.assertEqual(table.num_rows, 3)
+        lignes = sorted(table.to_pylist(), key=lambda l: l["id"])
+        self.assertEqual(lignes, self.attendu())
+        self.assertEqual(lignes[0]["sous_total"], Decimal("30.00"))
+        self.assertEqual(lignes[0]["statut_commande"], "PAYEE")
+
+
+class ReconstructionStatsTest(TestCase):
+    def setUp(self):
+        self.user = Utilisateur.objects.create_user(username="client", email="client@test.com", password="Test12345!")
+        self.offres = creer_offres(self.user, 2)
+        for quantite in (1, 2, 3):
+            cmd = create_commande_from_items(self.user, [{"offre": o.id, "quantite": quantite} for o in self.offres])
+            cmd.statut, cmd.date_paiement = "PAYEE", timezone.now()
+            cmd.save()
+            enregistrer_ventes_commande(cmd)
+        # Commande non payée : jamais comptée
+        create_commande_from_items(self.user, [{"offre": self.offres[0].id, "quantite": 5}])
+
+    def etat(self):
+        return (
+            sorted(StatistiquesVente.objects.values_list("offre_id", "nombre_ventes", "chiffre_affaires", "pic_ventes_heure")),
+            sorted(VenteHoraire.objects.values_list("offre_id", "debut", "nombre_ventes")),
+            sorted(VenteJournaliere.objects.values_list("offre_id", "jour", "nombre_ventes", "chiffre_affaires")),
+        )
+
+    def test_reprise_retrouve_les_statistiques_incrementales(self):
+        attendu = self.etat()
+        StatistiquesVente.objects.update(nombre_ventes=999)
+        VenteHoraire.objects.all().delete()
+
+        # Interruption après un lot de deux lignes sur la première plage, puis reprise
+        premiere = reinitialiser(nb_plages=2)[0]
+        self.assertEqual(traiter_lot(premiere, taille_lot=2), 2)
+        call_command("reconstruire_stats", reprendre=True, lot=2, stdout=StringIO())
 
-# Create your tests here.
+        self.assertEqual(self.etat(), attendu)
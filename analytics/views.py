@@ -1,11 +1,17 @@
 # analytics/views.py
-from django.db.models import Sum, Max, Avg, Count
-from rest_framework import viewsets, permissions
+from django.db.models import Sum
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_date
+from django.utils.http import http_date
+from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
-from .models import StatistiquesVente
+from . import export
+from .models import StatistiquesVente, VenteHoraire, VenteJournaliere
 from .serializers import StatistiquesVenteSerializer
+from .services import stats_globales
 
 
 class StatistiquesVenteViewSet(viewsets.ReadOnlyModelViewSet):
@@ -36,38 +42,145 @@ class StatistiquesVenteViewSet(viewsets.ReadOnlyModelViewSet):
         - derniere_mise_a_jour (max)
         - top_5_offres (par ventes)
         """
-        qs = self.get_queryset()
-
-        agg = qs.aggregate(
-            ventes_totales=Sum("nombre_ventes"),
-            chiffre_affaires_total=Sum("chiffre_affaires"),
-            moyenne_ventes_jour_globale=Avg("moyenne_ventes_jour"),
-            derniere_mise_a_jour=Max("date_derniere_maj"),
-            nombre_offres_suivies=Count("id"),
+        # Le cache porte aussi ETag / Last-Modified : un rafraîchissement inchangé répond 304 sans requête SQL
+        entree = stats_globales()
+        response = get_conditional_response(
+            request, etag=entree["etag"], last_modified=entree["derniere_modification"]
         )
+        if response is None:
+            response = Response(entree["donnees"])
+        response["ETag"] = entree["etag"]
+        if entree["derniere_modification"] is not None:
+            response["Last-Modified"] = http_date(entree["derniere_modification"])
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
 
-        ventes_totales = agg["ventes_totales"] or 0
-        ca_total = agg["chiffre_affaires_total"] or 0
-        panier_moyen = (ca_total / ventes_totales) if ventes_totales else 0
+    # ------------------------------------------------------------------
+    # Tranches horaires / journalières (tables VenteHoraire, VenteJournaliere)
+    # ------------------------------------------------------------------
 
-        # Top 5 par nombre de ventes
-        top_qs = qs.order_by("-nombre_ventes")[:5]
-        top_5_offres = [
+    def _tranches(self, request, modele):
+        """
+        Tranches filtrées par ?offre=, ?evenement=, ?debut= / ?fin= (dates AAAA-MM-JJ, incluses).
+        Lève ValueError si un paramètre est invalide.
+        """
+        qs = modele.objects.all()
+        params = request.query_params
+        if params.get("offre"):
+            qs = qs.filter(offre_id=int(params["offre"]))
+        if params.get("evenement"):
+            qs = qs.filter(offre__evenement_id=int(params["evenement"]))
+
+        champ_jour = "jour" if modele is VenteJournaliere else "debut__date"
+        for nom, lookup in (("debut", "gte"), ("fin", "lte")):
+            if params.get(nom):
+                jour = parse_date(params[nom])
+                if jour is None:
+                    raise ValueError
+                qs = qs.filter(**{f"{champ_jour}__{lookup}": jour})
+        return qs
+
+    @action(detail=False, methods=["get"], url_path="courbe")
+    def courbe(self, request):
+        """
+        GET /api/statistiques/ventes/courbe/?pas=heure|jour&offre=&evenement=&debut=&fin=
+        Courbe des ventes (toutes offres filtrées confondues), une entrée par tranche.
+        """
+        pas = request.query_params.get("pas", "jour")
+        if pas not in ("heure", "jour"):
+            return Response({"detail": "pas doit valoir heure ou jour."}, status=status.HTTP_400_BAD_REQUEST)
+        modele, champ = (VenteHoraire, "debut") if pas == "heure" else (VenteJournaliere, "jour")
+
+        try:
+            qs = self._tranches(request, modele)
+        except ValueError:
+            return Response(
+                {"detail": "offre / evenement entiers, debut / fin au format AAAA-MM-JJ."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        points = (
+            qs.values(champ)
+            .annotate(nombre_ventes=Sum("nombre_ventes"), chiffre_affaires=Sum("chiffre_affaires"))
+            .order_by(champ)
+        )
+        return Response([
+            {"tranche": p[champ], "nombre_ventes": p["nombre_ventes"], "chiffre_affaires": p["chiffre_affaires"]}
+            for p in points
+        ])
+
+    @action(detail=False, methods=["get"], url_path="pic")
+    def pic(self, request):
+        """
+        GET /api/statistiques/ventes/pic/?offre=&evenement=&debut=&fin=
+        Heure la plus vendeuse (toutes offres filtrées confondues).
+        """
+        try:
+            qs = self._tranches(request, VenteHoraire)
+        except ValueError:
+            return Response(
+                {"detail": "offre / evenement entiers, debut / fin au format AAAA-MM-JJ."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        meilleure = (
+            qs.values("debut")
+            .annotate(nombre_ventes=Sum("nombre_ventes"), chiffre_affaires=Sum("chiffre_affaires"))
+            .order_by("-nombre_ventes", "-debut")
+            .first()
+        )
+        if meilleure is None:
+            return Response({"debut": None, "nombre_ventes": 0, "chiffre_affaires": 0})
+        return Response(meilleure)
+
+    @action(detail=False, methods=["get"], url_path="par-evenement")
+    def par_evenement(self, request):
+        """
+        GET /api/statistiques/ventes/par-evenement/?debut=&fin=
+        Totaux par événement, calculés sur les tranches journalières.
+        """
+        try:
+            qs = self._tranches(request, VenteJournaliere)
+        except ValueError:
+            return Response(
+                {"detail": "evenement entier, debut / fin au format AAAA-MM-JJ."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        totaux = (
+            qs.values("offre__evenement_id", "offre__evenement__nom_evenement")
+            .annotate(nombre_ventes=Sum("nombre_ventes"), chiffre_affaires=Sum("chiffre_affaires"))
+            .order_by("-chiffre_affaires")
+        )
+        return Response([
             {
-                "offre_id": s.offre_id,
-                "offre_nom": getattr(s.offre, "nom_offre", None),
-                "nombre_ventes": s.nombre_ventes,
-                "chiffre_affaires": s.chiffre_affaires,
+                "evenement_id": t["offre__evenement_id"],
+                "evenement_nom": t["offre__evenement__nom_evenement"],
+                "nombre_ventes": t["nombre_ventes"],
+                "chiffre_affaires": t["chiffre_affaires"],
             }
-            for s in top_qs
-        ]
-
-        return Response({
-            "ventes_totales": ventes_totales,
-            "chiffre_affaires_total": ca_total,
-            "panier_moyen": panier_moyen,
-            "nombre_offres_suivies": agg["nombre_offres_suivies"] or 0,
-            "moyenne_ventes_jour_globale": agg["moyenne_ventes_jour_globale"] or 0,
-            "derniere_mise_a_jour": agg["derniere_mise_a_jour"],
-            "top_5_offres": top_5_offres,
-        })
+            for t in totaux
+        ])
+
+    @action(detail=False, methods=["get"], url_path="export")
+    def export(self, request):
+        """
+        GET /api/statistiques/ventes/export/?source=billets|lignes|paiements&fichier=csv|arrow|parquet&evenement=
+        Export brut en flux pour l'analyse hors ligne (voir analytics/export.py) ;
+        arrow / parquet seulement si pyarrow est installé.
+        """
+        source = request.query_params.get("source", "lignes")
+        # "format" est réservé par DRF (négociation du rendu)
+        fichier = request.query_params.get("fichier", "csv")
+        try:
+            evenement_id = request.query_params.get("evenement")
+            evenement_id = int(evenement_id) if evenement_id else None
+            contenu = export.exporter(source, fichier, evenement_id)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        type_contenu, extension = export.FORMATS[fichier]
+        nom = f"{source}-evenement-{evenement_id}" if evenement_id else source
+        response = StreamingHttpResponse(contenu, content_type=type_contenu)
+        response["Content-Disposition"] = f'attachment; filename="{nom}.{extension}"'
+        return response
@@ -1,10 +1,13 @@
 from django.contrib import admin
+from core.pagination import PaginateurEstime
+from core.recherche import RechercheAdminMixin
 from .models import EBillet
+from .qr import contenu_qr, qr_code_base64
 from django.utils.html import format_html
 
 
 @admin.register(EBillet)
-class EBilletAdmin(admin.ModelAdmin):
+class EBilletAdmin(RechercheAdminMixin, admin.ModelAdmin):
     list_display = (
         "numero_billet",
         "utilisateur",
@@ -13,16 +16,13 @@ class EBilletAdmin(admin.ModelAdmin):
         "prix_paye",
         "date_achat",
         "date_utilisation",
-        "afficher_qr_code",
     )
     list_filter = ("statut", "date_achat", "date_utilisation")
-    search_fields = (
-        "numero_billet",
-        "utilisateur__username",
-        "utilisateur__email",
-        "offre__nom_offre",
-    )
-    ordering = ("-date_achat",)
+    # Numéro, username, email et offre : colonne dénormalisée (voir core/recherche.py)
+    search_fields = ("recherche",)
+    ordering = ("-date_achat", "-id")
+    show_full_result_count = False
+    paginator = PaginateurEstime
     readonly_fields = (
         "numero_billet",
         "cle_achat",
@@ -42,16 +42,9 @@ class EBilletAdmin(admin.ModelAdmin):
         }),
     )
 
-    def afficher_qr_code(self, obj):
-        """Affichage mini QR code dans list_display"""
-        if obj.qr_code:
-            return format_html('<img src="data:image/png;base64,{}" width="50" height="50" />', obj.qr_code)
-        return "—"
-    afficher_qr_code.short_description = "QR Code"
-
     def qr_code_image(self, obj):
-        """Affichage grand QR code dans le détail"""
-        if obj.qr_code:
-            return format_html('<img src="data:image/png;base64,{}" width="200" height="200" />', obj.qr_code)
+        """Affichage grand QR code dans le détail (rendu à la demande, jamais en liste)"""
+        if obj.cle_finale:
+            return format_html('<img src="data:image/png;base64,{}" width="200" height="200" />', qr_code_base64(contenu_qr(obj)))
         return "Pas de QR code"
     qr_code_image.short_description = "QR Code"
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class BilletsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'billets'
+
+    def ready(self):
+        from . import recherche  # noqa: F401 (signaux de la colonne de recherche)
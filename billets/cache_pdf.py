@@ -0,0 +1,143 @@
+# billets/cache_pdf.py
+"""
+Cache disque des PDF de billets, sous MEDIA_ROOT/BILLET_PDF_CACHE_DOSSIER.
+
+- Clé : (id billet, statut, date_modification) : un changement d'état produit une autre clé.
+- Fichiers préfixés par une empreinte de cle_finale : toute transition (même valider_par_cle,
+  qui ne connaît que la clé) peut invalider les entrées du billet ; le nom n'est pas devinable.
+- Taille bornée (BILLET_PDF_CACHE_MAX_OCTETS), éviction LRU : le mtime est rafraîchi à chaque lecture.
+- La taille est suivie par un compteur en mémoire (ajouts / suppressions de ce processus) :
+  l'inventaire du dossier (O(n) fichiers) n'a lieu que lorsque ce compteur dépasse la borne,
+  au premier usage, ou toutes les RECALAGE_ECRITURES écritures pour compter celles des autres
+  processus ; il tourne dans un thread d'arrière-plan, jamais dans le thread de la requête.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+RECALAGE_ECRITURES = 1000
+
+_verrou = threading.Lock()
+_taille = None  # octets estimés ; None = jamais inventorié par ce processus
+_ecritures = 0  # écritures depuis le dernier inventaire
+_eviction = None  # thread d'inventaire / éviction en cours
+
+
+def _dossier():
+    return Path(settings.MEDIA_ROOT) / getattr(settings, "BILLET_PDF_CACHE_DOSSIER", "cache/billets_pdf")
+
+
+def _prefixe(cle_finale):
+    return hashlib.sha256(cle_finale.encode("utf-8")).hexdigest()[:32]
+
+
+def _chemin(billet):
+    version = int(billet.date_modification.timestamp() * 1_000_000)
+    return _dossier() / f"{_prefixe(billet.cle_finale)}-{billet.pk}-{billet.statut}-{version}.pdf"
+
+
+def lire(billet):
+    """Chemin du PDF en cache pour l'état actuel du billet, ou None."""
+    chemin = _chemin(billet)
+    try:
+        os.utime(chemin)  # marque l'entrée comme récemment utilisée (LRU)
+    except FileNotFoundError:
+        return None
+    return chemin
+
+
+def ecrire(billet, contenu):
+    """Enregistre le PDF (écriture atomique) puis applique la borne de taille. None si échec disque."""
+    chemin = _chemin(billet)
+    try:
+        chemin.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=chemin.parent, suffix=".tmp", delete=False) as tmp:
+            tmp.write(contenu)
+        os.replace(tmp.name, chemin)
+    except OSError:
+        logger.warning("Cache PDF indisponible pour le billet %s", billet.pk, exc_info=True)
+        return None
+
+    if _noter(len(contenu), ecriture=True):
+        _planifier_eviction()
+    return chemin
+
+
+def invalider(*cles_finales):
+    """Supprime toutes les versions en cache des billets donnés."""
+    dossier = _dossier()
+    for cle in cles_finales:
+        for chemin in dossier.glob(f"{_prefixe(cle)}-*.pdf"):
+            try:
+                taille = chemin.stat().st_size
+                chemin.unlink()
+            except FileNotFoundError:
+                continue
+            _noter(-taille)
+
+
+def _limite():
+    return getattr(settings, "BILLET_PDF_CACHE_MAX_OCTETS", 512 * 1024 * 1024)
+
+
+def _noter(delta, ecriture=False):
+    """Met à jour la taille estimée ; True si un inventaire est nécessaire."""
+    global _taille, _ecritures
+    with _verrou:
+        if _taille is not None:
+            _taille += delta
+        if ecriture:
+            _ecritures += 1
+        return _taille is None or _taille > _limite() or _ecritures >= RECALAGE_ECRITURES
+
+
+def _planifier_eviction():
+    """Lance l'inventaire en arrière-plan, sauf s'il y en a déjà un en cours."""
+    global _eviction
+    with _verrou:
+        if _eviction is not None and _eviction.is_alive():
+            return
+        _eviction = threading.Thread(target=_evincer, name="cache-pdf-eviction", daemon=True)
+        _eviction.start()
+
+
+def _evincer():
+    """Inventaire du dossier (un stat par fichier) puis éviction LRU si la borne est dépassée."""
+    global _taille, _ecritures
+    limite = _limite()
+    entrees = []
+    try:
+        with os.scandir(_dossier()) as it:
+            for entree in it:
+                if not entree.name.endswith(".pdf"):
+                    continue
+                try:
+                    infos = entree.stat()
+                except FileNotFoundError:
+                    continue
+                entrees.append((infos.st_mtime, infos.st_size, entree.path))
+    except OSError:
+        logger.warning("Inventaire du cache PDF impossible", exc_info=True)
+        return
+    total = sum(taille for _, taille, _ in entrees)
+
+    # Les moins récemment utilisés d'abord, jusqu'à repasser sous 90 % de la borne
+    if total > limite:
+        for _, taille, chemin in sorted(entrees):
+            if total <= limite * 0.9:
+                break
+            try:
+                os.unlink(chemin)
+            except FileNotFoundError:
+                pass
+            total -= taille
+
+    with _verrou:
+        _taille, _ecritures = total, 0
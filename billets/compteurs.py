@@ -0,0 +1,168 @@
+# billets/compteurs.py
+"""
+Compteurs d'entrées (billets validés) par événement et par lieu d'utilisation.
+
+Tenus dans le cache Django, partagé entre workers (CACHE_URL, Redis : incr atomique ;
+LocMemCache propre au processus seulement sans CACHE_URL, en dev et tests ; voir core/settings.py
+et core/deployment_settings.py, où CACHE_URL est obligatoire).
+La base n'est lue que pour amorcer un compteur absent du cache (redémarrage, éviction :
+toute clé manquante est réamorcée, jamais lue comme 0), pas à chaque rafraîchissement
+d'un tableau de bord.
+Chaque incrément est aussi poussé sur le WebSocket (groupe "entrees_evenement_<id>"),
+depuis un thread dédié : la validation n'attend pas la couche de canaux.
+"""
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+from django.db.models import Count
+
+from offres.models import Offre
+from .models import EBillet
+
+logger = logging.getLogger(__name__)
+
+_PREFIXE = "billets:entrees"
+LIEU_PAR_DEFAUT = "Non spécifié"
+
+
+def groupe_evenement(evenement_id):
+    return f"entrees_evenement_{evenement_id}"
+
+
+def _cle_total(evenement_id):
+    return f"{_PREFIXE}:{evenement_id}"
+
+
+def _cle_lieu(evenement_id, lieu):
+    return f"{_PREFIXE}:{evenement_id}:{hashlib.sha1(lieu.encode('utf-8')).hexdigest()}"
+
+
+def _cle_lieux(evenement_id):
+    return f"{_PREFIXE}:{evenement_id}:lieux"
+
+
+def _utilises(evenement_id):
+    return EBillet.objects.filter(offre__evenement_id=evenement_id, statut="UTILISE").order_by()
+
+
+def _incrementer(cle, n, amorce):
+    """incr atomique ; compteur absent : amorcé depuis la base (qui inclut déjà les scans validés)."""
+    try:
+        return cache.incr(cle, n)
+    except ValueError:
+        pass
+    valeur = amorce()
+    if cache.add(cle, valeur, timeout=None):
+        return valeur
+    return cache.incr(cle, n)
+
+
+def _noter_lieu(evenement_id, lieu):
+    lieux = cache.get(_cle_lieux(evenement_id))
+    if lieux is not None and lieu not in lieux:
+        cache.set(_cle_lieux(evenement_id), lieux + [lieu], timeout=None)
+
+
+def evenements_des_offres(offre_ids):
+    """{offre_id: evenement_id}, mis en cache (une offre ne change pas d'événement)."""
+    cles = {offre_id: f"{_PREFIXE}:offre:{offre_id}" for offre_id in set(offre_ids)}
+    trouves = cache.get_many(list(cles.values()))
+    resultat = {offre_id: trouves[cle] for offre_id, cle in cles.items() if cle in trouves}
+
+    manquants = [offre_id for offre_id in cles if offre_id not in resultat]
+    if manquants:
+        lus = dict(Offre.objects.filter(pk__in=manquants).values_list("id", "evenement_id"))
+        cache.set_many({cles[offre_id]: evt for offre_id, evt in lus.items()}, timeout=None)
+        resultat.update(lus)
+    return resultat
+
+
+def enregistrer_entrees(entrees):
+    """
+    Comptabilise des validations : entrees = [(offre_id, lieu), ...].
+    À appeler après commit (les amorçages lisent la base).
+    """
+    evenements = evenements_des_offres(offre_id for offre_id, _ in entrees)
+
+    par_evenement = {}
+    for offre_id, lieu in entrees:
+        evt = evenements.get(offre_id)
+        if evt is not None:
+            lieux = par_evenement.setdefault(evt, {})
+            lieux[lieu] = lieux.get(lieu, 0) + 1
+
+    for evt, lieux in par_evenement.items():
+        total = _incrementer(_cle_total(evt), sum(lieux.values()), lambda: _utilises(evt).count())
+        par_lieu = {}
+        for lieu, n in lieux.items():
+            par_lieu[lieu] = _incrementer(
+                _cle_lieu(evt, lieu), n, lambda: _utilises(evt).filter(lieu_utilisation=lieu).count()
+            )
+            _noter_lieu(evt, lieu)
+        _diffuser(evt, total, par_lieu)
+
+
+def _amorcer(evenement_id):
+    """
+    Amorce depuis la base les compteurs absents du cache (add : un compteur présent n'est
+    pas écrasé) ; retourne la liste des lieux, complétée de ceux trouvés en base.
+    """
+    comptes = {}
+    for ligne in _utilises(evenement_id).values("lieu_utilisation").annotate(n=Count("id")):
+        lieu = ligne["lieu_utilisation"] or LIEU_PAR_DEFAUT
+        comptes[lieu] = comptes.get(lieu, 0) + ligne["n"]
+    cache.add(_cle_total(evenement_id), sum(comptes.values()), timeout=None)
+    for lieu, n in comptes.items():
+        cache.add(_cle_lieu(evenement_id, lieu), n, timeout=None)
+
+    lieux = cache.get(_cle_lieux(evenement_id)) or []
+    lieux = lieux + [lieu for lieu in comptes if lieu not in lieux]
+    cache.set(_cle_lieux(evenement_id), lieux, timeout=None)
+    return lieux
+
+
+def lire(evenement_id):
+    """Totaux de l'événement : {"evenement", "total", "par_lieu"} (base lue seulement à froid)."""
+    lieux = cache.get(_cle_lieux(evenement_id))
+    if lieux is None:
+        lieux = _amorcer(evenement_id)
+
+    cles = [_cle_total(evenement_id)] + [_cle_lieu(evenement_id, lieu) for lieu in lieux]
+    valeurs = cache.get_many(cles)
+    if len(valeurs) < len(cles):  # compteur évincé depuis l'amorçage
+        lieux = _amorcer(evenement_id)
+        cles = [_cle_total(evenement_id)] + [_cle_lieu(evenement_id, lieu) for lieu in lieux]
+        valeurs = cache.get_many(cles)
+    return {
+        "evenement": evenement_id,
+        "total": valeurs.get(_cle_total(evenement_id), 0),
+        "par_lieu": {lieu: valeurs.get(_cle_lieu(evenement_id, lieu), 0) for lieu in lieux},
+    }
+
+
+_diffusion = None
+
+
+def _diffuser(evenement_id, total, par_lieu):
+    """Pousse les nouveaux totaux aux tableaux de bord abonnés ; ne bloque jamais une validation."""
+    global _diffusion
+    if _diffusion is None:
+        _diffusion = ThreadPoolExecutor(max_workers=1, thread_name_prefix="entrees")
+    _diffusion.submit(_envoyer, evenement_id, total, par_lieu)
+
+
+def _envoyer(evenement_id, total, par_lieu):
+    couche = get_channel_layer()
+    if couche is None:
+        return
+    try:
+        async_to_sync(couche.group_send)(
+            groupe_evenement(evenement_id),
+            {"type": "entrees.maj", "evenement": evenement_id, "total": total, "par_lieu": par_lieu},
+        )
+    except Exception:
+        logger.warning("Diffusion des entrées impossible (événement %s)", evenement_id, exc_info=True)
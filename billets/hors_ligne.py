@@ -0,0 +1,102 @@
+# billets/hors_ligne.py
+"""
+Pack de validation hors ligne pour les portiques d'un événement.
+
+Le portique télécharge l'index compact des billets VALIDE, pré-valide localement,
+puis remonte ses scans via POST /api/billets/valider-lot/ (réconciliation serveur).
+
+Format binaire (big-endian) :
+    en-tête : b"JOPK" | format (u8) | type (u8 : 0 complet, 1 delta) | evenement (u32)
+              | version (u64, ms epoch) | depuis (u64, 0 pour un pack complet)
+    section : nombre (u32) puis les empreintes de 8 octets, triées
+              - pack complet : une section (billets valides)
+              - delta        : deux sections (ajouts, puis retraits)
+
+Empreinte = blake2b(cle_finale) tronqué à 8 octets : ~8 Mo par million de billets.
+"""
+import hashlib
+import struct
+import sys
+import time
+from array import array
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from .models import EBillet
+
+MAGIC = b"JOPK"
+FORMAT = 1
+TYPE_COMPLET = 0
+TYPE_DELTA = 1
+
+# Recouvrement des deltas : couvre les transactions validées juste après la version précédente
+MARGE_DELTA = timedelta(seconds=60)
+
+
+def empreinte(cle_finale):
+    return hashlib.blake2b(cle_finale.encode("utf-8"), digest_size=8, person=b"jo-etickets").digest()
+
+
+def version_courante():
+    return int(time.time() * 1000)
+
+
+def _seaux():
+    # 256 seaux indexés par l'octet de poids fort : tri par seau, mémoire ~8 octets par billet
+    return [array("Q") for _ in range(256)]
+
+
+def _ajouter(seaux, cle_finale):
+    valeur = int.from_bytes(empreinte(cle_finale), "big")
+    seaux[valeur >> 56].append(valeur)
+
+
+def _section(seaux):
+    yield struct.pack(">I", sum(len(seau) for seau in seaux))
+    for seau in seaux:
+        if not seau:
+            continue
+        trie = array("Q", sorted(seau))
+        if sys.byteorder == "little":
+            trie.byteswap()
+        yield trie.tobytes()
+
+
+def _billets_evenement(evenement_id):
+    return EBillet.objects.filter(offre__evenement_id=evenement_id).order_by()
+
+
+def iter_pack(evenement_id, depuis=None):
+    """
+    Générateur du pack (complet, ou delta si `depuis` est une version précédente en ms).
+    Retourne (version, générateur d'octets).
+    """
+    version = version_courante()
+
+    if depuis is None:
+        valides = _seaux()
+        cles = _billets_evenement(evenement_id).filter(statut="VALIDE").values_list("cle_finale", flat=True)
+        for cle in cles.iterator(chunk_size=5000):
+            _ajouter(valides, cle)
+
+        def generer():
+            yield struct.pack(">4sBBIQQ", MAGIC, FORMAT, TYPE_COMPLET, evenement_id, version, 0)
+            yield from _section(valides)
+
+        return version, generer()
+
+    ajouts, retraits = _seaux(), _seaux()
+    seuil = datetime.fromtimestamp(depuis / 1000, tz=dt_timezone.utc) - MARGE_DELTA
+    lignes = (
+        _billets_evenement(evenement_id)
+        .filter(date_modification__gt=seuil)
+        .values_list("cle_finale", "statut")
+    )
+    for cle, statut in lignes.iterator(chunk_size=5000):
+        _ajouter(ajouts if statut == "VALIDE" else retraits, cle)
+
+    def generer():
+        yield struct.pack(">4sBBIQQ", MAGIC, FORMAT, TYPE_DELTA, evenement_id, version, depuis)
+        yield from _section(ajouts)
+        yield from _section(retraits)
+
+    return version, generer()
@@ -0,0 +1,37 @@
+# billets/management/commands/bench_qr_signe.py
+import time
+import uuid
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from billets.signature import QRInvalide, signer, verifier
+
+
+class Command(BaseCommand):
+    help = "Mesure le débit de vérification des QR signés (pur Python, un cœur)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--nombre", type=int, default=100000, help="Nombre de charges vérifiées.")
+
+    def handle(self, *args, **options):
+        nombre = options["nombre"]
+        jour = date.today()
+        charges = [signer(i + 1, (i % 50) + 1, jour, str(uuid.uuid4())) for i in range(nombre)]
+        # Une charge sur dix falsifiée : le rejet doit coûter autant que l'acceptation
+        for i in range(0, nombre, 10):
+            charges[i] = charges[i][:-2] + ("AA" if not charges[i].endswith("AA") else "BB")
+
+        rejets = 0
+        debut = time.perf_counter()
+        for charge in charges:
+            try:
+                verifier(charge)
+            except QRInvalide:
+                rejets += 1
+        duree = time.perf_counter() - debut
+
+        self.stdout.write(
+            f"{nombre} vérifications en {duree:.3f} s : {nombre / duree:,.0f} QR/s par cœur "
+            f"({duree / nombre * 1e6:.1f} µs/QR, {rejets} faux rejetés)"
+        )
@@ -0,0 +1,61 @@
+# billets/management/commands/bench_rendu.py
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from billets.pdf import rendre_pdf
+from billets.qr import rendre_png
+
+
+def _donnees(i):
+    return (f"EBILLET-{i:010d}", "visiteur", "Finale 100m - SOLO", "95.00", "VALIDE", "01/08/2024 20:00", str(uuid.uuid4()))
+
+
+def _billet_complet(donnees):
+    # Le PDF du billet + le PNG du QR : le coût CPU d'un billet après une vente
+    rendre_png(donnees[-1])
+    return len(rendre_pdf([donnees]))
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le débit de rendu des billets (QR PNG + PDF) par cœur, avec et sans pool de processus. "
+        "Le pool est plafonné au nombre de cœurs (comme BILLET_RENDU_PROCESSUS) et reçoit le travail "
+        "par lots : seule la taille du PDF revient au processus principal, l'IPC ne domine pas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--billets", type=int, default=400, help="Nombre de billets rendus par mesure.")
+        parser.add_argument("--processus", type=int, default=os.cpu_count() or 1, help="Taille maximale du pool.")
+
+    def handle(self, *args, **options):
+        nombre = options["billets"]
+        coeurs = os.cpu_count() or 1
+        donnees = [_donnees(i) for i in range(nombre)]
+
+        _billet_complet(donnees[0])  # polices et imports chargés hors mesure
+        debut = time.perf_counter()
+        for d in donnees:
+            _billet_complet(d)
+        direct = nombre / (time.perf_counter() - debut)
+        self.stdout.write(f"{coeurs} cœur(s) ; direct (1 cœur)     : {direct:8.1f} billets/s")
+
+        maximum = min(options["processus"], coeurs)
+        if maximum < 2:
+            self.stdout.write("Un seul cœur disponible : le pool ne peut pas accélérer le rendu (laisser BILLET_RENDU_PROCESSUS=0).")
+        for taille in sorted({1, 2, 4, maximum} & set(range(1, maximum + 1))):
+            # ~4 lots par processus : peu d'allers-retours, charge encore équilibrée
+            lot = max(1, nombre // (4 * taille))
+            with ProcessPoolExecutor(max_workers=taille, mp_context=multiprocessing.get_context("spawn")) as pool:
+                list(pool.map(_billet_complet, donnees[:taille]))  # démarrage des processus hors mesure
+                debut = time.perf_counter()
+                list(pool.map(_billet_complet, donnees, chunksize=lot))
+                debit = nombre / (time.perf_counter() - debut)
+            self.stdout.write(
+                f"pool {taille:2d} processus : {debit:8.1f} billets/s "
+                f"({debit / taille:.1f} par cœur, x{debit / direct:.2f} / direct, lots de {lot})"
+            )
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:01
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billets', '0003_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='ebillet',
+            name='qr_code',
+        ),
+    ]
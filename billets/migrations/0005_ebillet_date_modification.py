@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billets', '0004_remove_ebillet_qr_code'),
+        ('offres', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ebillet',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, help_text='Dernière modification (statut compris), base des deltas du pack hors ligne.'),
+        ),
+        migrations.AddIndex(
+            model_name='ebillet',
+            index=models.Index(fields=['offre', 'date_modification'], name='e_billet_offre_i_f99ea5_idx'),
+        ),
+    ]
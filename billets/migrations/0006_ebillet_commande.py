@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billets', '0005_ebillet_date_modification'),
+        ('commandes', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ebillet',
+            name='commande',
+            field=models.ForeignKey(blank=True, help_text='Commande ayant émis ce billet.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ebillets', to='commandes.commande'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billets', '0006_ebillet_commande'),
+        ('commandes', '0003_index_pagination_curseur'),
+        ('offres', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ebillet',
+            index=models.Index(fields=['date_achat', 'id'], name='e_billet_date_ac_b43541_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ebillet',
+            index=models.Index(fields=['utilisateur', 'date_achat', 'id'], name='e_billet_utilisa_380410_idx'),
+        ),
+    ]
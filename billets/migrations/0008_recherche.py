@@ -0,0 +1,63 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:11
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Concat, Lower
+
+from core.recherche import creer_index_recherche, supprimer_index_recherche
+
+
+def creer_index(apps, schema_editor):
+    creer_index_recherche(schema_editor, "e_billet")
+
+
+def supprimer_index(apps, schema_editor):
+    supprimer_index_recherche(schema_editor, "e_billet")
+
+
+def remplir(apps, schema_editor):
+    """Texte de billets/recherche.py à la date de la migration, par tranches d'id (modèles historiques)."""
+    EBillet = apps.get_model("billets", "EBillet")
+    Offre = apps.get_model("offres", "Offre")
+    Utilisateur = apps.get_model(settings.AUTH_USER_MODEL)
+
+    utilisateur = Utilisateur.objects.filter(pk=OuterRef("utilisateur_id"))
+    offre = Offre.objects.filter(pk=OuterRef("offre_id"))
+    texte = Lower(
+        Concat(
+            F("numero_billet"),
+            Value(" "),
+            Subquery(utilisateur.values("username")[:1]),
+            Value(" "),
+            Subquery(utilisateur.values("email")[:1]),
+            Value(" "),
+            Subquery(offre.values("nom_offre")[:1]),
+            output_field=TextField(),
+        )
+    )
+
+    dernier = 0
+    while True:
+        ids = list(EBillet.objects.filter(pk__gt=dernier).order_by("pk").values_list("pk", flat=True)[:10_000])
+        if not ids:
+            return
+        EBillet.objects.filter(pk__in=ids).update(recherche=texte)
+        dernier = ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billets', '0007_index_pagination_curseur'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ebillet',
+            name='recherche',
+            field=models.TextField(blank=True, default='', editable=False, help_text='Numéro, utilisateur, email et offre en minuscules (index de recherche, voir billets/recherche.py).'),
+        ),
+        migrations.RunPython(remplir, migrations.RunPython.noop),
+        migrations.RunPython(creer_index, supprimer_index),
+    ]
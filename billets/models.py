@@ -1,7 +1,7 @@
 # billets/models.py
 from django.db import models
 from django.conf import settings
-import uuid, qrcode, io, base64
+import uuid
 
 
 # ---------- Générateurs utilitaires ----------
@@ -23,7 +23,7 @@ def generate_cle_achat():
 class EBillet(models.Model):
     """
     Représente un e-billet individuel, lié à une offre et un utilisateur.
-    Chaque billet possède un QR code unique encodé en base64.
+    Le QR code n'est pas stocké : il est rendu à la demande depuis cle_finale (voir billets/qr.py).
     """
 
     STATUTS = [
@@ -47,6 +47,15 @@ class EBillet(models.Model):
         help_text="Offre ou pack lié à ce billet."
     )
 
+    commande = models.ForeignKey(
+        'commandes.Commande',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='ebillets',
+        help_text="Commande ayant émis ce billet."
+    )
+
     validateur = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.SET_NULL,
@@ -83,11 +92,6 @@ class EBillet(models.Model):
         help_text="Clé finale utilisée pour le QR code et la validation."
     )
 
-    qr_code = models.TextField(
-        blank=True,
-        help_text="Image du QR code encodée en base64."
-    )
-
     prix_paye = models.DecimalField(
         max_digits=8,
         decimal_places=2,
@@ -116,6 +120,18 @@ class EBillet(models.Model):
         help_text="Lieu où le billet a été validé (ex: Entrée A)."
     )
 
+    date_modification = models.DateTimeField(
+        auto_now=True,
+        help_text="Dernière modification (statut compris), base des deltas du pack hors ligne."
+    )
+
+    recherche = models.TextField(
+        blank=True,
+        default="",
+        editable=False,
+        help_text="Numéro, utilisateur, email et offre en minuscules (index de recherche, voir billets/recherche.py)."
+    )
+
     class Meta:
         db_table = 'e_billet'
         indexes = [
@@ -123,6 +139,10 @@ class EBillet(models.Model):
             models.Index(fields=['cle_finale']),
             models.Index(fields=['statut']),
             models.Index(fields=['date_utilisation']),
+            models.Index(fields=['offre', 'date_modification']),
+            # Pagination par curseur (liste staff / liste d'un utilisateur)
+            models.Index(fields=['date_achat', 'id']),
+            models.Index(fields=['utilisateur', 'date_achat', 'id']),
         ]
         ordering = ['-date_achat']
         verbose_name = "E-Billet"
@@ -130,19 +150,11 @@ class EBillet(models.Model):
 
     def save(self, *args, **kwargs):
         """
-        Génère automatiquement le QR code et la clé finale lors de la création.
+        Garantit la présence de la clé finale (source du QR code) lors de la création.
         """
-        # Générer la clé finale avant le QR si elle n'existe pas
         if not self.cle_finale:
             self.cle_finale = generate_uuid()
 
-        # Générer le QR code une seule fois
-        if not self.qr_code and self.cle_finale:
-            qr = qrcode.make(self.cle_finale)
-            buffer = io.BytesIO()
-            qr.save(buffer, format='PNG')
-            self.qr_code = base64.b64encode(buffer.getvalue()).decode('ascii')
-
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -0,0 +1,116 @@
+# billets/pdf.py
+"""
+Rendu PDF des e-billets avec ReportLab.
+
+- Un canvas par document, une page par billet (showPage() après chaque billet) ;
+- QR vectoriel (reportlab.graphics.barcode.qr) : aucune image PIL/PNG embarquée ;
+- police TrueType embarquée (DejaVu Sans si présente, sinon Vera livrée avec ReportLab) :
+  noms et offres en Unicode, sans repli cp1252 ;
+- rendre_pdf() ne reçoit que des valeurs primitives (donnees_page) : exécutable dans le pool
+  de rendu (billets/rendu.py).
+ReportLab n'écrit le fichier qu'à save() : le document est d'abord composé page après page
+(pages compressées gardées en mémoire), puis envoyé par morceaux (iter_pdf_billets).
+"""
+import io
+from functools import lru_cache
+
+from reportlab.graphics import renderPDF
+from reportlab.graphics.barcode.qr import QrCodeWidget
+from reportlab.graphics.shapes import Drawing
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFError, TTFont
+from reportlab.pdfgen import canvas
+
+from .qr import contenu_qr
+from .rendu import soumettre, nombre_processus
+
+LARGEUR, HAUTEUR = A4
+TAILLE_QR = 200
+TAILLE_MORCEAU = 64 * 1024
+
+# Cherchées dans rl_config.TTFSearchPath (polices système, puis celles de ReportLab)
+POLICES = ("DejaVuSans-Bold.ttf", "VeraBd.ttf")
+
+
+def donnees_page(billet):
+    """Valeurs primitives d'une page : découple le rendu des modèles (sérialisable)."""
+    return (
+        billet.numero_billet,
+        billet.utilisateur.username,
+        billet.offre.nom_offre,
+        str(billet.prix_paye),
+        billet.statut,
+        billet.date_achat.strftime("%d/%m/%Y %H:%M"),
+        contenu_qr(billet),
+    )
+
+
+@lru_cache(maxsize=None)
+def _police():
+    """Enregistre la première police TrueType disponible (une fois par processus) ; retourne son nom."""
+    for fichier in POLICES:
+        try:
+            pdfmetrics.registerFont(TTFont("Billet", fichier))
+            return "Billet"
+        except TTFError:  # fichier absent ou illisible
+            continue
+    return "Helvetica-Bold"
+
+
+def _dessiner_qr(c, contenu, x, y, taille):
+    # Taille fixée sur le widget (pas de getBounds(), qui encode le QR une seconde fois)
+    dessin = Drawing(taille, taille)
+    dessin.add(QrCodeWidget(contenu, barLevel="M", barWidth=taille, barHeight=taille))
+    renderPDF.draw(dessin, c, x, y)
+
+
+def dessiner_billet(c, donnees):
+    """Dessine la page d'un billet sur le canvas puis la termine (showPage)."""
+    numero, utilisateur, offre, prix, statut, date_achat, contenu = donnees
+
+    x, y = 50, HAUTEUR - 50
+    line_height = 25
+    lignes = [
+        f"E-Billet : {numero}",
+        f"Utilisateur : {utilisateur}",
+        f"Offre : {offre}",
+        f"Prix payé : {prix} €",
+        f"Statut : {statut}",
+        f"Date d'achat : {date_achat}",
+    ]
+
+    c.setFont(_police(), 16)
+    for i, ligne in enumerate(lignes):
+        c.drawString(x, y - i * line_height, ligne)
+    y -= (len(lignes) - 1) * line_height
+
+    _dessiner_qr(c, contenu, x, y - 220, TAILLE_QR)
+    c.showPage()
+
+
+def rendre_pdf(pages):
+    """PDF complet (octets) : une page par élément de `pages` (tuples de donnees_page)."""
+    tampon = io.BytesIO()
+    c = canvas.Canvas(tampon, pagesize=A4, pageCompression=1)
+    for donnees in pages:
+        dessiner_billet(c, donnees)
+    c.save()
+    return tampon.getvalue()
+
+
+def iter_pdf_billets(billets):
+    """
+    PDF multi-pages d'un itérable de billets, envoyé par morceaux de TAILLE_MORCEAU.
+    Avec un pool de rendu, le document est composé dans un processus du pool (attente
+    d'une place sans limite, comme un téléchargement) ; sinon dans le thread courant.
+    """
+    pages = [donnees_page(billet) for billet in billets]
+    if nombre_processus():
+        pdf = soumettre(rendre_pdf, pages).result()
+    else:
+        pdf = rendre_pdf(pages)
+
+    vue = memoryview(pdf)
+    for debut in range(0, len(vue), TAILLE_MORCEAU):
+        yield bytes(vue[debut:debut + TAILLE_MORCEAU])
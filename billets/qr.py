@@ -0,0 +1,47 @@
+# billets/qr.py
+import base64
+import hashlib
+import io
+from functools import lru_cache
+
+import qrcode
+from django.conf import settings
+
+from .rendu import executer
+from .signature import signer_billet
+
+
+def contenu_qr(billet):
+    """
+    Donnée encodée dans le QR code d'un billet :
+    clé brute, ou charge signée vérifiable sans base si BILLET_QR_FORMAT = "SIGNE".
+    """
+    if getattr(settings, "BILLET_QR_FORMAT", "CLE") == "SIGNE":
+        return signer_billet(billet)
+    return billet.cle_finale
+
+
+def rendre_png(contenu):
+    """Rendu PNG brut du QR code (exécuté dans le pool de rendu, voir billets/rendu.py)."""
+    qr = qrcode.make(contenu)
+    buffer = io.BytesIO()
+    qr.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@lru_cache(maxsize=getattr(settings, "BILLET_QR_CACHE_TAILLE", 2048))
+def qr_code_png(contenu):
+    """
+    QR code en PNG, rendu à la demande hors du thread de la requête.
+    Le résultat ne dépend que du contenu : il est mis en cache (LRU) par processus.
+    """
+    return executer(rendre_png, contenu)
+
+
+def qr_code_base64(contenu):
+    return base64.b64encode(qr_code_png(contenu)).decode("ascii")
+
+
+def qr_code_etag(contenu):
+    """ETag stable : l'image est entièrement déterminée par le contenu encodé."""
+    return '"qr-%s"' % hashlib.sha256(contenu.encode("utf-8")).hexdigest()[:32]
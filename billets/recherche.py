@@ -0,0 +1,81 @@
+# billets/recherche.py
+"""
+Colonne de recherche dénormalisée des e-billets (voir core/recherche.py).
+
+- Création / sauvegarde d'un billet : texte calculé en Python (pre_save) ;
+  les émissions groupées (bulk_create) le calculent elles-mêmes via texte_billet().
+- Changement d'username/email ou de nom d'offre : un seul UPDATE recalcule
+  la colonne en base pour les billets concernés.
+"""
+from django.conf import settings
+from django.db.models import F, OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Concat, Lower
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+
+from core.recherche import normaliser
+from offres.models import Offre
+from users.models import Utilisateur
+from .models import EBillet
+
+
+def texte_billet(billet, utilisateur=None, offre=None):
+    utilisateur = utilisateur or billet.utilisateur
+    offre = offre or billet.offre
+    return normaliser(billet.numero_billet, utilisateur.username, utilisateur.email, offre.nom_offre)
+
+
+def expression_billet():
+    """Même texte que texte_billet(), calculé par la base (UPDATE sans relire les lignes)."""
+    utilisateur = Utilisateur.objects.filter(pk=OuterRef("utilisateur_id"))
+    offre = Offre.objects.filter(pk=OuterRef("offre_id"))
+    return Lower(
+        Concat(
+            F("numero_billet"),
+            Value(" "),
+            Subquery(utilisateur.values("username")[:1]),
+            Value(" "),
+            Subquery(utilisateur.values("email")[:1]),
+            Value(" "),
+            Subquery(offre.values("nom_offre")[:1]),
+            output_field=TextField(),
+        )
+    )
+
+
+def reindexer(queryset=None, taille_lot=10_000):
+    """Recalcule la colonne par tranches d'id (évite un UPDATE géant sur toute la table)."""
+    queryset = (queryset if queryset is not None else EBillet.objects.all()).order_by()
+    total = 0
+    dernier = 0
+    while True:
+        ids = list(queryset.filter(pk__gt=dernier).order_by("pk").values_list("pk", flat=True)[:taille_lot])
+        if not ids:
+            return total
+        total += EBillet.objects.filter(pk__in=ids).update(recherche=expression_billet())
+        dernier = ids[-1]
+
+
+def _concerne(update_fields, champs):
+    return update_fields is None or bool(set(update_fields) & champs)
+
+
+@receiver(pre_save, sender=EBillet)
+def maj_recherche_billet(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw or update_fields is not None:
+        return
+    instance.recherche = texte_billet(instance)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def reindexer_billets_utilisateur(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw or created or not _concerne(update_fields, {"username", "email"}):
+        return
+    EBillet.objects.filter(utilisateur=instance).update(recherche=expression_billet())
+
+
+@receiver(post_save, sender=Offre)
+def reindexer_billets_offre(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw or created or not _concerne(update_fields, {"nom_offre"}):
+        return
+    reindexer(EBillet.objects.filter(offre=instance))
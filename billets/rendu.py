@@ -0,0 +1,69 @@
+# billets/rendu.py
+"""
+Service de rendu (QR PNG, PDF de billets) adossé à un pool de processus.
+
+Le rendu est CPU : exécuté dans le thread de la requête, il bloque un worker gunicorn/uvicorn.
+Ici, QR et PDF sont soumis à un ProcessPoolExecutor partagé par le processus :
+- BILLET_RENDU_PROCESSUS : taille du pool (0 = rendu direct dans le thread, ex. dev/tests),
+  plafonnée au nombre de cœurs : au-delà, les processus se partagent les mêmes cœurs et
+  le coût de pickling/IPC s'ajoute sans gain (mesure : commande bench_rendu) ;
+- BILLET_RENDU_FILE_MAX  : tâches en vol au maximum (file bornée) ;
+- BILLET_RENDU_ATTENTE   : secondes d'attente d'une place avant RenduSature (-> 503).
+Les fonctions soumises ne manipulent que des valeurs primitives (aucun modèle, aucune requête).
+"""
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+
+_verrou = threading.Lock()
+_pool = None
+_places = None
+
+
+class RenduSature(Exception):
+    """File de rendu pleine : le client doit réessayer plus tard."""
+
+
+def nombre_processus():
+    return min(getattr(settings, "BILLET_RENDU_PROCESSUS", 0), os.cpu_count() or 1)
+
+
+def _executeur():
+    global _pool, _places
+    with _verrou:
+        if _pool is None:
+            _places = threading.BoundedSemaphore(getattr(settings, "BILLET_RENDU_FILE_MAX", 64))
+            _pool = ProcessPoolExecutor(
+                max_workers=nombre_processus(),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+        return _pool, _places
+
+
+def soumettre(fonction, *args, attente=None):
+    """
+    Soumet une tâche au pool en respectant la file bornée (contre-pression).
+    attente=None : bloque jusqu'à obtenir une place ; sinon RenduSature après `attente` secondes.
+    """
+    pool, places = _executeur()
+    if not places.acquire(timeout=attente):
+        raise RenduSature("File de rendu saturée.")
+    try:
+        future = pool.submit(fonction, *args)
+    except BaseException:
+        places.release()
+        raise
+    future.add_done_callback(lambda _: places.release())
+    return future
+
+
+def executer(fonction, *args):
+    """Rendu unitaire (requête HTTP) : attente bornée, puis RenduSature."""
+    if not nombre_processus():
+        return fonction(*args)
+    return soumettre(fonction, *args, attente=getattr(settings, "BILLET_RENDU_ATTENTE", 2.0)).result()
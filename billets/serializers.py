@@ -1,10 +1,12 @@
 from rest_framework import serializers
+from rest_framework.reverse import reverse
 from .models import EBillet
 
 
 class EBilletSerializer(serializers.ModelSerializer):
     utilisateur_nom = serializers.SerializerMethodField()
     offre_nom = serializers.SerializerMethodField()
+    qr_code_url = serializers.SerializerMethodField()
 
     class Meta:
         model = EBillet
@@ -21,12 +23,12 @@ class EBilletSerializer(serializers.ModelSerializer):
             "statut",
             "date_utilisation",
             "lieu_utilisation",
-            "qr_code",
+            "qr_code_url",
         ]
         read_only_fields = [
             "numero_billet",
             "date_achat",
-            "qr_code",
+            "qr_code_url",
             "utilisateur_nom",
             "offre_nom",
         ]
@@ -40,6 +42,10 @@ class EBilletSerializer(serializers.ModelSerializer):
         o = obj.offre
         return getattr(o, "nom_offre", str(o.id))
 
+    def get_qr_code_url(self, obj):
+        # Le QR n'est plus embarqué dans la réponse : on pointe vers l'image rendue à la demande
+        return reverse("ebillets-telecharger", args=[obj.pk], request=self.context.get("request"))
+
 
 class EBilletAdminSerializer(EBilletSerializer):
     class Meta(EBilletSerializer.Meta):
@@ -50,4 +56,15 @@ class EBilletAdminSerializer(EBilletSerializer):
         read_only_fields = EBilletSerializer.Meta.read_only_fields + [
             "cle_achat",
             "cle_finale",
-        ]
\ No newline at end of file
+        ]
+
+
+class ScanSerializer(serializers.Serializer):
+    cle_finale = serializers.CharField(max_length=128)
+    lieu_utilisation = serializers.CharField(max_length=200, required=False, allow_blank=True)
+    scanned_at = serializers.DateTimeField(required=False)
+
+
+class ValiderLotSerializer(serializers.Serializer):
+    scans = ScanSerializer(many=True, allow_empty=False, max_length=500)
+    offres = serializers.ListField(child=serializers.IntegerField(), required=False)
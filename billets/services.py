@@ -0,0 +1,193 @@
+# billets/services.py
+from django.db import connections, transaction
+from django.db.models import Case, When, Value, CharField, DateTimeField
+from django.utils import timezone
+
+from . import cache_pdf, compteurs
+from .models import EBillet
+from .recherche import texte_billet
+from .signature import QRInvalide, filtre_scan
+
+
+def emettre_billets_commande(cmd, lignes):
+    """
+    Émet tous les e-billets d'une commande payée en une seule écriture.
+    - Numéros et clés générés en mémoire (defaults du modèle).
+    - Un seul INSERT via bulk_create, quel que soit le nombre de personnes.
+    - Aucun rendu de QR code ici : il est fait à la demande (billets/qr.py).
+    """
+    billets = [
+        EBillet(
+            utilisateur_id=cmd.utilisateur_id,
+            commande_id=cmd.pk,
+            offre=ligne.offre,
+            prix_paye=ligne.prix_unitaire,
+            statut="VALIDE",
+        )
+        for ligne in lignes
+        for _ in range(int(ligne.quantite) * int(ligne.offre.nb_personnes or 1))
+    ]
+    if not billets:
+        return []
+
+    # bulk_create n'émet pas pre_save : colonne de recherche renseignée ici
+    for billet in billets:
+        billet.recherche = texte_billet(billet, cmd.utilisateur, billet.offre)
+
+    EBillet.objects.bulk_create(billets)
+    return billets
+
+
+def valider_billet(validateur, lieu_utilisation=None, **filtre):
+    """
+    Passe un billet VALIDE à UTILISE en un seul UPDATE conditionnel :
+        UPDATE e_billet SET statut='UTILISE', ... WHERE <filtre> AND statut='VALIDE'
+    Le nombre de lignes modifiées décide seul de l'acceptation : deux portiques
+    scannant le même billet au même instant ne peuvent pas réussir tous les deux.
+    Scan par clé brute sur PostgreSQL / SQLite >= 3.35 : l'offre est relue par UPDATE ... RETURNING
+    (requête SQL explicite, _VALIDER_PAR_CLE), sans autre requête.
+    """
+    lieu_utilisation = lieu_utilisation or compteurs.LIEU_PAR_DEFAUT
+    maintenant = timezone.now()
+    qs = EBillet.objects.filter(statut="VALIDE", **filtre)
+    valeurs = {
+        "statut": "UTILISE",
+        "lieu_utilisation": lieu_utilisation,
+        "date_utilisation": maintenant,
+        "date_modification": maintenant,
+        "validateur": validateur,
+    }
+    offre_id = filtre.get("offre_id")
+    if set(filtre) == {"cle_finale"} and _update_returning_possible(qs.db):
+        # Scan par clé brute : l'offre (pour les compteurs) est relue par le même UPDATE
+        offres = _valider_par_cle(qs.db, filtre["cle_finale"], valeurs)
+        modifies = len(offres)
+        offre_id = offres[0] if offres else None
+    else:
+        modifies = qs.update(**valeurs)
+    if modifies != 1:
+        return False
+
+    def apres_validation():
+        if "cle_finale" in filtre:
+            cache_pdf.invalider(filtre["cle_finale"])
+        # Moteur sans UPDATE ... RETURNING (MySQL/MariaDB) : offre relue par clé unique
+        offre = offre_id or EBillet.objects.filter(**filtre).values_list("offre_id", flat=True).first()
+        compteurs.enregistrer_entrees([(offre, lieu_utilisation)])
+
+    transaction.on_commit(apres_validation)
+    return True
+
+
+# Même UPDATE que qs.update(**valeurs) de valider_billet, plus RETURNING (PostgreSQL, SQLite >= 3.35)
+_VALIDER_PAR_CLE = (
+    "UPDATE e_billet SET statut = 'UTILISE', lieu_utilisation = %s, date_utilisation = %s,"
+    " date_modification = %s, validateur_id = %s"
+    " WHERE cle_finale = %s AND statut = 'VALIDE'"
+    " RETURNING offre_id"
+)
+
+
+def _update_returning_possible(alias):
+    connexion = connections[alias]
+    if connexion.vendor == "postgresql":
+        return True
+    return connexion.vendor == "sqlite" and connexion.Database.sqlite_version_info >= (3, 35)
+
+
+def _valider_par_cle(alias, cle_finale, valeurs):
+    """Exécute _VALIDER_PAR_CLE ; retourne les offre_id des billets passés à UTILISE (0 ou 1)."""
+    connexion = connections[alias]
+    params = [
+        valeurs["lieu_utilisation"],
+        connexion.ops.adapt_datetimefield_value(valeurs["date_utilisation"]),
+        connexion.ops.adapt_datetimefield_value(valeurs["date_modification"]),
+        getattr(valeurs["validateur"], "pk", None),
+        cle_finale,
+    ]
+    with connexion.cursor() as cursor:
+        cursor.execute(_VALIDER_PAR_CLE, params)
+        return [ligne[0] for ligne in cursor.fetchall()]
+
+
+def valider_billets_par_lot(validateur, scans, offres=None):
+    """
+    Valide un lot de scans remontés par un portique (ex: après une coupure réseau).
+    Chaque scan : {"cle_finale", "lieu_utilisation" (optionnel), "scanned_at" (optionnel)} ;
+    cle_finale peut être une clé brute ou une charge signée (billets/signature.py).
+
+    Deux requêtes quelle que soit la taille du lot :
+    - un SELECT ... FOR UPDATE des clés connues (statut actuel de chacune) ;
+    - un seul UPDATE ensembliste (CASE par clé pour le lieu et l'heure de scan).
+    Retourne un résultat par scan, dans l'ordre reçu :
+    ACCEPTE, DOUBLON (même clé plus haut dans le lot), INTROUVABLE, le statut bloquant,
+    ou le code de rejet d'une charge signée (INVALIDE, AUTRE_JOUR, AUTRE_OFFRE).
+    """
+    resultats = []
+    a_valider = {}
+
+    # Les charges signées sont contrôlées sans requête ; seules les clés plausibles vont en base
+    cles = []
+    for scan in scans:
+        try:
+            cles.append(filtre_scan(scan["cle_finale"], offres)["cle_finale"])
+        except QRInvalide as e:
+            cles.append(e)
+
+    with transaction.atomic():
+        statuts = (
+            EBillet.objects.select_for_update()
+            .filter(cle_finale__in={cle for cle in cles if isinstance(cle, str)})
+            .values_list("cle_finale", "statut", "offre_id")
+        )
+        statuts = {cle: (statut, offre_id) for cle, statut, offre_id in statuts}
+
+        for scan, cle in zip(scans, cles):
+            statut, _ = statuts.get(cle, (None, None)) if isinstance(cle, str) else (None, None)
+            if isinstance(cle, QRInvalide):
+                resultat = cle.code
+            elif statut is None:
+                resultat = "INTROUVABLE"
+            elif cle in a_valider:
+                resultat = "DOUBLON"
+            elif statut != "VALIDE":
+                resultat = statut
+            else:
+                a_valider[cle] = scan
+                resultat = "ACCEPTE"
+            resultats.append({"cle_finale": scan["cle_finale"], "resultat": resultat})
+
+        if a_valider:
+            maintenant = timezone.now()
+            EBillet.objects.filter(cle_finale__in=list(a_valider), statut="VALIDE").update(
+                statut="UTILISE",
+                validateur=validateur,
+                date_modification=maintenant,
+                lieu_utilisation=Case(
+                    *[
+                        When(cle_finale=cle, then=Value(scan.get("lieu_utilisation") or compteurs.LIEU_PAR_DEFAUT))
+                        for cle, scan in a_valider.items()
+                    ],
+                    output_field=CharField(),
+                ),
+                date_utilisation=Case(
+                    *[
+                        When(cle_finale=cle, then=Value(scan.get("scanned_at") or maintenant))
+                        for cle, scan in a_valider.items()
+                    ],
+                    output_field=DateTimeField(),
+                ),
+            )
+            entrees = [
+                (statuts[cle][1], scan.get("lieu_utilisation") or compteurs.LIEU_PAR_DEFAUT)
+                for cle, scan in a_valider.items()
+            ]
+            cles_validees = list(a_valider)
+
+            def apres_validation():
+                cache_pdf.invalider(*cles_validees)
+                compteurs.enregistrer_entrees(entrees)
+
+            transaction.on_commit(apres_validation)
+
+    return resultats
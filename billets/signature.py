@@ -0,0 +1,99 @@
+# billets/signature.py
+"""
+QR codes signés : charge utile compacte vérifiable sans accès à la base.
+
+    JO1.<données>.<signature>          (base64url sans padding)
+    données   = id billet (u64) | id offre (u32) | date événement (u32, ordinal) | clé finale (16 octets)
+    signature = HMAC-SHA256(BILLET_QR_SIGNATURE_CLE, "JO1." + données), tronqué à 16 octets
+
+Activé par BILLET_QR_FORMAT = "SIGNE" (par défaut "CLE" : le QR contient la clé brute).
+Les deux formats restent acceptés au scan.
+"""
+import base64
+import hashlib
+import hmac
+import struct
+import uuid
+from collections import namedtuple
+from datetime import date
+
+from django.conf import settings
+from django.utils import timezone
+
+PREFIXE = "JO1."
+_STRUCT = struct.Struct(">QII16s")
+_TAILLE_SIGNATURE = 16
+
+ChargeQR = namedtuple("ChargeQR", ["billet_id", "offre_id", "date_evenement", "cle_finale"])
+
+
+class QRInvalide(Exception):
+    """Charge utile rejetée avant tout accès base ; `code` est renvoyé au portique."""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+def _cle_secrete():
+    return getattr(settings, "BILLET_QR_SIGNATURE_CLE", settings.SECRET_KEY).encode("utf-8")
+
+
+def _b64(octets):
+    return base64.urlsafe_b64encode(octets).rstrip(b"=").decode("ascii")
+
+
+def _deb64(texte):
+    return base64.urlsafe_b64decode(texte + "=" * (-len(texte) % 4))
+
+
+def _signature(donnees):
+    return hmac.new(_cle_secrete(), PREFIXE.encode("ascii") + donnees, hashlib.sha256).digest()[:_TAILLE_SIGNATURE]
+
+
+def est_signe(contenu):
+    return isinstance(contenu, str) and contenu.startswith(PREFIXE)
+
+
+def signer(billet_id, offre_id, date_evenement, cle_finale):
+    donnees = _STRUCT.pack(billet_id, offre_id, date_evenement.toordinal(), uuid.UUID(cle_finale).bytes)
+    return f"{PREFIXE}{_b64(donnees)}.{_b64(_signature(donnees))}"
+
+
+def signer_billet(billet):
+    return signer(billet.pk, billet.offre_id, billet.offre.evenement.date_evenement, billet.cle_finale)
+
+
+def verifier(contenu):
+    """Vérifie la signature et décode la charge utile (CPU uniquement)."""
+    try:
+        donnees_b64, signature_b64 = contenu[len(PREFIXE):].split(".")
+        donnees, signature = _deb64(donnees_b64), _deb64(signature_b64)
+        billet_id, offre_id, ordinal, cle = _STRUCT.unpack(donnees)
+    except (ValueError, struct.error):
+        raise QRInvalide("INVALIDE", "QR code illisible.")
+
+    if not hmac.compare_digest(signature, _signature(donnees)):
+        raise QRInvalide("INVALIDE", "Signature du QR code invalide.")
+
+    return ChargeQR(billet_id, offre_id, date.fromordinal(ordinal), str(uuid.UUID(bytes=cle)))
+
+
+def filtre_scan(contenu, offres=None, jour=None):
+    """
+    Traduit le contenu scanné en filtre pour l'UPDATE de validation.
+    - Clé brute : filtre sur cle_finale (la base tranche).
+    - Charge signée : signature, jour de l'événement et offres acceptées par le portique
+      sont contrôlés ici, sans requête ; les faux et les billets d'un autre événement
+      sont rejetés (QRInvalide) avant de toucher la base.
+    """
+    if not est_signe(contenu):
+        return {"cle_finale": contenu}
+
+    charge = verifier(contenu)
+    if charge.date_evenement != (jour or timezone.localdate()):
+        raise QRInvalide("AUTRE_JOUR", "Billet valable pour une autre date.")
+    if offres and charge.offre_id not in offres:
+        raise QRInvalide("AUTRE_OFFRE", "Billet non valable à cet accès.")
+
+    return {"pk": charge.billet_id, "offre_id": charge.offre_id, "cle_finale": charge.cle_finale}
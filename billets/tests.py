@@ -1,3 +1,481 @@
-from django.test import TestCase
+import os
+import re
+import shutil
+import struct
+import tempfile
+import time
+from datetime import timedelta
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import override_settings
+from rest_framework.test import APITestCase
+from django.utils import timezone
+from decimal import Decimal
+
+from users.models import Utilisateur
+from offres.models import Offre
+from evenements.models import Evenement
+from billets.hors_ligne import MAGIC, TYPE_COMPLET, TYPE_DELTA, empreinte
+from billets import cache_pdf, compteurs, rendu
+from billets.models import EBillet
+from billets.services import _update_returning_possible, emettre_billets_commande, valider_billet
+from commandes.models import Commande, LigneCommande
+from billets.signature import QRInvalide, filtre_scan, signer_billet
+
+
+def nombre_pages(pdf):
+    return len(re.findall(rb"/Type /Page\b(?!s)", pdf))
+
+
+class EmissionBilletsTest(APITestCase):
+    def setUp(self):
+        self.user = Utilisateur.objects.create_user(username="client", email="client@test.com", password="Test12345!")
+        event = Evenement.objects.create(
+            nom_evenement="Finale 100m", lieu="Stade de France", date_evenement=timezone.localdate()
+        )
+        self.offres = [
+            Offre.objects.create(
+                evenement=event,
+                createur=self.user,
+                nom_offre=f"Offre {n}",
+                prix=Decimal("10.00"),
+                nb_personnes=n,
+                type_offre="SOLO",
+                stock_total=10,
+                stock_disponible=10,
+                date_debut_vente=timezone.now(),
+                date_fin_vente=timezone.now(),
+            )
+            for n in (1, 2, 4)
+        ]
+
+    def _commande(self, offres):
+        cmd = Commande.objects.create(utilisateur=self.user, statut="PAYEE", total=Decimal("0.00"))
+        LigneCommande.objects.bulk_create(
+            LigneCommande(commande=cmd, offre=o, quantite=2, prix_unitaire=o.prix, sous_total=o.prix * 2) for o in offres
+        )
+        return Commande.objects.get(pk=cmd.pk)
+
+    def test_emission_en_nombre_de_requetes_constant(self):
+        cmd = self._commande(self.offres[:1])
+        with CaptureQueriesContext(connection) as une_ligne:
+            billets = emettre_billets_commande(cmd, cmd.lignes.select_related("offre").all())
+        self.assertEqual(len(billets), 2)
+
+        # 3 lignes, 14 billets (quantité x personnes) : autant de requêtes que pour 1 ligne
+        cmd = self._commande(self.offres)
+        with self.assertNumQueries(len(une_ligne.captured_queries)):
+            billets = emettre_billets_commande(cmd, cmd.lignes.select_related("offre").all())
+        self.assertEqual(len(billets), 14)
+        self.assertEqual(EBillet.objects.filter(commande=cmd).count(), 14)
+
+
+class ValidationBilletsAPITest(APITestCase):
+    def setUp(self):
+        self.staff = Utilisateur.objects.create_user(
+            username="staff", email="staff@test.com", password="Test12345!", is_staff=True
+        )
+        self.client.force_authenticate(user=self.staff)
+
+        self.event = Evenement.objects.create(
+            nom_evenement="Finale 100m",
+            lieu="Stade de France",
+            date_evenement=timezone.localdate(),
+        )
+
+        self.offre = Offre.objects.create(
+            evenement=self.event,
+            createur=self.staff,
+            nom_offre="SOLO",
+            prix=Decimal("10.00"),
+            nb_personnes=1,
+            type_offre="SOLO",
+            stock_total=10,
+            stock_disponible=10,
+            date_debut_vente=timezone.now(),
+            date_fin_vente=timezone.now(),
+        )
+
+        self.billet = EBillet.objects.create(utilisateur=self.staff, offre=self.offre, prix_paye=Decimal("10.00"))
+
+    def test_validation_en_un_seul_update(self):
+        with self.assertNumQueries(1):
+            self.assertTrue(valider_billet(self.staff, "Porte A", cle_finale=self.billet.cle_finale))
+        with self.assertNumQueries(1):
+            self.assertFalse(valider_billet(self.staff, "Porte A", cle_finale=self.billet.cle_finale))
+        self.billet.refresh_from_db()
+        self.assertEqual((self.billet.statut, self.billet.lieu_utilisation), ("UTILISE", "Porte A"))
+        self.assertEqual(self.billet.validateur, self.staff)
+        self.assertLess(timezone.now() - self.billet.date_utilisation, timedelta(minutes=1))
+        self.assertEqual(self.billet.date_modification, self.billet.date_utilisation)
+
+    def test_compteurs_entrees_amorces_puis_incrementes(self):
+        cache.clear()
+        url = f"/api/billets/entrees/?evenement={self.event.id}"
+        EBillet.objects.create(
+            utilisateur=self.staff, offre=self.offre, prix_paye=Decimal("10.00"), statut="UTILISE", lieu_utilisation="Porte A"
+        )
+        autre = EBillet.objects.create(utilisateur=self.staff, offre=self.offre, prix_paye=Decimal("10.00"))
+
+        # Amorçage depuis la base, puis lecture sans requête
+        self.assertEqual(self.client.get(url).data["par_lieu"], {"Porte A": 1})
+        with self.assertNumQueries(0):
+            self.assertEqual(compteurs.lire(self.event.id)["total"], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(valider_billet(self.staff, "Porte B", cle_finale=autre.cle_finale))
+
+        # Compteurs chauds : le scan par clé brute reste un seul UPDATE (offre relue par RETURNING)
+        attendu = 1 if _update_returning_possible("default") else 2
+        with self.assertNumQueries(attendu), self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(valider_billet(self.staff, "Porte B", cle_finale=self.billet.cle_finale))
+        self.assertEqual(compteurs.lire(self.event.id), {
+            "evenement": self.event.id, "total": 3, "par_lieu": {"Porte A": 1, "Porte B": 2},
+        })
+
+        # Compteurs évincés : réamorcés depuis la base, jamais lus comme 0
+        cache.delete_many([compteurs._cle_total(self.event.id), compteurs._cle_lieu(self.event.id, "Porte A")])
+        res = self.client.get(url)
+        self.assertEqual(res.data["total"], 3)
+        self.assertEqual(res.data["par_lieu"], {"Porte A": 1, "Porte B": 2})
+
+    def test_valider_par_cle_une_seule_fois(self):
+        url = "/api/billets/valider-par-cle/"
+        data = {"cle_finale": self.billet.cle_finale, "lieu_utilisation": "Porte A"}
+
+        res = self.client.post(url, data, format="json")
+        self.assertEqual(res.status_code, 200)
+
+        # Un second scan du même billet est rejeté
+        res = self.client.post(url, data, format="json")
+        self.assertEqual(res.status_code, 404)
+
+        self.billet.refresh_from_db()
+        self.assertEqual(self.billet.statut, "UTILISE")
+        self.assertEqual(self.billet.lieu_utilisation, "Porte A")
+        self.assertEqual(self.billet.validateur_id, self.staff.id)
+
+    def test_valider_lot(self):
+        autre = EBillet.objects.create(utilisateur=self.staff, offre=self.offre, prix_paye=Decimal("10.00"))
+        annule = EBillet.objects.create(utilisateur=self.staff, offre=self.offre, prix_paye=Decimal("10.00"), statut="ANNULE")
+
+        scans = [
+            {"cle_finale": self.billet.cle_finale, "lieu_utilisation": "Porte A"},
+            {"cle_finale": autre.cle_finale, "lieu_utilisation": "Porte B", "scanned_at": "2024-08-01T10:00:00Z"},
+            {"cle_finale": self.billet.cle_finale},
+            {"cle_finale": annule.cle_finale},
+            {"cle_finale": "inconnue"},
+        ]
+        res = self.client.post("/api/billets/valider-lot/", {"scans": scans}, format="json")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data["acceptes"], 2)
+        self.assertEqual(
+            [r["resultat"] for r in res.data["resultats"]],
+            ["ACCEPTE", "ACCEPTE", "DOUBLON", "ANNULE", "INTROUVABLE"],
+        )
+
+        autre.refresh_from_db()
+        self.assertEqual(autre.statut, "UTILISE")
+        self.assertEqual(autre.lieu_utilisation, "Porte B")
+        self.assertEqual(autre.date_utilisation.year, 2024)
+
+    def test_qr_signe(self):
+        charge = signer_billet(self.billet)
+
+        # Falsification et mauvais jour rejetés sans requête
+        with self.assertNumQueries(0):
+            with self.assertRaises(QRInvalide):
+                filtre_scan(charge[:-4] + "AAAA")
+            with self.assertRaises(QRInvalide):
+                filtre_scan(charge, jour=self.event.date_evenement.replace(year=2000))
+
+        res = self.client.post("/api/billets/valider-par-cle/", {"cle_finale": charge}, format="json")
+        self.assertEqual(res.status_code, 200)
+        self.billet.refresh_from_db()
+        self.assertEqual(self.billet.statut, "UTILISE")
+
+    def test_liste_par_curseur(self):
+        for _ in range(4):
+            EBillet.objects.create(utilisateur=self.staff, offre=self.offre, prix_paye=Decimal("10.00"))
+
+        vus = []
+        url = "/api/billets/?page_size=2"
+        while url:
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, 200)
+            self.assertNotIn("count", res.data)
+            vus += [b["id"] for b in res.data["results"]]
+            url = res.data["next"]
+
+        self.assertEqual(len(vus), 5)
+        self.assertEqual(len(set(vus)), 5)
+
+    def test_liste_par_curseur_ex_aequo_et_null(self):
+        for _ in range(4):
+            EBillet.objects.create(utilisateur=self.staff, offre=self.offre, prix_paye=Decimal("10.00"))
+        # Même date d'achat pour tous ; date_utilisation nulle sauf pour un billet
+        EBillet.objects.update(date_achat=timezone.now())
+        EBillet.objects.filter(pk=self.billet.pk).update(date_utilisation=timezone.now())
+
+        for ordre in ("-date_achat", "date_achat", "date_utilisation"):
+            vus = []
+            url = f"/api/billets/?page_size=2&ordering={ordre}"
+            while url:
+                res = self.client.get(url)
+                self.assertEqual(res.status_code, 200)
+                vus += [b["id"] for b in res.data["results"]]
+                url = res.data["next"]
+            self.assertEqual(sorted(vus), sorted(EBillet.objects.values_list("id", flat=True)))
+
+    def test_curseur_composite_sans_offset(self):
+        for _ in range(4):
+            EBillet.objects.create(utilisateur=self.staff, offre=self.offre, prix_paye=Decimal("10.00"))
+        # Deux horodatages seulement : la page suivante repose sur l'id, pas sur un OFFSET
+        instant = timezone.now()
+        EBillet.objects.update(date_achat=instant)
+        EBillet.objects.filter(pk__in=list(EBillet.objects.order_by("id").values_list("id", flat=True)[:2])).update(
+            date_achat=instant - timedelta(microseconds=1)
+        )
+        attendu = list(EBillet.objects.order_by("-date_achat", "-id").values_list("id", flat=True))
+
+        pages, url = [], "/api/billets/?page_size=2"
+        while url:
+            with CaptureQueriesContext(connection) as requetes:
+                res = self.client.get(url)
+            self.assertFalse(any("OFFSET" in q["sql"] for q in requetes.captured_queries))
+            pages.append(res)
+            url = res.data["next"]
+        self.assertEqual([b["id"] for p in pages for b in p.data["results"]], attendu)
+
+        # Retour arrière depuis la dernière page
+        precedente = self.client.get(pages[-1].data["previous"])
+        self.assertEqual(precedente.data["results"], pages[-2].data["results"])
+        self.assertIsNone(self.client.get(pages[1].data["previous"]).data["previous"])
+
+        # Tri sur une autre colonne non nulle, ex aequo départagés par l'id
+        vus, url = [], "/api/billets/?page_size=2&ordering=prix_paye"
+        while url:
+            res = self.client.get(url)
+            vus += [b["id"] for b in res.data["results"]]
+            url = res.data["next"]
+        self.assertEqual(vus, list(EBillet.objects.order_by("prix_paye", "id").values_list("id", flat=True)))
+
+    def test_tri_sur_colonne_nullable_par_pages(self):
+        res = self.client.get("/api/billets/?ordering=-date_utilisation")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data["count"], 1)
+        self.assertEqual(self.client.get("/api/billets/?cursor=invalide").status_code, 404)
+
+    def test_recherche_colonne_denormalisee(self):
+        autre = Utilisateur.objects.create_user(username="marie", email="Marie.Curie@exemple.fr", password="Test12345!")
+        billet = EBillet.objects.create(utilisateur=autre, offre=self.offre, prix_paye=Decimal("10.00"))
+
+        res = self.client.get("/api/billets/?search=curie@exem")
+        self.assertEqual([b["id"] for b in res.data["results"]], [billet.id])
+
+        res = self.client.get(f"/api/billets/?search={billet.numero_billet[-6:].lower()}")
+        self.assertIn(billet.id, [b["id"] for b in res.data["results"]])
+
+        # Renommer l'offre ou changer l'email réindexe les billets concernés
+        autre.email = "m.sklodowska@exemple.fr"
+        autre.save()
+        res = self.client.get("/api/billets/?search=sklodowska")
+        self.assertEqual([b["id"] for b in res.data["results"]], [billet.id])
+        self.assertEqual(self.client.get("/api/billets/?search=curie@exem").data["results"], [])
+
+
+class FichiersBilletsAPITest(APITestCase):
+    def setUp(self):
+        # Cache PDF dans un dossier temporaire, état du compteur de taille remis à zéro
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        reglages = override_settings(MEDIA_ROOT=media)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        cache_pdf._taille, cache_pdf._ecritures = None, 0
+
+        self.user = Utilisateur.objects.create_user(username="client", email="client@test.com", password="Test12345!")
+        self.client.force_authenticate(user=self.user)
+
+        self.event = Evenement.objects.create(
+            nom_evenement="Finale 100m",
+            lieu="Stade de France",
+            date_evenement=timezone.localdate(),
+        )
+        self.offre = Offre.objects.create(
+            evenement=self.event,
+            createur=self.user,
+            nom_offre="SOLO",
+            prix=Decimal("10.00"),
+            nb_personnes=1,
+            type_offre="SOLO",
+            stock_total=10,
+            stock_disponible=10,
+            date_debut_vente=timezone.now(),
+            date_fin_vente=timezone.now(),
+        )
+        self.billet = EBillet.objects.create(utilisateur=self.user, offre=self.offre, prix_paye=Decimal("10.00"))
+
+    def test_telecharger_qr_304_si_etag_connu(self):
+        url = f"/api/billets/{self.billet.id}/telecharger/"
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res["Content-Type"], "image/png")
+        etag = res["ETag"]
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.content, b"")
+        self.assertEqual(res["ETag"], etag)
+
+        # Autre billet : autre ETag, image renvoyée
+        autre = EBillet.objects.create(utilisateur=self.user, offre=self.offre, prix_paye=Decimal("10.00"))
+        res = self.client.get(f"/api/billets/{autre.id}/telecharger/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+
+    def lire_pack(self, params):
+        """Décode le pack binaire : (type, evenement, version, depuis, [sections])."""
+        res = self.client.get("/api/billets/pack-hors-ligne/", params)
+        self.assertEqual(res.status_code, 200)
+        brut = b"".join(res.streaming_content)
+
+        magic, _, type_pack, evenement, version, depuis = struct.unpack_from(">4sBBIQQ", brut)
+        self.assertEqual(magic, MAGIC)
+        self.assertEqual(int(res["X-Pack-Version"]), version)
+        position = struct.calcsize(">4sBBIQQ")
+        sections = []
+        while position < len(brut):
+            (nombre,) = struct.unpack_from(">I", brut, position)
+            position += 4
+            sections.append([brut[position + 8 * i:position + 8 * (i + 1)] for i in range(nombre)])
+            position += 8 * nombre
+        self.assertEqual(position, len(brut))
+        return type_pack, evenement, version, depuis, sections
+
+    def test_pack_hors_ligne_complet_puis_delta(self):
+        self.user.is_staff = True
+        self.user.save()
+        autres = [EBillet.objects.create(utilisateur=self.user, offre=self.offre, prix_paye=Decimal("10.00")) for _ in range(3)]
+        EBillet.objects.filter(pk=autres[0].pk).update(statut="ANNULE")
+        valides = [self.billet, *autres[1:]]
+
+        type_pack, evenement, version, depuis, sections = self.lire_pack({"evenement": self.event.id})
+        self.assertEqual((type_pack, evenement, depuis), (TYPE_COMPLET, self.event.id, 0))
+        self.assertEqual(len(sections), 1)
+        self.assertEqual(sections[0], sorted(empreinte(b.cle_finale) for b in valides))
+
+        # Delta : un billet annulé et un billet émis depuis la version précédente
+        EBillet.objects.update(date_modification=timezone.now() - timedelta(hours=1))
+        EBillet.objects.filter(pk=autres[1].pk).update(statut="ANNULE", date_modification=timezone.now())
+        nouveau = EBillet.objects.create(utilisateur=self.user, offre=self.offre, prix_paye=Decimal("10.00"))
+
+        type_pack, _, _, depuis, sections = self.lire_pack({"evenement": self.event.id, "depuis": version})
+        self.assertEqual((type_pack, depuis), (TYPE_DELTA, version))
+        self.assertEqual(sections, [[empreinte(nouveau.cle_finale)], [empreinte(autres[1].cle_finale)]])
+
+    def test_pdf_multi_billets_en_flux(self):
+        res = self.client.get("/api/billets/pdf/")
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.streaming)
+        self.assertEqual(nombre_pages(b"".join(res.streaming_content)), 1)
+
+        for _ in range(2):
+            EBillet.objects.create(utilisateur=self.user, offre=self.offre, prix_paye=Decimal("10.00"))
+        EBillet.objects.create(utilisateur=self.user, offre=self.offre, prix_paye=Decimal("10.00"), statut="ANNULE")
+        pdf = b"".join(self.client.get("/api/billets/pdf/").streaming_content)
+        self.assertTrue(pdf.startswith(b"%PDF-1.4"))
+        self.assertTrue(pdf.rstrip().endswith(b"%%EOF"))
+        self.assertEqual(nombre_pages(pdf), 3)
+        self.assertIn(b"/Count 3", pdf)
+
+    def test_pdf_unicode_police_embarquee(self):
+        Offre.objects.filter(pk=self.offre.pk).update(nom_offre="Финал 100 m – Łódź")
+        res = self.client.get(f"/api/billets/{self.billet.id}/pdf/")
+        self.assertEqual(res.status_code, 200)
+        pdf = b"".join(res.streaming_content) if res.streaming else res.content
+        # Texte en police TrueType embarquée (sous-ensemble), pas en Type1 WinAnsi limitée au cp1252
+        self.assertIn(b"/FontFile2", pdf)
+        self.assertEqual(nombre_pages(pdf), 1)
+
+    def test_pdf_sans_billet_404(self):
+        EBillet.objects.all().delete()
+        self.assertEqual(self.client.get("/api/billets/pdf/").status_code, 404)
+
+    def test_pool_de_rendu_plafonne_aux_coeurs(self):
+        with override_settings(BILLET_RENDU_PROCESSUS=10_000):
+            self.assertEqual(rendu.nombre_processus(), os.cpu_count() or 1)
+        with override_settings(BILLET_RENDU_PROCESSUS=0):
+            self.assertEqual(rendu.nombre_processus(), 0)
+
+    @override_settings(BILLET_RENDU_PROCESSUS=1, BILLET_RENDU_FILE_MAX=1, BILLET_RENDU_ATTENTE=0.01)
+    def test_file_de_rendu_pleine_503(self):
+        rendu._pool = rendu._places = None
+        pool, places = rendu._executeur()
+        self.addCleanup(setattr, rendu, "_places", None)
+        self.addCleanup(setattr, rendu, "_pool", None)
+        self.addCleanup(pool.shutdown, wait=False, cancel_futures=True)
+
+        # La seule place est occupée : aucune attente au-delà de BILLET_RENDU_ATTENTE
+        places.acquire()
+        self.addCleanup(places.release)
+        res = self.client.get(f"/api/billets/{self.billet.id}/pdf/")
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res["Retry-After"], "2")
+
+    def fichiers_cache(self):
+        if cache_pdf._eviction is not None:
+            cache_pdf._eviction.join()
+        dossier = cache_pdf._dossier()
+        return sorted(os.listdir(dossier)) if dossier.exists() else []
+
+    def test_cache_pdf_lecture_puis_invalidation(self):
+        url = f"/api/billets/{self.billet.id}/pdf/"
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, 200)
+        self.assertFalse(res.streaming)  # rendu puis mis en cache
+        self.assertEqual(len(self.fichiers_cache()), 1)
+
+        res = self.client.get(url)
+        self.assertTrue(res.streaming)  # FileResponse : fichier en cache
+        self.assertTrue(b"".join(res.streaming_content).startswith(b"%PDF"))
+        res.close()
+
+        # Annulation : entrées du billet supprimées
+        self.assertEqual(self.client.post(f"/api/billets/{self.billet.id}/annuler/").status_code, 200)
+        self.assertEqual(self.fichiers_cache(), [])
+
+        # Validation par clé (staff) : idem
+        autre = EBillet.objects.create(utilisateur=self.user, offre=self.offre, prix_paye=Decimal("10.00"))
+        self.client.get(f"/api/billets/{autre.id}/pdf/")
+        self.assertEqual(len(self.fichiers_cache()), 1)
+        self.user.is_staff = True
+        self.user.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post("/api/billets/valider-par-cle/", {"cle_finale": autre.cle_finale}, format="json")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(self.fichiers_cache(), [])
+
+    @override_settings(BILLET_PDF_CACHE_MAX_OCTETS=250)
+    def test_cache_pdf_eviction_lru(self):
+        billets = [self.billet] + [
+            EBillet.objects.create(utilisateur=self.user, offre=self.offre, prix_paye=Decimal("10.00"))
+            for _ in range(2)
+        ]
+        a = cache_pdf.ecrire(billets[0], b"x" * 100)
+        self.fichiers_cache()  # premier usage : inventaire (taille connue = 100)
+        b = cache_pdf.ecrire(billets[1], b"x" * 100)
+        self.assertEqual(cache_pdf._taille, 200)
+
+        # A plus ancien que B, puis relu : B devient le moins récemment utilisé
+        maintenant = time.time()
+        os.utime(a, (maintenant - 30, maintenant - 30))
+        os.utime(b, (maintenant - 20, maintenant - 20))
+        self.assertEqual(cache_pdf.lire(billets[0]), a)
+
+        # 300 octets > 250 : éviction jusqu'à 90 % de la borne
+        c = cache_pdf.ecrire(billets[2], b"x" * 100)
+        self.assertEqual(self.fichiers_cache(), sorted([a.name, c.name]))
+        self.assertIsNone(cache_pdf.lire(billets[1]))
+        self.assertEqual(cache_pdf._taille, 200)
@@ -1,7 +1,6 @@
 # billets/views.py
-from django.shortcuts import get_object_or_404
-from django.http import HttpResponse
-from django.utils import timezone
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
 
 from rest_framework import viewsets, status, permissions, filters
 from rest_framework.decorators import action
@@ -9,14 +8,43 @@ from rest_framework.response import Response
 
 from django_filters.rest_framework import DjangoFilterBackend
 
-from billets.models import EBillet
-from billets.serializers import EBilletSerializer, EBilletAdminSerializer
+from core.pagination import PaginationCurseurAchat
+from core.recherche import RechercheFilter
 
-import base64
-from io import BytesIO
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from PIL import Image
+from billets import cache_pdf, compteurs
+from billets.models import EBillet
+from billets.serializers import EBilletSerializer, EBilletAdminSerializer, ValiderLotSerializer
+from billets.qr import contenu_qr, qr_code_png, qr_code_etag
+from billets.services import valider_billet, valider_billets_par_lot
+from billets.hors_ligne import iter_pack
+from billets.signature import QRInvalide, filtre_scan
+from billets.pdf import donnees_page, iter_pdf_billets, rendre_pdf
+from billets.rendu import RenduSature, executer
+
+
+def reponse_pdf_billets(billets, nom_fichier):
+    """
+    Réponse PDF (une page par billet) envoyée par morceaux, billets lus par lots de 100.
+    404 s'il n'y a aucun billet : un PDF sans page est rejeté par les lecteurs
+    (cas des billets émis avant le rattachement aux commandes, dont `commande` est vide).
+    """
+    billets = billets.filter(statut__in=["VALIDE", "UTILISE"])
+    if not billets.exists():
+        return Response({"detail": "Aucun billet valide à imprimer."}, status=status.HTTP_404_NOT_FOUND)
+
+    billets = (
+        billets.select_related("utilisateur", "offre__evenement")
+        .order_by("id")
+        .iterator(chunk_size=100)
+    )
+    response = StreamingHttpResponse(iter_pdf_billets(billets), content_type="application/pdf")
+    response["Content-Disposition"] = f'attachment; filename="{nom_fichier}"'
+    return response
+
+
+def reponse_rendu_sature(erreur):
+    """File de rendu pleine : on renvoie 503 plutôt que d'occuper le worker HTTP."""
+    return Response({"detail": str(erreur)}, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={"Retry-After": "2"})
 
 
 class IsStaff(permissions.BasePermission):
@@ -32,18 +60,15 @@ class IsOwnerOrStaff(permissions.BasePermission):
 
 
 class EBilletViewSet(viewsets.ModelViewSet):
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = PaginationCurseurAchat
+    filter_backends = [DjangoFilterBackend, RechercheFilter, filters.OrderingFilter]
 
     filterset_fields = ["statut"]
 
-    search_fields = [
-        "numero_billet",
-        "utilisateur__username",
-        "utilisateur__email",
-        "offre__nom_offre",
-        "statut",
-    ]
+    # Numéro, username, email et offre (colonne dénormalisée, voir core/recherche.py) ; statut via ?statut=
+    search_fields = ["recherche"]
 
+    # Colonnes non nulles : curseur (critère, id) ; date_utilisation (nullable) : pages numérotées (core/pagination.py)
     ordering_fields = [
         "date_achat",
         "date_utilisation",
@@ -51,7 +76,7 @@ class EBilletViewSet(viewsets.ModelViewSet):
         "statut",
         "numero_billet",
     ]
-    ordering = ["-date_achat"]
+    ordering = ["-date_achat", "-id"]
 
     def get_serializer_class(self):
         user = self.request.user
@@ -61,13 +86,13 @@ class EBilletViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        qs = EBillet.objects.select_related("utilisateur", "offre", "validateur").all()
+        qs = EBillet.objects.select_related("utilisateur", "offre__evenement", "validateur").all()
         if user.is_authenticated and user.is_staff:
             return qs
         return qs.filter(utilisateur=user)
 
     def get_permissions(self):
-        if self.action in ["list", "retrieve", "telecharger", "generer_pdf"]:
+        if self.action in ["list", "retrieve", "telecharger", "generer_pdf", "generer_pdf_utilisateur"]:
             return [permissions.IsAuthenticated(), IsOwnerOrStaff()]
 
         if self.action in ["create", "update", "partial_update", "destroy"]:
@@ -76,7 +101,7 @@ class EBilletViewSet(viewsets.ModelViewSet):
         if self.action in ["annuler"]:
             return [permissions.IsAuthenticated(), IsOwnerOrStaff()]
 
-        if self.action in ["valider", "valider_par_cle"]:
+        if self.action in ["valider", "valider_par_cle", "valider_lot", "pack_hors_ligne", "entrees"]:
             return [permissions.IsAuthenticated(), IsStaff()]
 
         return [permissions.IsAuthenticated()]
@@ -96,11 +121,15 @@ class EBilletViewSet(viewsets.ModelViewSet):
         if billet.statut != "VALIDE":
             return Response({"detail": "Billet déjà utilisé ou annulé."}, status=status.HTTP_400_BAD_REQUEST)
 
-        billet.statut = "UTILISE"
-        billet.lieu_utilisation = request.data.get("lieu_utilisation", "Non spécifié")
-        billet.date_utilisation = timezone.now()
-        billet.validateur = request.user
-        billet.save()
+        # UPDATE conditionnel : un scan concurrent du même billet ne peut pas aussi réussir
+        if not valider_billet(
+            request.user,
+            request.data.get("lieu_utilisation"),
+            pk=billet.pk,
+            offre_id=billet.offre_id,
+            cle_finale=billet.cle_finale,
+        ):
+            return Response({"detail": "Billet déjà utilisé ou annulé."}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response({"detail": "Billet validé avec succès."}, status=status.HTTP_200_OK)
 
@@ -110,25 +139,92 @@ class EBilletViewSet(viewsets.ModelViewSet):
         if not cle_finale:
             return Response({"detail": "cle_finale manquante."}, status=status.HTTP_400_BAD_REQUEST)
 
-        billet = get_object_or_404(EBillet, cle_finale=cle_finale, statut="VALIDE")
+        # Charge signée : faux, autre jour ou offre non acceptée rejetés sans requête
+        try:
+            offres = {int(o) for o in request.data.get("offres") or []}
+            filtre = filtre_scan(cle_finale, offres=offres)
+        except QRInvalide as e:
+            return Response({"detail": str(e), "code": e.code}, status=status.HTTP_400_BAD_REQUEST)
+        except (TypeError, ValueError):
+            return Response({"detail": "offres doit être une liste d'identifiants."}, status=status.HTTP_400_BAD_REQUEST)
 
-        billet.statut = "UTILISE"
-        billet.lieu_utilisation = request.data.get("lieu_utilisation", "Non spécifié")
-        billet.date_utilisation = timezone.now()
-        billet.validateur = request.user
-        billet.save()
+        # Un seul aller-retour : UPDATE ... WHERE cle_finale=? AND statut='VALIDE', décidé par le rowcount
+        if not valider_billet(request.user, request.data.get("lieu_utilisation"), **filtre):
+            return Response({"detail": "Billet introuvable ou déjà utilisé."}, status=status.HTTP_404_NOT_FOUND)
 
         return Response({"detail": "Billet validé avec succès."}, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=["POST"], url_path="valider-lot")
+    def valider_lot(self, request):
+        """
+        POST /api/billets/valider-lot/
+        {"scans": [{"cle_finale": "...", "lieu_utilisation": "Porte A", "scanned_at": "..."}, ...]}
+        Valide tout le lot en un seul UPDATE et renvoie un résultat par clé.
+        """
+        ser = ValiderLotSerializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+
+        resultats = valider_billets_par_lot(
+            request.user,
+            ser.validated_data["scans"],
+            offres=set(ser.validated_data.get("offres") or []),
+        )
+        acceptes = sum(1 for r in resultats if r["resultat"] == "ACCEPTE")
+
+        return Response({"acceptes": acceptes, "resultats": resultats}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["GET"], url_path="entrees")
+    def entrees(self, request):
+        """
+        GET /api/billets/entrees/?evenement=<id>
+        Entrées validées de l'événement, au total et par lieu, lues dans les compteurs (pas de COUNT).
+        Flux temps réel : WebSocket /ws/, message {"action": "suivre_entrees", "evenement": <id>}.
+        """
+        try:
+            evenement_id = int(request.query_params["evenement"])
+        except (KeyError, ValueError):
+            return Response({"detail": "Paramètre evenement entier requis."}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(compteurs.lire(evenement_id), status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["GET"], url_path="pack-hors-ligne")
+    def pack_hors_ligne(self, request):
+        """
+        GET /api/billets/pack-hors-ligne/?evenement=<id>[&depuis=<version>]
+        Index binaire compact des billets valides de l'événement (voir billets/hors_ligne.py).
+        Avec `depuis` (valeur de l'en-tête X-Pack-Version d'un pack précédent) : delta ajouts/retraits.
+        """
+        try:
+            evenement_id = int(request.query_params["evenement"])
+            depuis = request.query_params.get("depuis")
+            depuis = int(depuis) if depuis else None
+        except (KeyError, ValueError):
+            return Response({"detail": "Paramètres evenement (et depuis) entiers requis."}, status=status.HTTP_400_BAD_REQUEST)
+
+        version, contenu = iter_pack(evenement_id, depuis)
+
+        response = StreamingHttpResponse(contenu, content_type="application/octet-stream")
+        response["X-Pack-Version"] = str(version)
+        response["Content-Disposition"] = f'attachment; filename="pack-evenement-{evenement_id}-{version}.bin"'
+        return response
+
     @action(detail=True, methods=["GET"], url_path="telecharger")
     def telecharger(self, request, pk=None):
         billet = self.get_object()
-        if not billet.qr_code:
-            return Response({"detail": "QR code non disponible."}, status=status.HTTP_404_NOT_FOUND)
+        contenu = contenu_qr(billet)
 
-        qr_data = base64.b64decode(billet.qr_code)
-        response = HttpResponse(qr_data, content_type="image/png")
-        response["Content-Disposition"] = f'attachment; filename="{billet.numero_billet}.png"'
+        # Le QR ne change jamais pour une clé donnée : 304 si le client l'a déjà
+        etag = qr_code_etag(contenu)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            try:
+                png = qr_code_png(contenu)
+            except RenduSature as e:
+                return reponse_rendu_sature(e)
+            response = HttpResponse(png, content_type="image/png")
+            response["Content-Disposition"] = f'attachment; filename="{billet.numero_billet}.png"'
+        response["ETag"] = etag
+        patch_cache_control(response, private=True, max_age=86400)
         return response
 
     @action(detail=True, methods=["POST"], url_path="annuler")
@@ -139,6 +235,7 @@ class EBilletViewSet(viewsets.ModelViewSet):
 
         billet.statut = "ANNULE"
         billet.save()
+        cache_pdf.invalider(billet.cle_finale)
         return Response({"detail": "Billet annulé."}, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=["GET"], url_path="pdf")
@@ -148,42 +245,38 @@ class EBilletViewSet(viewsets.ModelViewSet):
         if billet.statut not in ["VALIDE", "UTILISE"]:
             return Response({"detail": "Billet invalide ou annulé."}, status=status.HTTP_400_BAD_REQUEST)
 
-        buffer = BytesIO()
-        p = canvas.Canvas(buffer, pagesize=A4)
-        width, height = A4
-        p.setFont("Helvetica-Bold", 16)
-
-        x, y = 50, height - 50
-        line_height = 25
-
-        p.drawString(x, y, f"E-Billet : {billet.numero_billet}")
-        y -= line_height
-        p.drawString(x, y, f"Utilisateur : {billet.utilisateur.username}")
-        y -= line_height
-        p.drawString(x, y, f"Offre : {billet.offre.nom_offre}")
-        y -= line_height
-        p.drawString(x, y, f"Prix payé : {billet.prix_paye} €")
-        y -= line_height
-        p.drawString(x, y, f"Statut : {billet.statut}")
-        y -= line_height
-        p.drawString(x, y, f"Date d'achat : {billet.date_achat.strftime('%d/%m/%Y %H:%M')}")
-
-        if billet.qr_code:
-            try:
-                qr_data = base64.b64decode(billet.qr_code)
-                qr_image = Image.open(BytesIO(qr_data))
-                if qr_image.mode != "RGB":
-                    qr_image = qr_image.convert("RGB")
-                p.drawInlineImage(qr_image, x, y - 220, width=200, height=200)
-            except Exception:
-                pass
+        nom_fichier = f"{billet.numero_billet}.pdf"
 
-        p.showPage()
-        p.save()
+        # Téléchargements répétés : fichier en cache servi tel quel (sendfile), sans nouveau rendu
+        chemin = cache_pdf.lire(billet)
+        if chemin is not None:
+            try:
+                return FileResponse(open(chemin, "rb"), as_attachment=True, filename=nom_fichier, content_type="application/pdf")
+            except FileNotFoundError:
+                pass  # évincé entre-temps : on régénère
 
-        pdf = buffer.getvalue()
-        buffer.close()
+        try:
+            pdf = executer(rendre_pdf, [donnees_page(billet)])
+        except RenduSature as e:
+            return reponse_rendu_sature(e)
+        cache_pdf.ecrire(billet, pdf)
 
         response = HttpResponse(pdf, content_type="application/pdf")
-        response["Content-Disposition"] = f'attachment; filename="{billet.numero_billet}.pdf"'
-        return response
\ No newline at end of file
+        response["Content-Disposition"] = f'attachment; filename="{nom_fichier}"'
+        return response
+
+    @action(detail=False, methods=["GET"], url_path="pdf")
+    def generer_pdf_utilisateur(self, request):
+        """
+        GET /api/billets/pdf/[?utilisateur=<id> (staff)]
+        Tous les billets valides/utilisés de l'utilisateur dans un seul PDF, envoyé en flux.
+        """
+        utilisateur_id = request.user.id
+        if request.user.is_staff and request.query_params.get("utilisateur"):
+            try:
+                utilisateur_id = int(request.query_params["utilisateur"])
+            except ValueError:
+                return Response({"detail": "utilisateur doit être un identifiant."}, status=status.HTTP_400_BAD_REQUEST)
+
+        billets = EBillet.objects.filter(utilisateur_id=utilisateur_id)
+        return reponse_pdf_billets(billets, f"billets-{utilisateur_id}.pdf")
@@ -7,6 +7,9 @@ pip install -r requirements.txt
 # Static files
 python manage.py collectstatic --no-input
 
+# Configuration de production (cache partagé, etc.) : échec du build en cas d'erreur
+python manage.py check --deploy --fail-level ERROR
+
 # Migrations
 python manage.py migrate
 python manage.py shell < scripts/create_superuser.py
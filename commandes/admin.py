@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Commande, LigneCommande
+from core.pagination import PaginateurEstime
+from .models import Commande, EvenementOutbox, LigneCommande
 
 
 class LigneCommandeInline(admin.TabularInline):
@@ -23,7 +24,9 @@ class CommandeAdmin(admin.ModelAdmin):
 
     list_filter = ("statut", "date_creation", "date_paiement")
     search_fields = ("numero_commande", "utilisateur__email", "utilisateur__username")
-    ordering = ("-date_creation",)
+    ordering = ("-date_creation", "-id")
+    show_full_result_count = False
+    paginator = PaginateurEstime
 
     inlines = [LigneCommandeInline]
 
@@ -33,4 +36,23 @@ class CommandeAdmin(admin.ModelAdmin):
         "date_creation",
         "date_paiement",
         "reference_paiement",
-    )
\ No newline at end of file
+    )
+
+
+@admin.register(EvenementOutbox)
+class EvenementOutboxAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "type_evenement",
+        "commande",
+        "statut",
+        "tentatives",
+        "prochaine_tentative",
+        "date_creation",
+        "date_traitement",
+    )
+    list_filter = ("statut", "type_evenement")
+    raw_id_fields = ("commande",)
+    ordering = ("-id",)
+    readonly_fields = ("date_creation", "date_traitement", "derniere_erreur")
+    show_full_result_count = False
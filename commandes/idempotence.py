@@ -0,0 +1,140 @@
+# commandes/idempotence.py
+"""
+Requêtes POST rejouables via l'en-tête Idempotency-Key.
+
+Le client envoie une clé unique par opération (UUID) et la renvoie telle quelle en cas de retry :
+- 1re requête : une ligne CleIdempotence « en cours » est insérée, la vue s'exécute,
+  puis sa réponse (statut + corps) est mémorisée ;
+- retry après réponse : la réponse mémorisée est renvoyée (en-tête Idempotency-Replayed),
+  sans relire ni réécrire les tables métier ;
+- retry pendant le traitement : 409 (Retry-After) ; au-delà de IDEMPOTENCE_BAIL_SECONDES sans
+  réponse (processus tué en cours de route), le retry reprend la ligne et refait le travail ;
+- même clé, corps différent : 422.
+Les erreurs 5xx ne sont pas mémorisées (le retry refait le travail). Les lignes expirent après
+IDEMPOTENCE_TTL_HEURES ; la commande purger_idempotence les supprime.
+Sans en-tête, la vue se comporte comme avant.
+"""
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import CleIdempotence
+
+EN_TETE = "Idempotency-Key"
+LONGUEUR_MAX = 255
+
+
+def _sha256(texte):
+    return hashlib.sha256(texte.encode("utf-8")).hexdigest()
+
+
+def _empreinte(request):
+    corps = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder, default=str)
+    return _sha256(corps)
+
+
+def _reprendre(existante, empreinte):
+    """
+    Reprend une ligne « en cours » dont le bail a expiré (date_creation = début du traitement) ;
+    renvoie le nouveau début, ou None si la ligne est encore tenue ou a été reprise par un autre retry.
+    """
+    maintenant = timezone.now()
+    limite = maintenant - timedelta(seconds=getattr(settings, "IDEMPOTENCE_BAIL_SECONDES", 60))
+    if existante.statut_http is not None or existante.empreinte != empreinte or existante.date_creation > limite:
+        return None
+    repris = CleIdempotence.objects.filter(
+        cle=existante.cle, statut_http__isnull=True, date_creation=existante.date_creation
+    ).update(date_creation=maintenant)
+    return maintenant if repris else None
+
+
+def _reserver(cle, empreinte):
+    """
+    Insère la ligne « en cours » (ou reprend une ligne au bail expiré).
+    Renvoie (None, début du traitement) si la requête doit être exécutée, sinon (ligne existante, None).
+    """
+    expiration = timezone.now() + timedelta(hours=getattr(settings, "IDEMPOTENCE_TTL_HEURES", 24))
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                ligne = CleIdempotence.objects.create(cle=cle, empreinte=empreinte, date_expiration=expiration)
+            return None, ligne.date_creation
+        except IntegrityError:
+            existante = CleIdempotence.objects.filter(cle=cle).first()
+            if existante is None:
+                continue
+            if existante.date_expiration > timezone.now():
+                debut = _reprendre(existante, empreinte)
+                return (None, debut) if debut else (existante, None)
+            # Clé expirée pas encore purgée : on la remplace
+            CleIdempotence.objects.filter(cle=cle, date_expiration__lte=timezone.now()).delete()
+    return CleIdempotence.objects.filter(cle=cle).first(), None
+
+
+def idempotent(vue):
+    """Décorateur de méthode de ViewSet (create, @action POST)."""
+
+    @functools.wraps(vue)
+    def wrapper(self, request, *args, **kwargs):
+        cle_client = request.headers.get(EN_TETE)
+        if not cle_client:
+            return vue(self, request, *args, **kwargs)
+        if len(cle_client) > LONGUEUR_MAX:
+            return Response(
+                {"detail": f"{EN_TETE} trop longue ({LONGUEUR_MAX} caractères max)."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        cle = _sha256(f"{request.user.pk}:{request.method}:{request.path}:{cle_client}")
+        empreinte = _empreinte(request)
+
+        existante, debut = _reserver(cle, empreinte)
+        if existante is not None:
+            if existante.empreinte != empreinte:
+                return Response(
+                    {"detail": f"{EN_TETE} déjà utilisée pour une autre requête."},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+            if existante.statut_http is None:
+                return Response(
+                    {"detail": "Requête déjà en cours de traitement."},
+                    status=status.HTTP_409_CONFLICT,
+                    headers={"Retry-After": "1"},
+                )
+            return Response(existante.reponse, status=existante.statut_http, headers={"Idempotency-Replayed": "true"})
+
+        # Filtre sur le début du traitement : une ligne reprise par un retry n'est plus la nôtre
+        ligne = CleIdempotence.objects.filter(cle=cle, date_creation=debut)
+        try:
+            response = vue(self, request, *args, **kwargs)
+        except Exception:
+            ligne.delete()
+            raise
+
+        if response.status_code >= 500 or not hasattr(response, "data"):
+            ligne.delete()
+        else:
+            ligne.update(statut_http=response.status_code, reponse=response.data)
+        return response
+
+    return wrapper
+
+
+def purger_cles_expirees(taille_lot=10_000):
+    """Supprime les clés expirées par lots ; retourne le nombre de lignes supprimées."""
+    total = 0
+    while True:
+        cles = list(
+            CleIdempotence.objects.filter(date_expiration__lte=timezone.now()).values_list("cle", flat=True)[:taille_lot]
+        )
+        if not cles:
+            return total
+        total += CleIdempotence.objects.filter(cle__in=cles).delete()[0]
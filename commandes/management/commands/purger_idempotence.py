@@ -0,0 +1,15 @@
+# commandes/management/commands/purger_idempotence.py
+from django.core.management.base import BaseCommand
+
+from commandes.idempotence import purger_cles_expirees
+
+
+class Command(BaseCommand):
+    help = "Supprime les réponses Idempotency-Key expirées (à lancer périodiquement, ex. cron horaire)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lot", type=int, default=10_000, help="Lignes supprimées par requête.")
+
+    def handle(self, *args, **options):
+        total = purger_cles_expirees(taille_lot=options["lot"])
+        self.stdout.write(f"{total} clé(s) d'idempotence expirée(s) supprimée(s).")
@@ -0,0 +1,32 @@
+# commandes/management/commands/traiter_outbox.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from commandes.outbox import traiter_lot
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker outbox : émet les billets, met à jour les statistiques et notifie pour chaque commande payée. "
+        "Plusieurs instances peuvent tourner en parallèle."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lot", type=int, default=100, help="Événements lus par passage.")
+        parser.add_argument(
+            "--boucle",
+            type=float,
+            default=0,
+            help="Attente (s) entre deux passages quand il n'y a rien à traiter (0 = un seul passage).",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            traites, restants = traiter_lot(taille_lot=options["lot"])
+            if traites or restants:
+                self.stdout.write(f"{traites} événement(s) traité(s), {restants} non traité(s).")
+            if not options["boucle"]:
+                return
+            if not traites:
+                time.sleep(options["boucle"])
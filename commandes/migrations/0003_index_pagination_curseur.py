@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commandes', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['date_creation', 'id'], name='commande_date_cr_21fd00_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['utilisateur', 'date_creation', 'id'], name='commande_utilisa_c10712_idx'),
+        ),
+    ]
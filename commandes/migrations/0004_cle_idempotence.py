@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:17
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commandes', '0003_index_pagination_curseur'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CleIdempotence',
+            fields=[
+                ('cle', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('empreinte', models.CharField(max_length=64)),
+                ('statut_http', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('reponse', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_expiration', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'db_table': 'cle_idempotence',
+            },
+        ),
+    ]
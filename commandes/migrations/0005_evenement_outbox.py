@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:18
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commandes', '0004_cle_idempotence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EvenementOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type_evenement', models.CharField(choices=[('COMMANDE_PAYEE', 'Commande payée')], max_length=30)),
+                ('statut', models.CharField(choices=[('EN_ATTENTE', 'En attente'), ('TRAITE', 'Traité'), ('ECHEC', 'Échec définitif')], default='EN_ATTENTE', max_length=20)),
+                ('tentatives', models.PositiveSmallIntegerField(default=0)),
+                ('prochaine_tentative', models.DateTimeField(default=django.utils.timezone.now)),
+                ('derniere_erreur', models.TextField(blank=True, default='')),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_traitement', models.DateTimeField(blank=True, null=True)),
+                ('commande', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='evenements_outbox', to='commandes.commande')),
+            ],
+            options={
+                'db_table': 'evenement_outbox',
+                'indexes': [models.Index(fields=['statut', 'prochaine_tentative'], name='evenement_o_statut_ae90b3_idx')],
+            },
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
 import uuid
 
@@ -45,6 +46,11 @@ class Commande(models.Model):
     class Meta:
         db_table = "commande"
         ordering = ["-date_creation"]
+        indexes = [
+            # Pagination par curseur (liste staff / liste d'un utilisateur)
+            models.Index(fields=["date_creation", "id"]),
+            models.Index(fields=["utilisateur", "date_creation", "id"]),
+        ]
 
     def __str__(self):
         return f"{self.numero_commande} - {self.utilisateur_id} ({self.statut})"
@@ -72,4 +78,68 @@ class LigneCommande(models.Model):
         db_table = "ligne_commande"
 
     def __str__(self):
-        return f"{self.commande_id} - {self.offre_id} x{self.quantite}"
\ No newline at end of file
+        return f"{self.commande_id} - {self.offre_id} x{self.quantite}"
+
+class CleIdempotence(models.Model):
+    """
+    Réponse mémorisée d'une requête POST portant un en-tête Idempotency-Key (voir commandes/idempotence.py).
+    statut_http vide = requête en cours de traitement, depuis date_creation (remise à l'heure
+    quand un retry reprend une ligne dont le bail IDEMPOTENCE_BAIL_SECONDES a expiré).
+    """
+
+    # sha256(utilisateur, méthode, chemin, clé du client)
+    cle = models.CharField(max_length=64, primary_key=True)
+    # sha256 du corps de la requête : une même clé avec un autre corps est refusée
+    empreinte = models.CharField(max_length=64)
+
+    statut_http = models.PositiveSmallIntegerField(null=True, blank=True)
+    reponse = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_expiration = models.DateTimeField(db_index=True)
+
+    class Meta:
+        db_table = "cle_idempotence"
+
+    def __str__(self):
+        return f"{self.cle[:12]}… ({self.statut_http or 'en cours'})"
+
+
+class EvenementOutbox(models.Model):
+    """
+    Travail différé écrit dans la même transaction que le changement d'état métier
+    (ex. commande payée), consommé par la commande traiter_outbox (voir commandes/outbox.py).
+    """
+
+    TYPES = [
+        ("COMMANDE_PAYEE", "Commande payée"),
+    ]
+    STATUTS = [
+        ("EN_ATTENTE", "En attente"),
+        ("TRAITE", "Traité"),
+        ("ECHEC", "Échec définitif"),
+    ]
+
+    type_evenement = models.CharField(max_length=30, choices=TYPES)
+    commande = models.ForeignKey(
+        Commande,
+        on_delete=models.CASCADE,
+        related_name="evenements_outbox",
+    )
+
+    statut = models.CharField(max_length=20, choices=STATUTS, default="EN_ATTENTE")
+    tentatives = models.PositiveSmallIntegerField(default=0)
+    prochaine_tentative = models.DateTimeField(default=timezone.now)
+    derniere_erreur = models.TextField(blank=True, default="")
+
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_traitement = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "evenement_outbox"
+        indexes = [
+            models.Index(fields=["statut", "prochaine_tentative"]),
+        ]
+
+    def __str__(self):
+        return f"{self.type_evenement} CMD#{self.commande_id} ({self.statut})"
@@ -0,0 +1,111 @@
+# commandes/outbox.py
+"""
+Traitement différé des commandes payées (patron « outbox »).
+
+La confirmation de paiement ne fait que passer la commande à PAYEE et écrire une ligne
+EvenementOutbox dans la même transaction : sa durée ne dépend plus du nombre de billets.
+Le worker (commande traiter_outbox) consomme ensuite les événements :
+- émission des e-billets, statistiques de vente, notification ;
+- tout l'effet d'un événement est appliqué dans la transaction qui le marque TRAITE :
+  un worker interrompu ne laisse rien à moitié, l'événement est simplement repris
+  (livraison « au moins une fois », effets en base appliqués une seule fois) ;
+- en cas d'erreur : nouvelle tentative avec attente exponentielle, ECHEC après MAX_TENTATIVES ;
+- plusieurs workers peuvent tourner : chaque événement est verrouillé (SKIP LOCKED si disponible).
+"""
+import logging
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from analytics.services import enregistrer_ventes_commande
+from billets.services import emettre_billets_commande
+from notifications.models import Notification
+from .models import EvenementOutbox
+
+logger = logging.getLogger(__name__)
+
+MAX_TENTATIVES = 10
+ATTENTE_MAX = timedelta(hours=1)
+
+
+def _commande_payee(evenement):
+    cmd = evenement.commande
+    # Billets déjà émis (ex. par une version antérieure du traitement) : pas de double émission
+    if cmd.ebillets.exists():
+        billets = list(cmd.ebillets.all())
+    else:
+        billets = emettre_billets_commande(cmd, cmd.lignes.select_related("offre").all())
+
+    Notification.objects.create(
+        utilisateur_id=cmd.utilisateur_id,
+        type_notification="PAIEMENT",
+        titre="Paiement confirmé",
+        message=f"Commande {cmd.numero_commande} : {len(billets)} e-billet(s) disponible(s).",
+    )
+
+    # En dernier : les lignes de statistiques (offres populaires) restent verrouillées
+    # le moins longtemps possible avant la validation
+    enregistrer_ventes_commande(cmd)
+
+
+TRAITEMENTS = {
+    "COMMANDE_PAYEE": _commande_payee,
+}
+
+
+def publier(type_evenement, commande):
+    """Écrit l'événement ; à appeler dans la transaction du changement d'état."""
+    return EvenementOutbox.objects.create(type_evenement=type_evenement, commande=commande)
+
+
+def _attente(tentatives):
+    return min(timedelta(seconds=10 * 2 ** (tentatives - 1)), ATTENTE_MAX)
+
+
+def appliquer(evenement):
+    """Applique l'effet de l'événement (verrouillé par l'appelant) et le marque TRAITE."""
+    TRAITEMENTS[evenement.type_evenement](evenement)
+    evenement.statut = "TRAITE"
+    evenement.date_traitement = timezone.now()
+    evenement.save(update_fields=["statut", "date_traitement"])
+
+
+def traiter(evenement_id):
+    """Traite un événement s'il est dû et libre ; retourne True si traité avec succès."""
+    with transaction.atomic():
+        evenement = (
+            EvenementOutbox.objects.select_for_update(
+                skip_locked=connection.features.has_select_for_update_skip_locked
+            )
+            .select_related("commande")
+            .filter(pk=evenement_id, statut="EN_ATTENTE")
+            .first()
+        )
+        if evenement is None:
+            return False
+
+        try:
+            with transaction.atomic():
+                appliquer(evenement)
+            return True
+        except Exception as e:
+            logger.exception("Échec de l'événement outbox %s", evenement.pk)
+            evenement.tentatives += 1
+            evenement.derniere_erreur = f"{type(e).__name__}: {e}"
+            evenement.prochaine_tentative = timezone.now() + _attente(evenement.tentatives)
+            if evenement.tentatives >= MAX_TENTATIVES:
+                evenement.statut = "ECHEC"
+            evenement.save(update_fields=["tentatives", "derniere_erreur", "prochaine_tentative", "statut"])
+            return False
+
+
+def traiter_lot(taille_lot=100):
+    """Traite les événements dus, du plus ancien au plus récent ; retourne (traités, non traités)."""
+    ids = list(
+        EvenementOutbox.objects.filter(statut="EN_ATTENTE", prochaine_tentative__lte=timezone.now())
+        .order_by("prochaine_tentative", "pk")
+        .values_list("pk", flat=True)[:taille_lot]
+    )
+    ok = sum(1 for evenement_id in ids if traiter(evenement_id))
+    return ok, len(ids) - ok
@@ -1,54 +1,91 @@
 from decimal import Decimal
 from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, When
 from django.utils import timezone
 
 from .models import Commande, LigneCommande
 from offres.models import Offre
-from billets.models import EBillet
+from offres.services import reserver_stock
+from paniers.services import consommer_reservations
+from . import outbox
 
 
 @transaction.atomic
 def create_commande_from_items(utilisateur, items):
-    cmd = Commande.objects.create(utilisateur=utilisateur, statut="EN_ATTENTE")
-
-    total = Decimal("0.00")
-
+    """
+    Crée la commande en un nombre de requêtes indépendant du nombre d'articles :
+    - offres verrouillées en une fois, par id croissant (SELECT ... FOR UPDATE WHERE id IN ...) :
+      deux commandes concurrentes prennent leurs verrous dans le même ordre, sans interblocage ;
+    - stock décrémenté par un seul UPDATE ... CASE ;
+    - lignes écrites par un seul INSERT (bulk_create).
+    Les offres fragmentées (vente flash) ne sont pas verrouillées : leur stock est pris
+    tranche par tranche (offres.services.reserver_stock), dans le même ordre d'id.
+    """
+    quantites = {}
     for it in items:
-        offre_id = it["offre"]
-        qte = int(it["quantite"])
-
-        offre = Offre.objects.select_for_update().get(id=offre_id)
-
+        quantites[int(it["offre"])] = quantites.get(int(it["offre"]), 0) + int(it["quantite"])
+    ids = sorted(quantites)
+
+    # Stock déjà réservé dans le panier : consommé en premier
+    reserve = consommer_reservations(utilisateur, quantites)
+
+    offres = Offre.objects.select_for_update().filter(id__in=ids, nb_tranches_stock=0).order_by("id").in_bulk()
+    manquantes = [offre_id for offre_id in ids if offre_id not in offres]
+    if manquantes:
+        offres.update(Offre.objects.filter(id__in=manquantes).in_bulk())
+    if len(offres) != len(ids):
+        raise ValueError("Offre introuvable.")
+
+    decrements = {}
+    for offre_id in ids:
+        offre = offres[offre_id]
         if offre.statut != "ACTIVE":
             raise ValueError("Offre inactive.")
 
-        if offre.stock_disponible < qte:
+        besoin = quantites[offre_id] - reserve.get(offre_id, 0)
+        if besoin <= 0:
+            continue
+        if offre.nb_tranches_stock:
+            if not reserver_stock(offre, besoin):
+                raise ValueError("Stock insuffisant.")
+        elif offre.stock_disponible < besoin:
             raise ValueError("Stock insuffisant.")
-
-        prix_unitaire = offre.prix
-        sous_total = (prix_unitaire * qte)
-
-        LigneCommande.objects.create(
-            commande=cmd,
-            offre=offre,
-            quantite=qte,
-            prix_unitaire=prix_unitaire,
-            sous_total=sous_total,
+        else:
+            decrements[offre_id] = besoin
+
+    if decrements:
+        Offre.objects.filter(id__in=list(decrements)).update(
+            stock_disponible=Case(
+                *(When(id=offre_id, then=F("stock_disponible") - n) for offre_id, n in decrements.items()),
+                default=F("stock_disponible"),
+                output_field=PositiveIntegerField(),
+            )
         )
 
+    lignes = []
+    total = Decimal("0.00")
+    for it in items:
+        offre = offres[int(it["offre"])]
+        qte = int(it["quantite"])
+        sous_total = offre.prix * qte
+        lignes.append(LigneCommande(offre=offre, quantite=qte, prix_unitaire=offre.prix, sous_total=sous_total))
         total += sous_total
 
-        offre.stock_disponible -= qte
-        offre.save(update_fields=["stock_disponible"])
-
-    cmd.total = total
-    cmd.save(update_fields=["total"])
+    cmd = Commande.objects.create(utilisateur=utilisateur, statut="EN_ATTENTE", total=total)
+    for ligne in lignes:
+        ligne.commande = cmd
+    LigneCommande.objects.bulk_create(lignes)
 
     return cmd
 
 
 @transaction.atomic
-def payer_commande_et_generer_billets(cmd: Commande, reference: str | None = None):
+def payer_commande(cmd: Commande, reference: str | None = None):
+    """
+    Passe la commande à PAYEE et publie l'événement COMMANDE_PAYEE (outbox) dans la même transaction.
+    Billets, statistiques et notification sont produits par le worker (commande traiter_outbox) :
+    la durée de la confirmation ne dépend plus du nombre de billets.
+    """
     if cmd.statut != "EN_ATTENTE":
         raise ValueError("Commande non payable.")
 
@@ -57,16 +94,12 @@ def payer_commande_et_generer_billets(cmd: Commande, reference: str | None = Non
     cmd.reference_paiement = reference or f"MOCK-{cmd.numero_commande}"
     cmd.save(update_fields=["statut", "date_paiement", "reference_paiement"])
 
-    # Génère les e-billets : quantité * nb_personnes
-    lignes = cmd.lignes.select_related("offre").all()
-    for ligne in lignes:
-        nb = int(ligne.quantite) * int(ligne.offre.nb_personnes or 1)
-        for _ in range(nb):
-            EBillet.objects.create(
-                utilisateur=cmd.utilisateur,
-                offre=ligne.offre,
-                prix_paye=ligne.prix_unitaire,
-                statut="VALIDE",
-            )
+    return cmd, outbox.publier("COMMANDE_PAYEE", cmd)
+
 
-    return cmd
\ No newline at end of file
+@transaction.atomic
+def payer_commande_et_generer_billets(cmd: Commande, reference: str | None = None):
+    """Variante synchrone (paiement MOCK) : l'événement est traité immédiatement, billets compris."""
+    cmd, evenement = payer_commande(cmd, reference=reference)
+    outbox.appliquer(evenement)
+    return cmd
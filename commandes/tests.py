@@ -1,3 +1,182 @@
-from django.test import TestCase
+import threading
+import unittest
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from users.models import Utilisateur
+from evenements.models import Evenement
+from offres.models import Offre
+from billets.models import EBillet
+from commandes.models import CleIdempotence, Commande, EvenementOutbox
+from commandes.outbox import traiter_lot
+from commandes.services import create_commande_from_items
+from paiements.models import Paiement
+
+
+def creer_offres(createur, nombre, stock):
+    event = Evenement.objects.create(
+        nom_evenement="Finale 100m",
+        lieu="Stade de France",
+        date_evenement=timezone.localdate(),
+    )
+    return [
+        Offre.objects.create(
+            evenement=event,
+            createur=createur,
+            nom_offre=f"OFFRE {i}",
+            prix=Decimal("10.00"),
+            nb_personnes=1,
+            type_offre="SOLO",
+            stock_total=stock,
+            stock_disponible=stock,
+            date_debut_vente=timezone.now(),
+            date_fin_vente=timezone.now(),
+        )
+        for i in range(nombre)
+    ]
+
+
+class CreationCommandeTest(TestCase):
+    def setUp(self):
+        self.user = Utilisateur.objects.create_user(username="client", email="client@test.com", password="Test12345!")
+        self.offres = creer_offres(self.user, 4, stock=10)
+
+    def test_requetes_independantes_du_nombre_d_articles(self):
+        def compter(offres):
+            with CaptureQueriesContext(connection) as ctx:
+                create_commande_from_items(self.user, [{"offre": o.id, "quantite": 2} for o in offres])
+            return len(ctx.captured_queries)
+
+        self.assertEqual(compter(self.offres[:1]), compter(self.offres[1:]))
+
+        for offre in self.offres:
+            offre.refresh_from_db()
+            self.assertEqual(offre.stock_disponible, 8)
+
+    def test_stock_insuffisant_annule_tout(self):
+        items = [{"offre": self.offres[0].id, "quantite": 1}, {"offre": self.offres[1].id, "quantite": 11}]
+        with self.assertRaisesMessage(ValueError, "Stock insuffisant."):
+            create_commande_from_items(self.user, items)
+
+        self.offres[0].refresh_from_db()
+        self.assertEqual(self.offres[0].stock_disponible, 10)
+
+
+class IdempotenceAPITest(APITestCase):
+    def setUp(self):
+        self.user = Utilisateur.objects.create_user(username="client", email="client@test.com", password="Test12345!")
+        self.client.force_authenticate(user=self.user)
+        self.offre = creer_offres(self.user, 1, stock=10)[0]
+
+    def test_rejeu_sans_doublon(self):
+        data = {"items": [{"offre": self.offre.id, "quantite": 2}]}
+
+        res = self.client.post("/api/commandes/", data, format="json", HTTP_IDEMPOTENCY_KEY="cle-1")
+        self.assertEqual(res.status_code, 201)
+
+        # Le retry renvoie la même réponse sans toucher aux tables métier
+        with CaptureQueriesContext(connection) as ctx:
+            rejeu = self.client.post("/api/commandes/", data, format="json", HTTP_IDEMPOTENCY_KEY="cle-1")
+        tables = " ".join(q["sql"] for q in ctx.captured_queries)
+        self.assertNotIn('"commande"', tables)
+        self.assertNotIn('"offre"', tables)
+        self.assertEqual(rejeu.status_code, 201)
+        self.assertEqual(rejeu.data["id"], res.data["id"])
+        self.assertEqual(rejeu["Idempotency-Replayed"], "true")
+        self.assertEqual(Commande.objects.count(), 1)
+
+        # Même clé, autre corps : refus
+        autre = self.client.post(
+            "/api/commandes/", {"items": [{"offre": self.offre.id, "quantite": 1}]},
+            format="json", HTTP_IDEMPOTENCY_KEY="cle-1",
+        )
+        self.assertEqual(autre.status_code, 422)
+
+        self.offre.refresh_from_db()
+        self.assertEqual(self.offre.stock_disponible, 8)
+
+    def test_requete_en_cours_reprise_apres_le_bail(self):
+        data = {"items": [{"offre": self.offre.id, "quantite": 1}]}
+        self.client.post("/api/commandes/", data, format="json", HTTP_IDEMPOTENCY_KEY="cle-2")
+
+        # Processus tué avant d'avoir mémorisé sa réponse : la ligne reste « en cours »
+        CleIdempotence.objects.update(statut_http=None, reponse=None)
+        res = self.client.post("/api/commandes/", data, format="json", HTTP_IDEMPOTENCY_KEY="cle-2")
+        self.assertEqual(res.status_code, 409)
+
+        # Bail expiré : le retry reprend la ligne et refait le travail, une seule fois
+        CleIdempotence.objects.update(date_creation=timezone.now() - timedelta(seconds=61))
+        res = self.client.post("/api/commandes/", data, format="json", HTTP_IDEMPOTENCY_KEY="cle-2")
+        self.assertEqual(res.status_code, 201)
+        self.assertNotIn("Idempotency-Replayed", res)
+        rejeu = self.client.post("/api/commandes/", data, format="json", HTTP_IDEMPOTENCY_KEY="cle-2")
+        self.assertEqual(rejeu["Idempotency-Replayed"], "true")
+        self.assertEqual(rejeu.data["id"], res.data["id"])
+        self.assertEqual(Commande.objects.count(), 2)
+
+
+class ConfirmationOutboxAPITest(APITestCase):
+    def setUp(self):
+        self.user = Utilisateur.objects.create_user(username="client", email="client@test.com", password="Test12345!")
+        self.client.force_authenticate(user=self.user)
+        offre = creer_offres(self.user, 1, stock=10)[0]
+        self.cmd = create_commande_from_items(self.user, [{"offre": offre.id, "quantite": 3}])
+        self.paiement = Paiement.objects.create(utilisateur=self.user, commande=self.cmd, montant=self.cmd.total)
+
+    def test_confirmation_puis_worker(self):
+        res = self.client.post(f"/api/paiements/{self.paiement.id}/confirmer/", {"success": True}, format="json")
+        self.assertEqual(res.status_code, 200)
+
+        # Commande payée tout de suite, billets émis par le worker
+        self.cmd.refresh_from_db()
+        self.assertEqual(self.cmd.statut, "PAYEE")
+        self.assertEqual(EBillet.objects.filter(commande=self.cmd).count(), 0)
+
+        self.assertEqual(traiter_lot(), (1, 0))
+        self.assertEqual(EBillet.objects.filter(commande=self.cmd).count(), 3)
+        self.assertEqual(self.user.notifications.count(), 1)
+        self.assertEqual(self.cmd.lignes.get().offre.statistiques.nombre_ventes, 3)
+
+        # Rien à refaire au passage suivant
+        self.assertEqual(traiter_lot(), (0, 0))
+        self.assertEqual(EvenementOutbox.objects.get().statut, "TRAITE")
+
+
+@unittest.skipUnless(connection.features.has_select_for_update, "Verrous de lignes requis (PostgreSQL, MySQL).")
+class CommandesConcurrentesTest(TransactionTestCase):
+    def test_ordres_inverses_sans_interblocage(self):
+        users = [
+            Utilisateur.objects.create_user(username=f"client{i}", email=f"client{i}@test.com", password="Test12345!")
+            for i in range(2)
+        ]
+        a, b = creer_offres(users[0], 2, stock=100)
+        erreurs = []
+
+        def acheter(user, offres):
+            try:
+                for _ in range(20):
+                    create_commande_from_items(user, [{"offre": o.id, "quantite": 1} for o in offres])
+            except Exception as e:
+                erreurs.append(e)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=acheter, args=(users[0], [a, b])),
+            threading.Thread(target=acheter, args=(users[1], [b, a])),
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(erreurs, [])
+        a.refresh_from_db()
+        b.refresh_from_db()
+        self.assertEqual((a.stock_disponible, b.stock_disponible), (60, 60))
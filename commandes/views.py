@@ -2,14 +2,19 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
+from .idempotence import idempotent
 from .models import Commande
 from .serializers import CommandeSerializer, CreateCommandeSerializer
 from .services import create_commande_from_items, payer_commande_et_generer_billets
+from billets.views import reponse_pdf_billets
+from core.pagination import PaginationCurseur
+from paniers import panier_anonyme
 
 
 class CommandeViewSet(viewsets.ModelViewSet):
     serializer_class = CommandeSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = PaginationCurseur
 
     def get_queryset(self):
         user = self.request.user
@@ -19,19 +24,30 @@ class CommandeViewSet(viewsets.ModelViewSet):
         return qs.filter(utilisateur=user)
 
     def create(self, request, *args, **kwargs):
+        # Panier anonyme encore en cookie : reporté (réservé) d'abord, la commande consomme ses réservations.
+        # Hors de @idempotent : une réponse rejouée (ou 409) efface aussi le cookie, déjà reporté.
+        panier_anonyme.materialiser_si_besoin(request)
+        return panier_anonyme.effacer_si_present(request, self._creer(request, *args, **kwargs))
+
+    @idempotent
+    def _creer(self, request, *args, **kwargs):
         serializer = CreateCommandeSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-
         try:
             cmd = create_commande_from_items(request.user, serializer.validated_data["items"])
         except Exception as e:
             return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
-
         out = CommandeSerializer(cmd, context={"request": request})
         return Response(out.data, status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=["POST"], url_path="payer")
+    @idempotent
     def payer(self, request, pk=None):
+        """
+        Paiement MOCK synchrone : l'événement outbox est appliqué dans la requête, billets compris,
+        donc sa durée croît avec le nombre de billets. Le chemin de production est
+        /api/paiements/<id>/confirmer/, traité par le worker traiter_outbox.
+        """
         cmd = self.get_object()
 
         ref = request.data.get("reference_paiement")
@@ -41,4 +57,13 @@ class CommandeViewSet(viewsets.ModelViewSet):
             return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         out = CommandeSerializer(cmd, context={"request": request})
-        return Response(out.data, status=status.HTTP_200_OK)
\ No newline at end of file
+        return Response(out.data, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=["GET"], url_path="pdf")
+    def pdf(self, request, pk=None):
+        """
+        GET /api/commandes/<id>/pdf/
+        Tous les billets de la commande dans un seul PDF (une page par billet), envoyé en flux.
+        """
+        cmd = self.get_object()
+        return reponse_pdf_billets(cmd.ebillets.all(), f"{cmd.numero_commande}.pdf")
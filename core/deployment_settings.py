@@ -36,6 +36,7 @@ INSTALLED_APPS = [
     "corsheaders",
     "rest_framework",
     "rest_framework.authtoken",
+    "channels",
 
     # Local apps
     "users.apps.UsersConfig",
@@ -46,6 +47,7 @@ INSTALLED_APPS = [
     "billets",
     "paiements.apps.PaiementsConfig",
     "analytics.apps.AnalyticsConfig",
+    "notifications",
 ]
 
 # ============================================================
@@ -127,6 +129,28 @@ DATABASES = {
     )
 }
 
+# ============================================================
+# CACHE / CHANNELS (REDIS, PARTAGÉS ENTRE PROCESSUS)
+# ============================================================
+
+# Obligatoire : les workers web et traiter_outbox partagent compteurs d'entrées,
+# statistiques en cache (et leurs invalidations) et diffusion WebSocket.
+CACHE_URL = config("CACHE_URL")
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": CACHE_URL,
+    }
+}
+
+CHANNEL_LAYERS = {
+    "default": {
+        "BACKEND": "channels_redis.core.RedisChannelLayer",
+        "CONFIG": {"hosts": [CACHE_URL]},
+    }
+}
+
 # ============================================================
 # AUTH
 # ============================================================
@@ -0,0 +1,191 @@
+# core/pagination.py
+"""
+Pagination des grosses tables (e_billet, commande, paiement).
+
+- API : pagination par clé composite. Le curseur retient les valeurs des critères de tri
+  de la dernière ligne servie, id compris ; la page suivante est lue par
+  WHERE (date, id) < (:date, :id), écrit (date < :date) OR (date = :date AND id < :id)
+  pour suivre le sens de chaque critère, sur l'index composite (date, id), sans COUNT(*)
+  ni OFFSET, quel que soit le nombre d'ex aequo.
+- Tri sur une colonne nullable (?ordering=date_utilisation...) : NULL ne se compare pas,
+  la liste repasse alors en pagination par numéro de page (?page=, avec count).
+- Admin : nombre de lignes estimé à partir des statistiques du moteur
+  lorsque la liste n'est pas filtrée, au lieu d'un COUNT(*) sur toute la table.
+"""
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import date, datetime, time
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _valeur_curseur(valeur):
+    # Horodatages à la microseconde près : une valeur tronquée ferait sauter ou répéter des lignes
+    if isinstance(valeur, (datetime, date, time)):
+        return valeur.isoformat()
+    if isinstance(valeur, Decimal):
+        return str(valeur)
+    return valeur
+
+
+class PaginationCurseur(CursorPagination):
+    """
+    Curseur opaque (?cursor=...) ; ?page_size= borné par max_page_size.
+    L'ordre vient de OrderingFilter (vue) ou de `ordering` ; l'id est toujours
+    ajouté en dernier critère : la clé (critères..., id) est unique.
+    """
+
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = ("-date_creation", "-id")
+
+    def get_ordering(self, request, queryset, view):
+        ordering = tuple(super().get_ordering(request, queryset, view))
+        if not {"id", "-id", "pk", "-pk"} & set(ordering):
+            ordering += ("-id" if ordering[0].startswith("-") else "id",)
+        return tuple(o.replace("pk", "id") if o.lstrip("-") == "pk" else o for o in ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.repli = None
+
+        meta = queryset.model._meta
+        if any(meta.get_field(o.lstrip("-")).null for o in self.ordering):
+            self.repli = PageNumberPagination()
+            self.repli.page_size = self.page_size
+            self.repli.page_size_query_param = self.page_size_query_param
+            self.repli.max_page_size = self.max_page_size
+            return self.repli.paginate_queryset(queryset.order_by(*self.ordering), request, view)
+
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        curseur = self.decode_cursor(request)
+        arriere = curseur is not None and curseur[0] == "p"
+        qs = queryset.order_by(*self.ordering)
+        if curseur is not None:
+            qs = qs.filter(self._au_dela(curseur[1], arriere))
+        if arriere:
+            qs = qs.reverse()
+
+        lignes = list(qs[: self.page_size + 1])
+        encore = len(lignes) > self.page_size
+        self.page = lignes[: self.page_size]
+        if arriere:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, encore
+        else:
+            self.has_next, self.has_previous = encore, curseur is not None
+        return self.page
+
+    def _cle(self, obj):
+        meta = type(obj)._meta
+        return [_valeur_curseur(getattr(obj, meta.get_field(o.lstrip("-")).attname)) for o in self.ordering]
+
+    def _au_dela(self, valeurs, arriere):
+        """(c1, c2, ..., id) strictement après (ou avant) le curseur, critère par critère."""
+        conditions = []
+        for i, critere in enumerate(self.ordering):
+            champ = critere.lstrip("-")
+            decroissant = critere.startswith("-") != arriere
+            egalites = {c.lstrip("-"): v for c, v in zip(self.ordering[:i], valeurs)}
+            conditions.append(Q(**egalites, **{f"{champ}__{'lt' if decroissant else 'gt'}": valeurs[i]}))
+        return reduce(or_, conditions)
+
+    def encode_cursor(self, sens, valeurs):
+        jeton = json.dumps([sens, valeurs], separators=(",", ":")).encode()
+        return replace_query_param(self.base_url, self.cursor_query_param, urlsafe_b64encode(jeton).decode("ascii"))
+
+    def decode_cursor(self, request):
+        encode = request.query_params.get(self.cursor_query_param)
+        if encode is None:
+            return None
+        try:
+            sens, valeurs = json.loads(urlsafe_b64decode(encode.encode("ascii")))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        # Curseur d'un autre tri (?ordering= modifié entre deux pages) : invalide
+        if sens not in ("n", "p") or not isinstance(valeurs, list) or len(valeurs) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return sens, valeurs
+
+    def get_next_link(self):
+        if self.repli is not None:
+            return self.repli.get_next_link()
+        if not self.has_next:
+            return None
+        if not self.page:
+            # Page vide atteinte en reculant : repartir du début
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor("n", self._cle(self.page[-1]))
+
+    def get_previous_link(self):
+        if self.repli is not None:
+            return self.repli.get_previous_link()
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor("p", self._cle(self.page[0]))
+
+    def get_paginated_response(self, data):
+        if self.repli is not None:
+            return self.repli.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_html_context(self):
+        if self.repli is not None:
+            return self.repli.get_html_context()
+        return super().get_html_context()
+
+
+class PaginationCurseurAchat(PaginationCurseur):
+    ordering = ("-date_achat", "-id")
+
+
+def _estimation_lignes(model):
+    """Nombre de lignes estimé par le moteur (None si indisponible)."""
+    connexion = connections[model.objects.db]
+    table = model._meta.db_table
+    with connexion.cursor() as cursor:
+        if connexion.vendor == "mysql":
+            cursor.execute(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                [table],
+            )
+        elif connexion.vendor == "postgresql":
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table])
+        else:
+            return None
+        ligne = cursor.fetchone()
+    if not ligne or ligne[0] is None or ligne[0] < 0:
+        return None
+    return int(ligne[0])
+
+
+class PaginateurEstime(Paginator):
+    """Paginator de l'admin : estimation du moteur pour une liste non filtrée, COUNT(*) sinon."""
+
+    # En dessous, l'estimation est trop imprécise et le COUNT(*) peu coûteux
+    SEUIL_ESTIMATION = 100_000
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, "query", None)
+        if query is not None and not query.where:
+            estimation = _estimation_lignes(self.object_list.model)
+            if estimation is not None and estimation >= self.SEUIL_ESTIMATION:
+                return estimation
+        return super().count
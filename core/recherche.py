@@ -0,0 +1,91 @@
+# core/recherche.py
+"""
+Recherche « support » sur les grosses tables (e_billet, paiement).
+
+Chaque table porte une colonne dénormalisée `recherche` (texte en minuscules : numéro,
+username, email, offre...) tenue à jour par des signaux (billets/recherche.py,
+paiements/recherche.py). `?search=` n'interroge plus que cette colonne, sans jointure :
+- PostgreSQL : LIKE '%terme%' servi par un index GIN pg_trgm (gin_trgm_ops) ;
+- MySQL      : index FULLTEXT (parser ngram) interrogé par MATCH ... AGAINST, puis LIKE
+               pour ne garder que les correspondances exactes ;
+- autres (SQLite) : LIKE simple (parcours de table, suffisant en dev/tests).
+Les index spécifiques sont créés par migration via creer_index_recherche().
+"""
+from django.db import connections
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import SearchFilter
+
+# Taille des n-grammes du parser MySQL (ngram_token_size, 2 par défaut)
+NGRAM_MYSQL = 2
+
+
+def normaliser(*valeurs):
+    """Texte indexé : valeurs non vides, en minuscules, séparées par des espaces."""
+    return " ".join(str(v).lower() for v in valeurs if v)
+
+
+def _nom_index(table):
+    return f"{table}_recherche_idx"
+
+
+def creer_index_recherche(schema_editor, table, colonne="recherche"):
+    """Index trigramme (PostgreSQL) ou FULLTEXT ngram (MySQL) ; rien ailleurs."""
+    qn = schema_editor.quote_name
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            f"CREATE INDEX {qn(_nom_index(table))} ON {qn(table)} USING gin ({qn(colonne)} gin_trgm_ops)"
+        )
+    elif vendor == "mysql":
+        schema_editor.execute(
+            f"CREATE FULLTEXT INDEX {qn(_nom_index(table))} ON {qn(table)} ({qn(colonne)}) WITH PARSER ngram"
+        )
+
+
+def supprimer_index_recherche(schema_editor, table):
+    qn = schema_editor.quote_name
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(f"DROP INDEX IF EXISTS {qn(_nom_index(table))}")
+    elif vendor == "mysql":
+        schema_editor.execute(f"DROP INDEX {qn(_nom_index(table))} ON {qn(table)}")
+
+
+def _match(connexion, queryset, champ, terme):
+    qn = connexion.ops.quote_name
+    colonne = queryset.model._meta.get_field(champ).column
+    phrase = '"%s"' % terme.replace('"', " ")
+    return RawSQL(
+        f"MATCH ({qn(queryset.model._meta.db_table)}.{qn(colonne)}) AGAINST (%s IN BOOLEAN MODE)",
+        [phrase],
+    )
+
+
+def rechercher(queryset, termes, champ="recherche"):
+    """Chaque terme doit apparaître dans la colonne (ET logique, comme SearchFilter)."""
+    connexion = connections[queryset.db]
+    for i, terme in enumerate(t.lower() for t in termes if t):
+        if connexion.vendor == "mysql" and len(terme) >= NGRAM_MYSQL:
+            queryset = queryset.alias(**{f"_pertinence_{i}": _match(connexion, queryset, champ, terme)})
+            queryset = queryset.filter(**{f"_pertinence_{i}__gt": 0})
+        # Colonne déjà en minuscules : LIKE sensible à la casse, compatible avec l'index trigramme
+        queryset = queryset.filter(**{f"{champ}__contains": terme})
+    return queryset
+
+
+class RechercheFilter(SearchFilter):
+    """SearchFilter sur la colonne dénormalisée : la vue déclare search_fields = ["recherche"]."""
+
+    def filter_queryset(self, request, queryset, view):
+        champs = self.get_search_fields(view, request)
+        if not champs:
+            return queryset
+        return rechercher(queryset, self.get_search_terms(request), champs[0])
+
+
+class RechercheAdminMixin:
+    """Barre de recherche de l'admin servie par la colonne dénormalisée (pas de jointure)."""
+
+    def get_search_results(self, request, queryset, search_term):
+        return rechercher(queryset, search_term.split()), False
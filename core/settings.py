@@ -52,11 +52,35 @@ ROOT_URLCONF = "core.urls"
 WSGI_APPLICATION = "core.wsgi.application"
 ASGI_APPLICATION = "core.asgi.application"
 
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer",
+# Cache et couche de canaux partagés entre processus (CACHE_URL, Redis) : compteurs d'entrées,
+# invalidations faites par traiter_outbox, diffusion WebSocket d'un worker à l'autre.
+# Sans CACHE_URL (dev, tests) : LocMemCache et InMemoryChannelLayer, propres à chaque processus.
+# La production (core/deployment_settings.py) exige CACHE_URL.
+CACHE_URL = config("CACHE_URL", default="")
+if CACHE_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_URL,
+        }
+    }
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {"hosts": [CACHE_URL]},
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels.layers.InMemoryChannelLayer",
+        }
     }
-}
 
 TEMPLATES = [
     {
@@ -143,6 +167,30 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Billets : QR codes rendus à la demande, cache LRU par processus (nombre d'images)
+BILLET_QR_CACHE_TAILLE = config("BILLET_QR_CACHE_TAILLE", default=2048, cast=int)
+# "CLE" : le QR contient la clé brute ; "SIGNE" : charge HMAC vérifiable sans base (billets/signature.py)
+BILLET_QR_FORMAT = config("BILLET_QR_FORMAT", default="CLE")
+BILLET_QR_SIGNATURE_CLE = config("BILLET_QR_SIGNATURE_CLE", default=SECRET_KEY)
+# Pool de processus de rendu QR/PDF (0 = rendu dans le thread de la requête)
+BILLET_RENDU_PROCESSUS = config("BILLET_RENDU_PROCESSUS", default=0, cast=int)
+BILLET_RENDU_FILE_MAX = config("BILLET_RENDU_FILE_MAX", default=64, cast=int)
+BILLET_RENDU_ATTENTE = config("BILLET_RENDU_ATTENTE", default=2.0, cast=float)
+# Cache disque des PDF de billets (sous MEDIA_ROOT), borné en taille, éviction LRU
+BILLET_PDF_CACHE_DOSSIER = "cache/billets_pdf"
+BILLET_PDF_CACHE_MAX_OCTETS = config("BILLET_PDF_CACHE_MAX_OCTETS", default=512 * 1024 * 1024, cast=int)
+
+# Durée de conservation des réponses rejouables (en-tête Idempotency-Key)
+IDEMPOTENCE_TTL_HEURES = config("IDEMPOTENCE_TTL_HEURES", default=24, cast=int)
+# Au-delà, une requête « en cours » sans réponse est considérée abandonnée : un retry la reprend
+IDEMPOTENCE_BAIL_SECONDES = config("IDEMPOTENCE_BAIL_SECONDES", default=60, cast=int)
+
+# Durée de réservation du stock d'un panier (prolongée à chaque ajout)
+PANIER_RESERVATION_MINUTES = config("PANIER_RESERVATION_MINUTES", default=15, cast=int)
+
+# Durée de vie en cache des indicateurs globaux de ventes (invalidés à chaque vente)
+ANALYTICS_CACHE_SECONDES = config("ANALYTICS_CACHE_SECONDES", default=30, cast=int)
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 APPEND_SLASH = True
 
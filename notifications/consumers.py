@@ -1,12 +1,16 @@
 # notifications/consumers.py
 import json
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 
+from billets import compteurs
+
 
 class NotificationConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         # Pour l’instant on accepte tout
         await self.accept()
+        self.groupes = set()
 
         # Message de bienvenue (debug)
         await self.send(
@@ -19,8 +23,18 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         )
 
     async def receive(self, text_data=None, bytes_data=None):
-        # Echo basique pour tester
         if text_data:
+            try:
+                message = json.loads(text_data)
+            except ValueError:
+                message = None
+
+            # Tableau de bord des entrées : abonnement aux compteurs d'un événement (staff)
+            if isinstance(message, dict) and message.get("action") == "suivre_entrees":
+                await self.suivre_entrees(message.get("evenement"))
+                return
+
+            # Echo basique pour tester
             await self.send(
                 text_data=json.dumps(
                     {
@@ -30,6 +44,28 @@ class NotificationConsumer(AsyncWebsocketConsumer):
                 )
             )
 
+    async def suivre_entrees(self, evenement_id):
+        user = self.scope.get("user")
+        if not (user and user.is_authenticated and user.is_staff):
+            await self.send(text_data=json.dumps({"type": "erreur", "detail": "Réservé au staff."}))
+            return
+        try:
+            evenement_id = int(evenement_id)
+        except (TypeError, ValueError):
+            await self.send(text_data=json.dumps({"type": "erreur", "detail": "evenement entier requis."}))
+            return
+
+        groupe = compteurs.groupe_evenement(evenement_id)
+        await self.channel_layer.group_add(groupe, self.channel_name)
+        self.groupes.add(groupe)
+
+        # État initial, puis une mise à jour à chaque validation
+        etat = await database_sync_to_async(compteurs.lire)(evenement_id)
+        await self.send(text_data=json.dumps({"type": "entrees.maj", **etat}))
+
+    async def entrees_maj(self, event):
+        await self.send(text_data=json.dumps(event))
+
     async def disconnect(self, close_code):
-        # Tu pourras nettoyer ici (group_discard...) plus tard
-        pass
+        for groupe in getattr(self, "groupes", ()):
+            await self.channel_layer.group_discard(groupe, self.channel_name)
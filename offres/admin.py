@@ -13,6 +13,7 @@ class OffreAdmin(admin.ModelAdmin):
         "nb_personnes",
         "type_offre",
         "stock_disponible",
+        "nb_tranches_stock",
         "statut",
         "date_debut_vente",
         "date_fin_vente",
@@ -33,4 +34,4 @@ class OffreAdmin(admin.ModelAdmin):
         "createur__email",
     )
     ordering = ("-date_creation",)
-    readonly_fields = ("date_creation", "date_modification")
+    readonly_fields = ("date_creation", "date_modification", "nb_tranches_stock")
@@ -0,0 +1,109 @@
+# offres/management/commands/bench_stock.py
+import threading
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, transaction
+from django.utils import timezone
+
+from commandes.models import Commande
+from commandes.services import create_commande_from_items
+from evenements.models import Evenement
+from offres.models import Offre
+from offres.services import fragmenter_stock, stock_restant
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure les commandes/s sur une offre très demandée selon le nombre de tranches de stock. "
+        "À lancer sur une base locale PostgreSQL (ou MySQL), jamais en production : "
+        "les données de test sont créées puis supprimées. SQLite est refusé : un seul écrivain "
+        "à la fois pour toute la base, il n'y a pas de contention de ligne à mesurer."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tranches", default="0,1,4,16", help="Nombres de tranches testés (0 = stock unique).")
+        parser.add_argument("--threads", type=int, default=16, help="Acheteurs simultanés.")
+        parser.add_argument("--commandes", type=int, default=50, help="Commandes par acheteur.")
+        parser.add_argument(
+            "--latence",
+            type=float,
+            default=5.0,
+            help="Travail simulé (ms) entre la réservation et le commit, verrou tenu.",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor == "sqlite":
+            raise CommandError(
+                "bench_stock mesure la contention sur les lignes de stock : SQLite verrouille toute la base "
+                "(« database is locked » dès le 2e acheteur). Lancer sur PostgreSQL (DATABASE_URL=postgres://...)."
+            )
+        nom = f"bench-stock-{time.time_ns()}"
+        acheteur = get_user_model().objects.create_user(username=nom, email=f"{nom}@bench.invalid", password=None)
+        evenement = Evenement.objects.create(
+            nom_evenement="Bench stock", lieu="Bench", date_evenement=timezone.localdate()
+        )
+
+        self.stdout.write(f"moteur {connection.vendor}, {options['threads']} acheteurs, latence {options['latence']} ms")
+        try:
+            for nb_tranches in (int(n) for n in options["tranches"].split(",")):
+                self._mesurer(acheteur, evenement, nb_tranches, options)
+        finally:
+            evenement.delete()
+            acheteur.delete()
+
+    def _mesurer(self, acheteur, evenement, nb_tranches, options):
+        total = options["threads"] * options["commandes"]
+        offre = Offre.objects.create(
+            evenement=evenement,
+            createur=acheteur,
+            nom_offre=f"Bench {nb_tranches} tranche(s)",
+            prix=Decimal("10.00"),
+            type_offre="SOLO",
+            stock_total=total,
+            stock_disponible=total,
+            date_debut_vente=timezone.now(),
+            date_fin_vente=timezone.now(),
+        )
+        if nb_tranches:
+            offre = fragmenter_stock(offre.pk, nb_tranches)
+
+        compteurs = {"ok": 0, "refus": 0, "erreurs": 0}
+        verrou = threading.Lock()
+
+        def acheter():
+            try:
+                for _ in range(options["commandes"]):
+                    try:
+                        # Chemin réel d'une commande (verrous, stock, lignes), plus le travail simulé
+                        with transaction.atomic():
+                            create_commande_from_items(acheteur, [{"offre": offre.pk, "quantite": 1}])
+                            time.sleep(options["latence"] / 1000)
+                        cle = "ok"
+                    except ValueError:  # stock insuffisant
+                        cle = "refus"
+                    except OperationalError:  # interblocage, délai de verrou dépassé
+                        cle = "erreurs"
+                    with verrou:
+                        compteurs[cle] += 1
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=acheter) for _ in range(options["threads"])]
+        debut = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        duree = time.perf_counter() - debut
+
+        offre.refresh_from_db()
+        self.stdout.write(
+            f"tranches={nb_tranches:<3} {compteurs['ok'] / duree:8.1f} commandes/s  "
+            f"(ok {compteurs['ok']}, refus {compteurs['refus']}, erreurs {compteurs['erreurs']}, "
+            f"stock restant {stock_restant(offre)})"
+        )
+        Commande.objects.filter(utilisateur=acheteur).delete()
+        offre.delete()
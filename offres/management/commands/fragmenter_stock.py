@@ -0,0 +1,25 @@
+# offres/management/commands/fragmenter_stock.py
+from django.core.management.base import BaseCommand, CommandError
+
+from offres.models import Offre
+from offres.services import fragmenter_stock, stock_restant
+
+
+class Command(BaseCommand):
+    help = "Active (N > 0) ou désactive (0) le stock fragmenté en N tranches d'une offre (vente flash)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("offre", type=int, help="Id de l'offre.")
+        parser.add_argument("tranches", type=int, help="Nombre de tranches (0 = stock unique).")
+
+    def handle(self, *args, **options):
+        if options["tranches"] < 0:
+            raise CommandError("Le nombre de tranches doit être positif ou nul.")
+        try:
+            offre = fragmenter_stock(options["offre"], options["tranches"])
+        except Offre.DoesNotExist:
+            raise CommandError(f"Offre {options['offre']} introuvable.")
+
+        self.stdout.write(
+            f"Offre {offre.pk} : {offre.nb_tranches_stock} tranche(s), stock restant {stock_restant(offre)}."
+        )
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('offres', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='offre',
+            name='nb_tranches_stock',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='TrancheStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero', models.PositiveSmallIntegerField()),
+                ('disponible', models.PositiveIntegerField(default=0)),
+                ('offre', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tranches_stock', to='offres.offre')),
+            ],
+            options={
+                'db_table': 'offre_tranche_stock',
+                'constraints': [models.UniqueConstraint(fields=('offre', 'numero'), name='uniq_tranche_stock_offre_numero')],
+            },
+        ),
+    ]
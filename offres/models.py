@@ -31,6 +31,9 @@ class Offre(models.Model):
     type_offre = models.CharField(max_length=20, choices=TYPE_OFFRE_CHOICES)
     stock_total = models.PositiveIntegerField()
     stock_disponible = models.PositiveIntegerField()
+    # Mode vente flash : stock réparti en N tranches (TrancheStock), 0 = désactivé.
+    # Géré par offres.services.fragmenter_stock (commande fragmenter_stock), pas à la main.
+    nb_tranches_stock = models.PositiveSmallIntegerField(default=0)
     date_debut_vente = models.DateTimeField()
     date_fin_vente = models.DateTimeField()
     lieu_evenement = models.CharField(max_length=200, blank=True, null=True)
@@ -51,3 +54,26 @@ class Offre(models.Model):
 
     def __str__(self):
         return f"{self.nom_offre} ({self.evenement})"
+
+
+class TrancheStock(models.Model):
+    """
+    Sous-compteur du stock d'une offre fragmentée : les commandes se répartissent au hasard
+    sur les tranches, donc sur des lignes distinctes, au lieu de toutes verrouiller la ligne offre.
+    """
+    offre = models.ForeignKey(
+        Offre,
+        on_delete=models.CASCADE,
+        related_name='tranches_stock'
+    )
+    numero = models.PositiveSmallIntegerField()
+    disponible = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'offre_tranche_stock'
+        constraints = [
+            models.UniqueConstraint(fields=['offre', 'numero'], name='uniq_tranche_stock_offre_numero'),
+        ]
+
+    def __str__(self):
+        return f"{self.offre_id} #{self.numero} ({self.disponible})"
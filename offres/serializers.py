@@ -1,6 +1,7 @@
 # offres/serializers.py
 from rest_framework import serializers
 from .models import Offre
+from .services import stock_restant
 
 class OffreSerializer(serializers.ModelSerializer):
     evenement_nom = serializers.CharField(source="evenement.nom", read_only=True)
@@ -8,4 +9,23 @@ class OffreSerializer(serializers.ModelSerializer):
     class Meta:
         model = Offre
         fields = "__all__"
-        read_only_fields = ["createur", "date_creation", "date_modification", "evenement_nom"]
\ No newline at end of file
+        # nb_tranches_stock : via la commande fragmenter_stock (répartit le stock existant)
+        read_only_fields = ["createur", "date_creation", "date_modification", "evenement_nom", "nb_tranches_stock"]
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Offre fragmentée : stock_disponible n'est qu'un reflet, la valeur exacte est la somme des tranches
+        # (annotée par OffreViewSet.get_queryset ; calculée ici pour une instance non annotée)
+        if instance.nb_tranches_stock:
+            if hasattr(instance, "stock_tranches"):
+                data["stock_disponible"] = instance.stock_tranches or 0
+            else:
+                data["stock_disponible"] = stock_restant(instance)
+        return data
+
+    def validate_stock_disponible(self, value):
+        if self.instance is not None and self.instance.nb_tranches_stock and value != stock_restant(self.instance):
+            raise serializers.ValidationError(
+                "Stock fragmenté en tranches : le modifier avec la commande fragmenter_stock."
+            )
+        return value
@@ -0,0 +1,154 @@
+# offres/services.py
+"""
+Réservation de stock par UPDATE conditionnel (aucun verrou lu-puis-écrit) :
+
+    UPDATE offre SET stock_disponible = stock_disponible - n
+    WHERE id = ? AND statut = 'ACTIVE' AND stock_disponible >= n
+
+La base décide seule : 1 ligne modifiée = stock réservé, 0 = stock insuffisant.
+Aucun SELECT ... FOR UPDATE préalable : le verrou de ligne n'est tenu que le temps
+de l'UPDATE et du reste de la (courte) transaction appelante.
+
+Offres fragmentées (vente flash, Offre.nb_tranches_stock = N > 0) : le stock vit dans
+N lignes TrancheStock. Chaque réservation vise une tranche tirée au hasard (même UPDATE
+conditionnel), si bien que N transactions peuvent réserver en parallèle. Quand aucune
+tranche ne suffit seule alors que le total suffit, les tranches sont rééquilibrées.
+Offre.stock_disponible n'est alors plus qu'un reflet, recalculé au rééquilibrage et à chaque
+libération (jamais à la réservation, qui ne touche pas la ligne offre) : stock_restant() et
+l'API (OffreSerializer, sur un queryset annoté par avec_stock_restant()) donnent la somme
+exacte des tranches.
+"""
+import random
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Least
+
+from .models import Offre, TrancheStock
+
+
+def reserver_stock(offre, quantite):
+    """Retire `quantite` du stock disponible ; False si l'offre n'est pas ACTIVE ou si le stock ne suffit pas."""
+    if quantite <= 0:
+        raise ValueError("Quantité invalide.")
+    if offre.nb_tranches_stock:
+        return offre.statut == "ACTIVE" and _reserver_tranche(offre, quantite)
+    return bool(
+        Offre.objects.filter(pk=offre.pk, statut="ACTIVE", nb_tranches_stock=0, stock_disponible__gte=quantite)
+        .update(stock_disponible=F("stock_disponible") - quantite)
+    )
+
+
+def liberer_stock(offre_id, quantite):
+    """Rend `quantite` au stock disponible (jamais au-delà du stock total)."""
+    if quantite <= 0:
+        return
+    if Offre.objects.filter(pk=offre_id, nb_tranches_stock=0).update(
+        stock_disponible=Least(F("stock_disponible") + quantite, F("stock_total"))
+    ):
+        return
+
+    # Offre fragmentée : crédit sur une tranche au hasard, puis reflet recalculé
+    nb_tranches = Offre.objects.filter(pk=offre_id).values_list("nb_tranches_stock", flat=True).first()
+    if nb_tranches:
+        TrancheStock.objects.filter(offre_id=offre_id, numero=random.randrange(nb_tranches)).update(
+            disponible=F("disponible") + quantite
+        )
+        Offre.objects.filter(pk=offre_id).update(stock_disponible=_somme_tranches())
+
+
+def _somme_tranches():
+    """Sous-requête : somme des tranches de l'offre courante (NULL sans tranche)."""
+    return Subquery(
+        TrancheStock.objects.filter(offre_id=OuterRef("pk"))
+        .values("offre_id")
+        .annotate(total=Sum("disponible"))
+        .values("total")
+    )
+
+
+def avec_stock_restant(queryset):
+    """Annote `stock_tranches` (somme des tranches) : une seule requête pour toute une liste d'offres."""
+    return queryset.annotate(stock_tranches=_somme_tranches())
+
+
+def stock_restant(offre):
+    if not offre.nb_tranches_stock:
+        return offre.stock_disponible
+    return offre.tranches_stock.aggregate(total=Sum("disponible"))["total"] or 0
+
+
+# ---------------------------------------------------------------------------
+# Tranches de stock (vente flash)
+# ---------------------------------------------------------------------------
+
+
+def _prendre(offre_id, numero, quantite):
+    return bool(
+        TrancheStock.objects.filter(offre_id=offre_id, numero=numero, disponible__gte=quantite)
+        .update(disponible=F("disponible") - quantite)
+    )
+
+
+def _reserver_tranche(offre, quantite):
+    # 1. Une tranche au hasard : cas courant, une seule requête
+    if _prendre(offre.pk, random.randrange(offre.nb_tranches_stock), quantite):
+        return True
+
+    # 2. Tranche vide : les autres tranches suffisantes, dans un ordre aléatoire
+    candidates = list(
+        TrancheStock.objects.filter(offre_id=offre.pk, disponible__gte=quantite).values_list("numero", flat=True)
+    )
+    random.shuffle(candidates)
+    for numero in candidates:
+        if _prendre(offre.pk, numero, quantite):
+            return True
+
+    # 3. Stock dispersé : rééquilibrage sous verrou, puis prélèvement
+    return _reequilibrer(offre, preleve=quantite)
+
+
+def _repartir(total, nb_tranches):
+    base, reste = divmod(total, nb_tranches)
+    return [base + (1 if i < reste else 0) for i in range(nb_tranches)]
+
+
+@transaction.atomic
+def _reequilibrer(offre, preleve=0):
+    """
+    Verrouille toutes les tranches (ordre fixe, pas d'interblocage), retire `preleve`
+    du total et répartit le reste uniformément. False si le total ne suffit pas.
+    """
+    tranches = list(TrancheStock.objects.select_for_update().filter(offre_id=offre.pk).order_by("numero"))
+    total = sum(t.disponible for t in tranches)
+    if total < preleve or not tranches:
+        return False
+
+    for tranche, disponible in zip(tranches, _repartir(total - preleve, len(tranches))):
+        tranche.disponible = disponible
+    TrancheStock.objects.bulk_update(tranches, ["disponible"])
+    Offre.objects.filter(pk=offre.pk).update(stock_disponible=total - preleve)
+    return True
+
+
+@transaction.atomic
+def fragmenter_stock(offre_id, nb_tranches):
+    """
+    Active (nb_tranches > 0), redimensionne ou désactive (0) le mode fragmenté d'une offre.
+    Le stock courant est regroupé puis réparti ; les réservations en cours sont bloquées le temps de l'opération.
+    """
+    offre = Offre.objects.select_for_update().get(pk=offre_id)
+    verrouillees = TrancheStock.objects.select_for_update().filter(offre_id=offre.pk)
+    disponibles = list(verrouillees.values_list("disponible", flat=True))
+    total = sum(disponibles) if offre.nb_tranches_stock else offre.stock_disponible
+    verrouillees.delete()
+
+    if nb_tranches:
+        TrancheStock.objects.bulk_create(
+            TrancheStock(offre=offre, numero=i, disponible=disponible)
+            for i, disponible in enumerate(_repartir(total, nb_tranches))
+        )
+    offre.nb_tranches_stock = nb_tranches
+    offre.stock_disponible = total
+    offre.save(update_fields=["nb_tranches_stock", "stock_disponible"])
+    return offre
@@ -1,3 +1,107 @@
+from decimal import Decimal
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from users.models import Utilisateur
+from evenements.models import Evenement
+from offres.models import Offre, TrancheStock
+from offres.services import fragmenter_stock, liberer_stock, reserver_stock, stock_restant
+
+
+def creer_offre(createur, stock=10):
+    event = Evenement.objects.create(
+        nom_evenement="Finale 100m",
+        lieu="Stade de France",
+        date_evenement=timezone.localdate(),
+    )
+    return Offre.objects.create(
+        evenement=event,
+        createur=createur,
+        nom_offre="SOLO",
+        prix=Decimal("10.00"),
+        type_offre="SOLO",
+        stock_total=stock,
+        stock_disponible=stock,
+        date_debut_vente=timezone.now(),
+        date_fin_vente=timezone.now(),
+    )
+
+
+def disponibles(offre):
+    return list(TrancheStock.objects.filter(offre=offre).order_by("numero").values_list("disponible", flat=True))
+
+
+class TranchesStockTest(TestCase):
+    def setUp(self):
+        self.user = Utilisateur.objects.create_user(username="staff", email="staff@test.com", password="Test12345!")
+        self.offre = creer_offre(self.user)
+
+    def test_fragmenter_reserver_puis_regrouper(self):
+        offre = fragmenter_stock(self.offre.pk, 4)
+        self.assertEqual(disponibles(offre), [3, 3, 2, 2])
+
+        self.assertTrue(reserver_stock(offre, 1))
+        self.assertEqual(stock_restant(offre), 9)
+
+        # Retour au stock unique : le reste des tranches est regroupé sur l'offre
+        offre = fragmenter_stock(offre.pk, 0)
+        self.assertEqual(disponibles(offre), [])
+        self.assertEqual(Offre.objects.get(pk=offre.pk).stock_disponible, 9)
+        self.assertTrue(reserver_stock(offre, 9))
+        self.assertFalse(reserver_stock(offre, 1))
+
+    def test_reequilibrage_quand_aucune_tranche_ne_suffit(self):
+        offre = fragmenter_stock(self.offre.pk, 2)
+        TrancheStock.objects.filter(offre=offre).update(disponible=1)
+
+        # 2 places au total mais aucune tranche ne suffit seule : rééquilibrage, puis prélèvement
+        self.assertTrue(reserver_stock(offre, 2))
+        self.assertEqual(disponibles(offre), [0, 0])
+        self.assertEqual(Offre.objects.get(pk=offre.pk).stock_disponible, 0)
+        self.assertFalse(reserver_stock(offre, 1))
+
+    def test_liberation_recalcule_le_reflet(self):
+        offre = fragmenter_stock(self.offre.pk, 2)
+        self.assertTrue(reserver_stock(offre, 3))
+        self.assertEqual(Offre.objects.get(pk=offre.pk).stock_disponible, 10)  # reflet non tenu à la réservation
+
+        liberer_stock(offre.pk, 2)
+        self.assertEqual(stock_restant(offre), 9)
+        self.assertEqual(Offre.objects.get(pk=offre.pk).stock_disponible, 9)
+
+
+class OffreAPITest(APITestCase):
+    def setUp(self):
+        self.staff = Utilisateur.objects.create_user(
+            username="staff", email="staff@test.com", password="Test12345!", is_staff=True
+        )
+        self.client.force_authenticate(user=self.staff)
+        self.offre = fragmenter_stock(creer_offre(self.staff).pk, 2)
+        reserver_stock(self.offre, 3)
+
+    def test_stock_fragmente_expose_et_protege(self):
+        url = f"/api/offres/{self.offre.pk}/"
+        self.assertEqual(self.client.get(url).data["stock_disponible"], 7)
+
+        # Modifier le stock d'une offre fragmentée passe par fragmenter_stock, pas par l'API
+        res = self.client.patch(url, {"stock_disponible": 50}, format="json")
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(stock_restant(self.offre), 7)
+
+        res = self.client.patch(url, {"stock_disponible": 7, "nom_offre": "SOLO flash"}, format="json")
+        self.assertEqual(res.status_code, 200)
+
+    def test_liste_sans_requete_par_offre(self):
+        self.client.logout()
+        with CaptureQueriesContext(connection) as une:
+            self.client.get("/api/offres/")
+        for _ in range(3):
+            reserver_stock(fragmenter_stock(creer_offre(self.staff).pk, 4), 1)
 
-# Create your tests here.
+        with self.assertNumQueries(len(une.captured_queries)):
+            res = self.client.get("/api/offres/")
+        self.assertEqual(sorted(o["stock_disponible"] for o in res.data["results"]), [7, 9, 9, 9])
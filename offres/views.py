@@ -1,11 +1,16 @@
 from rest_framework import permissions, viewsets
 from .models import Offre
 from .serializers import OffreSerializer
+from .services import avec_stock_restant
 
 class OffreViewSet(viewsets.ModelViewSet):
     queryset = Offre.objects.all()
     serializer_class = OffreSerializer
 
+    def get_queryset(self):
+        # Stock des offres fragmentées sommé dans la requête de liste (pas une requête par offre)
+        return avec_stock_restant(super().get_queryset().select_related("evenement"))
+
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
             permission_classes = [permissions.IsAdminUser]  # ou ton SuperUserPermission
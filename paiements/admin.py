@@ -1,9 +1,11 @@
 from django.contrib import admin
+from core.pagination import PaginateurEstime
+from core.recherche import RechercheAdminMixin
 from .models import Paiement
 
 
 @admin.register(Paiement)
-class PaiementAdmin(admin.ModelAdmin):
+class PaiementAdmin(RechercheAdminMixin, admin.ModelAdmin):
     list_display = (
         "reference",
         "utilisateur",
@@ -15,6 +17,9 @@ class PaiementAdmin(admin.ModelAdmin):
         "date_confirmation",
     )
     list_filter = ("statut", "provider", "date_creation")
-    search_fields = ("reference", "commande__numero_commande", "utilisateur__email", "utilisateur__username")
-    ordering = ("-date_creation",)
+    # Référence, n° de commande, email et username : colonne dénormalisée (voir core/recherche.py)
+    search_fields = ("recherche",)
+    ordering = ("-date_creation", "-id")
+    show_full_result_count = False
+    paginator = PaginateurEstime
     readonly_fields = ("reference", "date_creation", "date_confirmation")
\ No newline at end of file
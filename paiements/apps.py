@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 class PaiementsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
-    name = "paiements"
\ No newline at end of file
+    name = "paiements"
+
+    def ready(self):
+        from . import recherche  # noqa: F401 (signaux de la colonne de recherche)
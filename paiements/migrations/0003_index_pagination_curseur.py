@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commandes', '0003_index_pagination_curseur'),
+        ('paiements', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='paiement',
+            index=models.Index(fields=['date_creation', 'id'], name='paiement_date_cr_5c5990_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paiement',
+            index=models.Index(fields=['utilisateur', 'date_creation', 'id'], name='paiement_utilisa_9a1b94_idx'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:11
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Concat, Lower
+
+from core.recherche import creer_index_recherche, supprimer_index_recherche
+
+
+def creer_index(apps, schema_editor):
+    creer_index_recherche(schema_editor, "paiement")
+
+
+def supprimer_index(apps, schema_editor):
+    supprimer_index_recherche(schema_editor, "paiement")
+
+
+def remplir(apps, schema_editor):
+    """Texte de paiements/recherche.py à la date de la migration, par tranches d'id (modèles historiques)."""
+    Paiement = apps.get_model("paiements", "Paiement")
+    Commande = apps.get_model("commandes", "Commande")
+    Utilisateur = apps.get_model(settings.AUTH_USER_MODEL)
+
+    utilisateur = Utilisateur.objects.filter(pk=OuterRef("utilisateur_id"))
+    commande = Commande.objects.filter(pk=OuterRef("commande_id"))
+    texte = Lower(
+        Concat(
+            F("reference"),
+            Value(" "),
+            Subquery(commande.values("numero_commande")[:1]),
+            Value(" "),
+            Subquery(utilisateur.values("email")[:1]),
+            Value(" "),
+            Subquery(utilisateur.values("username")[:1]),
+            output_field=TextField(),
+        )
+    )
+
+    dernier = 0
+    while True:
+        ids = list(Paiement.objects.filter(pk__gt=dernier).order_by("pk").values_list("pk", flat=True)[:10_000])
+        if not ids:
+            return
+        Paiement.objects.filter(pk__in=ids).update(recherche=texte)
+        dernier = ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('paiements', '0003_index_pagination_curseur'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paiement',
+            name='recherche',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(remplir, migrations.RunPython.noop),
+        migrations.RunPython(creer_index, supprimer_index),
+    ]
@@ -46,9 +46,17 @@ class Paiement(models.Model):
 
     raw_payload = models.JSONField(null=True, blank=True)
 
+    # Référence, n° de commande, email et username en minuscules (index de recherche, voir paiements/recherche.py)
+    recherche = models.TextField(blank=True, default="", editable=False)
+
     class Meta:
         db_table = "paiement"
         ordering = ["-date_creation"]
+        indexes = [
+            # Pagination par curseur (liste staff / liste d'un utilisateur)
+            models.Index(fields=["date_creation", "id"]),
+            models.Index(fields=["utilisateur", "date_creation", "id"]),
+        ]
 
     def __str__(self):
         return f"{self.reference} - CMD#{self.commande_id} ({self.statut})"
\ No newline at end of file
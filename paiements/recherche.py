@@ -0,0 +1,68 @@
+# paiements/recherche.py
+"""
+Colonne de recherche dénormalisée des paiements (voir core/recherche.py) :
+référence, n° de commande, email et username, en minuscules.
+"""
+from django.conf import settings
+from django.db.models import F, OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Concat, Lower
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+
+from commandes.models import Commande
+from core.recherche import normaliser
+from users.models import Utilisateur
+from .models import Paiement
+
+
+def texte_paiement(paiement):
+    utilisateur = paiement.utilisateur
+    return normaliser(
+        paiement.reference, paiement.commande.numero_commande, utilisateur.email, utilisateur.username
+    )
+
+
+def expression_paiement():
+    utilisateur = Utilisateur.objects.filter(pk=OuterRef("utilisateur_id"))
+    commande = Commande.objects.filter(pk=OuterRef("commande_id"))
+    return Lower(
+        Concat(
+            F("reference"),
+            Value(" "),
+            Subquery(commande.values("numero_commande")[:1]),
+            Value(" "),
+            Subquery(utilisateur.values("email")[:1]),
+            Value(" "),
+            Subquery(utilisateur.values("username")[:1]),
+            output_field=TextField(),
+        )
+    )
+
+
+def reindexer(queryset=None, taille_lot=10_000):
+    queryset = (queryset if queryset is not None else Paiement.objects.all()).order_by()
+    total = 0
+    dernier = 0
+    while True:
+        ids = list(queryset.filter(pk__gt=dernier).order_by("pk").values_list("pk", flat=True)[:taille_lot])
+        if not ids:
+            return total
+        total += Paiement.objects.filter(pk__in=ids).update(recherche=expression_paiement())
+        dernier = ids[-1]
+
+
+@receiver(pre_save, sender=Paiement)
+def maj_recherche_paiement(sender, instance, update_fields=None, raw=False, **kwargs):
+    # Les confirmations (update_fields statut/date/payload) ne touchent pas au texte indexé
+    if raw or update_fields is not None:
+        return
+    instance.recherche = texte_paiement(instance)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def reindexer_paiements_utilisateur(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw or created:
+        return
+    if update_fields is not None and not {"username", "email"} & set(update_fields):
+        return
+    Paiement.objects.filter(utilisateur=instance).update(recherche=expression_paiement())
@@ -6,6 +6,10 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 
+from commandes.idempotence import idempotent
+from core.pagination import PaginationCurseur
+from core.recherche import RechercheFilter
+
 from .models import Paiement
 from .serializers import PaiementSerializer, CreatePaiementSerializer, ConfirmerPaiementSerializer
 
@@ -20,12 +24,15 @@ class IsOwnerOrStaff(permissions.BasePermission):
 class PaiementViewSet(viewsets.ModelViewSet):
     serializer_class = PaiementSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrStaff]
+    pagination_class = PaginationCurseur
 
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, RechercheFilter, filters.OrderingFilter]
     filterset_fields = ["statut", "provider", "commande"]
-    search_fields = ["reference", "commande__numero_commande", "utilisateur__email", "utilisateur__username"]
+    # Référence, n° de commande, email et username (colonne dénormalisée, voir core/recherche.py)
+    search_fields = ["recherche"]
+    # Colonnes non nulles : curseur (critère, id) ; date_confirmation (nullable) : pages numérotées (core/pagination.py)
     ordering_fields = ["date_creation", "date_confirmation", "montant", "statut"]
-    ordering = ["-date_creation"]
+    ordering = ["-date_creation", "-id"]
 
     def get_queryset(self):
         user = self.request.user
@@ -55,6 +62,7 @@ class PaiementViewSet(viewsets.ModelViewSet):
         return Response(out.data, status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=["POST"], url_path="confirmer")
+    @idempotent
     def confirmer(self, request, pk=None):
         paiement = self.get_object()
 
@@ -91,8 +99,9 @@ class PaiementViewSet(viewsets.ModelViewSet):
             paiement.raw_payload = raw_payload
             paiement.save(update_fields=["statut", "date_confirmation", "raw_payload"])
 
-            from commandes.services import payer_commande_et_generer_billets
-            payer_commande_et_generer_billets(cmd, reference=ref)
+            # Billets, statistiques et notification : traités après coup par le worker outbox
+            from commandes.services import payer_commande
+            payer_commande(cmd, reference=ref)
 
         out = PaiementSerializer(Paiement.objects.get(pk=paiement.pk), context={"request": request})
         return Response(out.data, status=status.HTTP_200_OK)
\ No newline at end of file
@@ -0,0 +1,27 @@
+# paniers/management/commands/liberer_reservations.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from paniers.services import liberer_reservations_expirees
+
+
+class Command(BaseCommand):
+    help = "Rend au stock les réservations des paniers expirés (à lancer périodiquement, ex. cron toutes les minutes)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lot", type=int, default=500, help="Paniers traités par transaction.")
+        parser.add_argument(
+            "--boucle",
+            type=int,
+            default=0,
+            help="Relance le balayage toutes les N secondes (0 = un seul passage).",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            paniers, unites = liberer_reservations_expirees(taille_lot=options["lot"])
+            self.stdout.write(f"{paniers} panier(s) expiré(s), {unites} unité(s) rendue(s) au stock.")
+            if not options["boucle"]:
+                return
+            time.sleep(options["boucle"])
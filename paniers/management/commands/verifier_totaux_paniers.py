@@ -0,0 +1,43 @@
+# paniers/management/commands/verifier_totaux_paniers.py
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db.models import DecimalField, F, Sum, Value
+from django.db.models.functions import Coalesce
+
+from paniers.models import Panier
+
+
+class Command(BaseCommand):
+    help = (
+        "Contrôle (ex. chaque nuit) que montant_total de chaque panier ACTIF égale la somme de ses lignes ; "
+        "--corriger recalcule les paniers en écart."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--corriger", action="store_true", help="Recalcule les paniers en écart.")
+        parser.add_argument("--tous", action="store_true", help="Inclut les paniers non ACTIF.")
+
+    def handle(self, *args, **options):
+        paniers = Panier.objects.all() if options["tous"] else Panier.objects.filter(statut="ACTIF")
+        ecarts = (
+            paniers.annotate(
+                attendu=Coalesce(
+                    Sum("lignes__sous_total"),
+                    Value(Decimal("0.00")),
+                    output_field=DecimalField(max_digits=10, decimal_places=2),
+                )
+            )
+            .exclude(montant_total=F("attendu"))
+            .order_by("pk")
+        )
+
+        nombre = 0
+        for panier in ecarts.iterator(chunk_size=500):
+            nombre += 1
+            self.stdout.write(f"Panier {panier.pk} : {panier.montant_total} enregistré, {panier.attendu} attendu.")
+            if options["corriger"]:
+                panier.recalc_montant()
+
+        action = "corrigé(s)" if options["corriger"] else "détecté(s)"
+        self.stdout.write(f"{nombre} écart(s) {action}.")
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('paniers', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lignepanier',
+            name='quantite_reservee',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='panier',
+            index=models.Index(fields=['date_expiration'], name='panier_date_ex_47f4ce_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-18 00:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('paniers', '0003_reservation_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportPanierAnonyme',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('empreinte', models.CharField(max_length=64, unique=True)),
+                ('date_report', models.DateTimeField(auto_now_add=True)),
+                ('panier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reports_anonymes', to='paniers.panier')),
+            ],
+            options={
+                'db_table': 'panier_report_anonyme',
+            },
+        ),
+    ]
@@ -6,6 +6,17 @@ from django.db.models import Q, UniqueConstraint, CheckConstraint, Sum, F, Value
 from django.db.models.functions import Coalesce
 
 
+class PanierQuerySet(models.QuerySet):
+    def avec_lignes(self):
+        """
+        Paniers prêts à sérialiser : lignes et offres chargées en une seule requête supplémentaire
+        (2 requêtes au total quel que soit le nombre de lignes).
+        """
+        return self.prefetch_related(
+            models.Prefetch('lignes', queryset=LignePanier.objects.select_related('offre').order_by('pk'))
+        )
+
+
 class Panier(models.Model):
     STATUT_CHOICES = [
         ('ACTIF', 'Actif'),
@@ -24,17 +35,22 @@ class Panier(models.Model):
     montant_total = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
     date_expiration = models.DateTimeField(null=True, blank=True)
 
+    objects = PanierQuerySet.as_manager()
+
     class Meta:
         db_table = 'panier'
         ordering = ['-date_creation']
         indexes = [
             models.Index(fields=['utilisateur', 'statut']),
+            models.Index(fields=['date_expiration']),
         ]
 
     def recalc_montant(self):
         """
         Recalcule le montant total du panier en une seule requête.
         Utilise COALESCE pour éviter les None.
+        Le total est normalement tenu à jour par les lignes (deltas) ; ce recalcul
+        sert de filet de sécurité (commande verifier_totaux_paniers).
         """
         total = self.lignes.aggregate(
             total=Coalesce(Sum(F('prix_unitaire') * F('quantite'), output_field=DecimalField(max_digits=10, decimal_places=2)),
@@ -50,6 +66,27 @@ class Panier(models.Model):
         return f"Panier #{self.pk} - {self.utilisateur}"
 
 
+class ReportPanierAnonyme(models.Model):
+    """
+    Trace d'un panier anonyme (cookie) reporté dans un panier en base : un même cookie
+    n'est reporté qu'une fois (voir paniers/panier_anonyme.py).
+    """
+    panier = models.ForeignKey(
+        Panier,
+        on_delete=models.CASCADE,
+        related_name='reports_anonymes'
+    )
+    # sha256(utilisateur + valeur signée du cookie), unique : sérialise les reports simultanés
+    empreinte = models.CharField(max_length=64, unique=True)
+    date_report = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'panier_report_anonyme'
+
+    def __str__(self):
+        return f"Report anonyme {self.empreinte[:8]} (Panier {self.panier_id})"
+
+
 class LignePanier(models.Model):
     panier = models.ForeignKey(
         Panier,
@@ -63,6 +100,8 @@ class LignePanier(models.Model):
         blank=False
     )
     quantite = models.PositiveIntegerField(default=1)
+    # Unités retirées du stock de l'offre pour ce panier (voir paniers/services.py), rendues à l'expiration
+    quantite_reservee = models.PositiveIntegerField(default=0)
     prix_unitaire = models.DecimalField(max_digits=8, decimal_places=2, blank=True, null=True)
     sous_total = models.DecimalField(max_digits=10, decimal_places=2, editable=False, default=Decimal('0.00'))
     date_ajout = models.DateTimeField(auto_now_add=True)
@@ -82,6 +121,18 @@ class LignePanier(models.Model):
             CheckConstraint(check=Q(quantite__gt=0), name='ligne_panier_quantite_gt_0'),
         ]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Sous-total tel qu'en base : base du delta appliqué au panier au prochain save()
+        instance._sous_total_enregistre = instance.__dict__.get('sous_total')
+        return instance
+
+    def _reporter_sur_panier(self, delta):
+        """Ajoute delta au montant du panier en un seul UPDATE (pas d'agrégat, pas de relecture)."""
+        if delta:
+            Panier.objects.filter(pk=self.panier_id).update(montant_total=F('montant_total') + delta)
+
     def save(self, *args, **kwargs):
         # Définit le prix depuis l'offre si non fourni
         if self.prix_unitaire is None:
@@ -91,17 +142,25 @@ class LignePanier(models.Model):
         # Calcul du sous-total
         self.sous_total = (self.prix_unitaire * self.quantite).quantize(Decimal('0.00'))
 
+        avant = getattr(self, '_sous_total_enregistre', None)
+        nouvelle = self._state.adding
         super().save(*args, **kwargs)
 
-        # Recalcule le montant du panier (après save)
-        if self.panier_id:
+        if nouvelle:
+            self._reporter_sur_panier(self.sous_total)
+        elif avant is not None:
+            self._reporter_sur_panier(self.sous_total - avant)
+        else:
+            # Ligne chargée sans sous_total (champ différé) : recalcul complet
             self.panier.recalc_montant()
+        self._sous_total_enregistre = self.sous_total
 
     def delete(self, *args, **kwargs):
-        panier = self.panier  # garder la référence pour recalcul après suppression
-        super().delete(*args, **kwargs)
-        if panier and panier.pk:
-            panier.recalc_montant()
+        panier_id, sous_total = self.panier_id, self.sous_total
+        resultat = super().delete(*args, **kwargs)
+        if sous_total:
+            Panier.objects.filter(pk=panier_id).update(montant_total=F('montant_total') - sous_total)
+        return resultat
 
     def __str__(self):
         return f"{self.quantite} x {self.offre.nom_offre} (Panier {self.panier.pk})"
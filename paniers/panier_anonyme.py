@@ -0,0 +1,140 @@
+# paniers/panier_anonyme.py
+"""
+Panier des visiteurs non connectés, porté par un cookie signé (aucune écriture en base).
+
+- Contenu : {offre_id: quantité}, JSON compact signé et horodaté (request.get_signed_cookie) ;
+  illisible, falsifié ou trop ancien, il est simplement ignoré.
+- Pas de réservation de stock : le stock n'est vérifié qu'à titre indicatif à l'ajout.
+- Matérialisé en Panier / LignePanier (avec réservation) par materialiser_si_besoin(), appelé
+  par toute vue authentifiée qui lit ou modifie le panier (paniers publics, ajout, commande) :
+  première requête qui porte encore le cookie, c'est-à-dire juste après la connexion.
+  Un même cookie n'est reporté qu'une fois, même par des requêtes simultanées.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.signing import BadSignature
+from django.db import IntegrityError, transaction
+
+from offres.models import Offre
+from .models import ReportPanierAnonyme
+from .services import OffreNonDisponible, panier_actif, reserver_ligne
+
+COOKIE = "panier"
+SEL = "paniers.panier_anonyme"
+DUREE = timedelta(days=7)
+MAX_LIGNES = 30
+
+
+def lire(request):
+    try:
+        brut = json.loads(request.get_signed_cookie(COOKIE, salt=SEL, max_age=DUREE))
+        return {int(offre_id): int(qte) for offre_id, qte in brut.items() if int(qte) > 0}
+    except (KeyError, BadSignature, ValueError, TypeError, AttributeError):
+        return {}
+
+
+def present(request):
+    return COOKIE in request.COOKIES
+
+
+def effacer_si_present(request, response):
+    """Efface le cookie une fois le panier anonyme reporté en base."""
+    if present(request):
+        ecrire(response, {})
+    return response
+
+
+def ecrire(response, contenu):
+    if not contenu:
+        response.delete_cookie(COOKIE)
+        return
+    response.set_signed_cookie(
+        COOKIE,
+        json.dumps({str(k): v for k, v in contenu.items()}, separators=(",", ":")),
+        salt=SEL,
+        max_age=int(DUREE.total_seconds()),
+        httponly=True,
+        samesite="Lax",
+        secure=not settings.DEBUG,
+    )
+
+
+def representation(contenu):
+    """Même forme que PanierSerializer, calculée en une requête (offres du panier)."""
+    offres = Offre.objects.in_bulk(list(contenu))
+    lignes = []
+    total = Decimal("0.00")
+    for offre_id, quantite in contenu.items():
+        offre = offres.get(offre_id)
+        if offre is None:
+            continue
+        sous_total = (offre.prix * quantite).quantize(Decimal("0.00"))
+        total += sous_total
+        lignes.append(
+            {
+                "id": None,
+                "offre": offre.pk,
+                "offre_nom": offre.nom_offre,
+                "quantite": quantite,
+                "quantite_reservee": 0,
+                "prix_unitaire": f"{offre.prix:.2f}",
+                "sous_total": f"{sous_total:.2f}",
+                "date_ajout": None,
+            }
+        )
+    return {
+        "id": None,
+        "utilisateur": None,
+        "statut": "ACTIF",
+        "date_creation": None,
+        "date_expiration": None,
+        "montant_total": f"{total:.2f}",
+        "lignes": lignes,
+    }
+
+
+def materialiser(contenu, panier):
+    """
+    Reporte le panier anonyme dans le panier en base (avec réservation de stock).
+    Les lignes dont le stock n'est plus disponible sont ignorées ; retourne leurs offres.
+    """
+    offres = Offre.objects.in_bulk(list(contenu))
+    ignorees = []
+    for offre_id, quantite in sorted(contenu.items()):
+        offre = offres.get(offre_id)
+        try:
+            if offre is None:
+                raise OffreNonDisponible("Offre introuvable.")
+            reserver_ligne(panier, offre, quantite)
+        except OffreNonDisponible:
+            ignorees.append(offre_id)
+    return ignorees
+
+
+def materialiser_si_besoin(request):
+    """
+    Utilisateur connecté portant encore le cookie : le panier anonyme est reporté (avec réservation)
+    dans son panier ACTIF, qui est retourné (None s'il n'y avait rien à reporter).
+
+    Le cookie reste envoyé par le navigateur tant qu'une réponse ne l'a pas effacé : des requêtes
+    simultanées le portent toutes. Le report est donc marqué par une ligne ReportPanierAnonyme
+    (empreinte unique : utilisateur + valeur du cookie) insérée dans la même transaction ; la requête
+    concurrente bloque sur cette empreinte puis échoue (IntegrityError) et ne réserve rien.
+    """
+    contenu = lire(request)
+    if not contenu:
+        return None
+
+    empreinte = hashlib.sha256(f"{request.user.pk}:{request.COOKIES[COOKIE]}".encode("utf-8")).hexdigest()
+    try:
+        with transaction.atomic():
+            panier = panier_actif(request.user, creer=True)
+            ReportPanierAnonyme.objects.create(panier=panier, empreinte=empreinte)
+            materialiser(contenu, panier)
+    except IntegrityError:
+        return None  # déjà reporté par une autre requête
+    return panier
@@ -3,13 +3,14 @@ from rest_framework import serializers
 from .models import Panier, LignePanier
 
 class LignePanierSerializer(serializers.ModelSerializer):
+    offre_nom = serializers.CharField(source="offre.nom_offre", read_only=True)
     prix_unitaire = serializers.DecimalField(max_digits=8, decimal_places=2, read_only=True)
     sous_total = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
 
     class Meta:
         model = LignePanier
-        fields = ["id", "offre", "quantite", "prix_unitaire", "sous_total", "date_ajout"]
-        read_only_fields = ["id", "prix_unitaire", "sous_total", "date_ajout"]
+        fields = ["id", "offre", "offre_nom", "quantite", "quantite_reservee", "prix_unitaire", "sous_total", "date_ajout"]
+        read_only_fields = ["id", "offre_nom", "quantite_reservee", "prix_unitaire", "sous_total", "date_ajout"]
 
 class PanierSerializer(serializers.ModelSerializer):
     lignes = LignePanierSerializer(many=True, read_only=True)
@@ -18,4 +19,5 @@ class PanierSerializer(serializers.ModelSerializer):
     class Meta:
         model = Panier
         fields = ["id", "utilisateur", "statut", "date_creation", "date_expiration", "montant_total", "lignes"]
-        read_only_fields = ["id", "utilisateur", "date_creation", "montant_total", "lignes"]
+        # date_expiration : échéance des réservations de stock, fixée par le serveur
+        read_only_fields = ["id", "utilisateur", "date_creation", "date_expiration", "montant_total", "lignes"]
@@ -1,5 +1,14 @@
 # paniers/services.py
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
 from offres.models import Offre
+from offres.services import liberer_stock, reserver_stock, stock_restant
+from .models import LignePanier, Panier
 
 
 class OffreNonDisponible(Exception):
@@ -7,9 +16,178 @@ class OffreNonDisponible(Exception):
 
 
 def assert_offre_ajoutable(offre: Offre, qty: int):
+    """Contrôle indicatif (panier anonyme, sans réservation)."""
     if qty <= 0:
         raise OffreNonDisponible("Quantité invalide.")
-    if hasattr(offre, "est_disponible") and not offre.est_disponible:
+    if offre.statut != "ACTIVE":
         raise OffreNonDisponible("Offre indisponible.")
-    if hasattr(offre, "restant") and qty > offre.restant:
-        raise OffreNonDisponible("Stock insuffisant.")
\ No newline at end of file
+    if qty > stock_restant(offre):
+        raise OffreNonDisponible("Stock insuffisant.")
+
+
+@transaction.atomic
+def panier_actif(utilisateur, creer=False):
+    """
+    Panier ACTIF le plus récent de l'utilisateur (créé seulement si `creer`).
+    D'éventuels doublons ACTIF (données héritées) sont expirés ; leurs réservations
+    sont rendues au prochain balayage.
+    """
+    actifs = Panier.objects.filter(utilisateur=utilisateur, statut="ACTIF")
+    panier = actifs.order_by("-date_creation").first()
+    if panier is None:
+        return Panier.objects.create(utilisateur=utilisateur, statut="ACTIF") if creer else None
+    actifs.exclude(pk=panier.pk).update(statut="EXPIRE", date_expiration=timezone.now())
+    return panier
+
+
+# ---------------------------------------------------------------------------
+# Réservations de stock (holds)
+#
+# Ajouter au panier retire immédiatement le stock de l'offre (offres.services.reserver_stock)
+# et le note dans LignePanier.quantite_reservee. Panier.date_expiration porte l'échéance
+# (PANIER_RESERVATION_MINUTES, prolongée à chaque ajout) :
+# - la commande consomme d'abord ces réservations et retire les articles commandés du panier
+#   (consommer_reservations) ;
+# - passé l'échéance, liberer_reservations_expirees (commande liberer_reservations,
+#   à lancer périodiquement) rend le stock ; le panier et ses lignes sont conservés.
+# ---------------------------------------------------------------------------
+
+
+def echeance_reservation():
+    return timezone.now() + timedelta(minutes=getattr(settings, "PANIER_RESERVATION_MINUTES", 15))
+
+
+def _sans_attente(qs):
+    """Verrou de lignes ; les lignes déjà verrouillées (commande en cours) sont ignorées si possible."""
+    return qs.select_for_update(skip_locked=connection.features.has_select_for_update_skip_locked)
+
+
+@transaction.atomic
+def reserver_ligne(panier, offre, quantite):
+    """
+    Réserve `quantite` unités de l'offre pour le panier puis ajoute/incrémente la ligne.
+    Lève OffreNonDisponible si le stock ne suffit pas (rien n'est modifié).
+    """
+    if quantite <= 0:
+        raise OffreNonDisponible("Quantité invalide.")
+
+    # L'UPDATE verrouille le panier : ses ajouts sont sérialisés avec le balayage des réservations expirées
+    Panier.objects.filter(pk=panier.pk).update(date_expiration=echeance_reservation())
+
+    if not reserver_stock(offre, quantite):
+        raise OffreNonDisponible(f"Stock insuffisant pour {offre.nom_offre}.")
+
+    ligne, created = LignePanier.objects.get_or_create(
+        panier=panier,
+        offre=offre,
+        defaults={"quantite": quantite, "quantite_reservee": quantite},
+    )
+    if not created:
+        ligne.quantite += quantite
+        ligne.quantite_reservee += quantite
+        ligne.save()
+    return ligne
+
+
+@transaction.atomic
+def liberer_ligne(ligne):
+    """Rend au stock la réservation d'une ligne (avant suppression, par exemple)."""
+    reservee = (
+        LignePanier.objects.select_for_update().filter(pk=ligne.pk).values_list("quantite_reservee", flat=True).first()
+    )
+    if reservee:
+        LignePanier.objects.filter(pk=ligne.pk).update(quantite_reservee=0)
+        liberer_stock(ligne.offre_id, reservee)
+
+
+def _liberer_lignes(lignes):
+    """Rend au stock les réservations des lignes (déjà verrouillées) : un UPDATE par offre."""
+    par_offre = defaultdict(int)
+    ids = []
+    for ligne_id, offre_id, reservee in lignes.values_list("id", "offre_id", "quantite_reservee"):
+        par_offre[offre_id] += reservee
+        ids.append(ligne_id)
+    if not ids:
+        return 0
+
+    LignePanier.objects.filter(pk__in=ids).update(quantite_reservee=0)
+    for offre_id, quantite in par_offre.items():
+        liberer_stock(offre_id, quantite)
+    return sum(par_offre.values())
+
+
+@transaction.atomic
+def liberer_panier(panier):
+    """Rend toutes les réservations du panier (panier abandonné, supprimé...)."""
+    Panier.objects.filter(pk=panier.pk).update(date_expiration=None)
+    return _liberer_lignes(
+        LignePanier.objects.select_for_update().filter(panier_id=panier.pk, quantite_reservee__gt=0)
+    )
+
+
+def liberer_reservations_expirees(maintenant=None, taille_lot=500):
+    """
+    Balayage des paniers dont l'échéance est passée, par lots (une transaction par lot).
+    Les paniers verrouillés par un ajout/une commande en cours sont repris au passage suivant.
+    Retourne (paniers traités, unités rendues au stock).
+    """
+    maintenant = maintenant or timezone.now()
+    paniers_traites = unites = 0
+    dernier = 0
+    while True:
+        ids = list(
+            Panier.objects.filter(date_expiration__lt=maintenant, pk__gt=dernier)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:taille_lot]
+        )
+        if not ids:
+            return paniers_traites, unites
+        dernier = ids[-1]
+
+        with transaction.atomic():
+            verrouilles = list(
+                _sans_attente(Panier.objects.filter(pk__in=ids, date_expiration__lt=maintenant))
+                .values_list("pk", flat=True)
+            )
+            if not verrouilles:
+                continue
+            unites += _liberer_lignes(
+                LignePanier.objects.select_for_update().filter(panier_id__in=verrouilles, quantite_reservee__gt=0)
+            )
+            Panier.objects.filter(pk__in=verrouilles).update(date_expiration=None)
+            paniers_traites += len(verrouilles)
+
+
+def consommer_reservations(utilisateur, quantites):
+    """
+    Au passage en commande : utilise d'abord le stock déjà réservé dans le panier ACTIF, et retire
+    du panier ce qui est commandé (ligne supprimée si entièrement commandée, réduite sinon).
+    quantites = {offre_id: quantité commandée} ; retourne {offre_id: quantité prise sur les réservations}.
+    À appeler dans la transaction de la commande : un échec de la commande rétablit le panier.
+    Lignes verrouillées par offre croissante, comme les offres ensuite (pas d'interblocage).
+    """
+    lignes = (
+        LignePanier.objects.select_for_update()
+        .filter(panier__utilisateur=utilisateur, panier__statut="ACTIF", offre_id__in=list(quantites))
+        .order_by("offre_id", "pk")
+    )
+
+    pris = defaultdict(int)
+    retires = defaultdict(int)
+    for ligne in lignes:
+        q = min(quantites[ligne.offre_id] - retires[ligne.offre_id], ligne.quantite)
+        if q <= 0:
+            continue
+        n = min(q, ligne.quantite_reservee)
+        pris[ligne.offre_id] += n
+        retires[ligne.offre_id] += q
+        if q == ligne.quantite:
+            # Réservation au-delà de la quantité (quantité modifiée à la baisse) : rendue avec la ligne
+            if ligne.quantite_reservee > n:
+                liberer_stock(ligne.offre_id, ligne.quantite_reservee - n)
+            ligne.delete()
+        else:
+            ligne.quantite -= q
+            ligne.quantite_reservee -= n
+            ligne.save()
+    return {offre_id: n for offre_id, n in pris.items() if n}
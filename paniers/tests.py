@@ -1,3 +1,252 @@
-from django.test import TestCase
+import threading
+import unittest
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient, APITestCase
+
+from users.models import Utilisateur
+from evenements.models import Evenement
+from offres.models import Offre
+from commandes.models import CleIdempotence
+from paniers.models import LignePanier, Panier, ReportPanierAnonyme
+from paniers.services import liberer_reservations_expirees
+
+
+class ReservationStockAPITest(APITestCase):
+    def setUp(self):
+        self.user = Utilisateur.objects.create_user(username="client", email="client@test.com", password="Test12345!")
+        self.client.force_authenticate(user=self.user)
+
+        self.event = Evenement.objects.create(
+            nom_evenement="Finale 100m",
+            lieu="Stade de France",
+            date_evenement=timezone.localdate(),
+        )
+
+        self.offre = Offre.objects.create(
+            evenement=self.event,
+            createur=self.user,
+            nom_offre="SOLO",
+            prix=Decimal("10.00"),
+            nb_personnes=1,
+            type_offre="SOLO",
+            stock_total=5,
+            stock_disponible=5,
+            date_debut_vente=timezone.now(),
+            date_fin_vente=timezone.now(),
+        )
+
+    def test_ajout_reserve_puis_expiration_rend_le_stock(self):
+        res = self.client.post("/api/paniers/add/", {"offre": self.offre.id, "quantite": 4}, format="json")
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(res.data["quantite_reservee"], 4)
+
+        # Pas de survente : le stock restant est déjà réservé
+        res = self.client.post("/api/paniers/add/", {"offre": self.offre.id, "quantite": 2}, format="json")
+        self.assertEqual(res.status_code, 400)
+
+        self.offre.refresh_from_db()
+        self.assertEqual(self.offre.stock_disponible, 1)
+
+        Panier.objects.update(date_expiration=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(liberer_reservations_expirees(), (1, 4))
+
+        self.offre.refresh_from_db()
+        self.assertEqual(self.offre.stock_disponible, 5)
+
+    def test_lecture_panier_en_deux_requetes(self):
+        panier = Panier.objects.create(utilisateur=self.user)
+        for i in range(5):
+            offre = Offre.objects.create(
+                evenement=self.event,
+                createur=self.user,
+                nom_offre=f"OFFRE {i}",
+                prix=Decimal("10.00"),
+                type_offre="SOLO",
+                stock_total=5,
+                stock_disponible=5,
+                date_debut_vente=timezone.now(),
+                date_fin_vente=timezone.now(),
+            )
+            LignePanier.objects.create(panier=panier, offre=offre, quantite=1)
+
+        # Panier + lignes (offres jointes), quel que soit le nombre de lignes
+        with self.assertNumQueries(2):
+            res = self.client.get(f"/api/paniers/{panier.id}/")
+        self.assertEqual(len(res.data["lignes"]), 5)
+        self.assertEqual(res.data["lignes"][0]["offre_nom"], "OFFRE 0")
+        self.assertEqual(res.data["montant_total"], "50.00")
+
+    def test_montant_suivi_a_la_modification_et_a_la_suppression(self):
+        panier = Panier.objects.create(utilisateur=self.user)
+        ligne = LignePanier.objects.create(panier=panier, offre=self.offre, quantite=2)
+        panier.refresh_from_db()
+        self.assertEqual(panier.montant_total, Decimal("20.00"))
+
+        # Modification : UPDATE de la ligne + delta reporté sur le panier, sans agrégat
+        ligne = LignePanier.objects.get(pk=ligne.pk)
+        ligne.quantite = 3
+        with self.assertNumQueries(2):
+            ligne.save()
+        panier.refresh_from_db()
+        self.assertEqual(panier.montant_total, Decimal("30.00"))
+
+        res = self.client.delete(f"/api/paniers/{panier.id}/supprimer-ligne/{ligne.id}/")
+        self.assertEqual(res.status_code, 200)
+        panier.refresh_from_db()
+        self.assertEqual(panier.montant_total, Decimal("0.00"))
+
+    def test_verifier_totaux_paniers(self):
+        panier = Panier.objects.create(utilisateur=self.user)
+        LignePanier.objects.create(panier=panier, offre=self.offre, quantite=2)
+        Panier.objects.filter(pk=panier.pk).update(montant_total=Decimal("99.00"))
+
+        sortie = StringIO()
+        call_command("verifier_totaux_paniers", stdout=sortie)
+        self.assertIn("1 écart(s) détecté(s)", sortie.getvalue())
+        panier.refresh_from_db()
+        self.assertEqual(panier.montant_total, Decimal("99.00"))
+
+        call_command("verifier_totaux_paniers", "--corriger", stdout=StringIO())
+        panier.refresh_from_db()
+        self.assertEqual(panier.montant_total, Decimal("20.00"))
+
+        sortie = StringIO()
+        call_command("verifier_totaux_paniers", stdout=sortie)
+        self.assertIn("0 écart(s) détecté(s)", sortie.getvalue())
+
+    def test_panier_anonyme_puis_connexion(self):
+        self.client.force_authenticate(user=None)
+
+        res = self.client.post("/api/paniers/public/add/", {"offer_id": self.offre.id, "qty": 2}, format="json")
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(res.data["montant_total"], "20.00")
+        res = self.client.get("/api/paniers/public/")
+        self.assertEqual(res.data["lignes"][0]["quantite"], 2)
+
+        # Visiteur : rien en base, aucun stock retenu
+        self.assertFalse(Panier.objects.exists())
+        self.offre.refresh_from_db()
+        self.assertEqual(self.offre.stock_disponible, 5)
+
+        # Connexion : le panier du cookie devient un panier réservé, le cookie est effacé
+        self.client.force_authenticate(user=self.user)
+        res = self.client.get("/api/paniers/public/")
+        self.assertEqual(res.data["lignes"][0]["quantite_reservee"], 2)
+        self.assertEqual(res.cookies["panier"].value, "")
+        self.offre.refresh_from_db()
+        self.assertEqual(self.offre.stock_disponible, 3)
+
+    def test_cookie_reporte_une_seule_fois(self):
+        self.client.force_authenticate(user=None)
+        self.client.post("/api/paniers/public/add/", {"offer_id": self.offre.id, "qty": 2}, format="json")
+        cookie = self.client.cookies["panier"].value
+
+        # Ajout connecté : le panier du cookie est reporté avant l'ajout
+        self.client.force_authenticate(user=self.user)
+        res = self.client.post("/api/paniers/add/", {"offre": self.offre.id, "quantite": 1}, format="json")
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(res.data["quantite_reservee"], 3)
+        self.assertEqual(res.cookies["panier"].value, "")
+
+        # Requête partie avant l'effacement du cookie : rien n'est réservé une seconde fois
+        self.client.cookies["panier"] = cookie
+        res = self.client.post("/api/commandes/", {"items": [{"offre": self.offre.id, "quantite": 3}]}, format="json")
+        self.assertEqual(res.status_code, 201)
+        self.offre.refresh_from_db()
+        self.assertEqual(self.offre.stock_disponible, 2)
+        self.assertFalse(LignePanier.objects.exists())
+
+    def test_commande_retire_les_articles_du_panier(self):
+        self.client.post("/api/paniers/add/", {"offre": self.offre.id, "quantite": 3}, format="json")
+        panier = Panier.objects.get()
+
+        # Échec de la commande (offre inconnue) : panier et réservations intacts
+        res = self.client.post(
+            "/api/commandes/", {"items": [{"offre": self.offre.id, "quantite": 2}, {"offre": 999, "quantite": 1}]},
+            format="json",
+        )
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(LignePanier.objects.get().quantite_reservee, 3)
+
+        res = self.client.post("/api/commandes/", {"items": [{"offre": self.offre.id, "quantite": 2}]}, format="json")
+        self.assertEqual(res.status_code, 201)
+        ligne = LignePanier.objects.get()
+        self.assertEqual((ligne.quantite, ligne.quantite_reservee), (1, 1))
+        panier.refresh_from_db()
+        self.assertEqual(panier.montant_total, Decimal("10.00"))
+
+        # Quantité ramenée sous la réservation, puis tout commandé : ligne supprimée, surplus rendu
+        LignePanier.objects.filter(pk=ligne.pk).update(quantite_reservee=2)
+        Offre.objects.filter(pk=self.offre.pk).update(stock_disponible=1)
+        res = self.client.post("/api/commandes/", {"items": [{"offre": self.offre.id, "quantite": 1}]}, format="json")
+        self.assertEqual(res.status_code, 201)
+        self.assertFalse(LignePanier.objects.exists())
+        self.offre.refresh_from_db()
+        self.assertEqual(self.offre.stock_disponible, 2)
+        panier.refresh_from_db()
+        self.assertEqual(panier.montant_total, Decimal("0.00"))
+
+    def test_cookie_efface_sur_reponse_rejouee_et_report_hors_idempotence(self):
+        self.client.force_authenticate(user=None)
+        self.client.post("/api/paniers/public/add/", {"offer_id": self.offre.id, "qty": 2}, format="json")
+        cookie = self.client.cookies["panier"].value
+
+        self.client.force_authenticate(user=self.user)
+        corps = {"items": [{"offre": self.offre.id, "quantite": 2}]}
+        res = self.client.post("/api/commandes/", corps, format="json", HTTP_IDEMPOTENCY_KEY="cmd-1")
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(ReportPanierAnonyme.objects.count(), 1)
+
+        # Retry dont la réponse initiale (et son effacement du cookie) s'est perdue
+        self.client.cookies["panier"] = cookie
+        res = self.client.post("/api/commandes/", corps, format="json", HTTP_IDEMPOTENCY_KEY="cmd-1")
+        self.assertEqual(res["Idempotency-Replayed"], "true")
+        self.assertEqual(res.cookies["panier"].value, "")
+
+        # La purge des clés d'idempotence ne rouvre pas le report du cookie
+        CleIdempotence.objects.update(date_expiration=timezone.now() - timedelta(seconds=1))
+        call_command("purger_idempotence", stdout=StringIO())
+        self.client.cookies["panier"] = cookie
+        self.client.get("/api/paniers/public/")
+        self.offre.refresh_from_db()
+        self.assertEqual(self.offre.stock_disponible, 3)
+
+
+@unittest.skipUnless(connection.features.has_select_for_update, "Verrous de lignes requis (PostgreSQL, MySQL).")
+class PanierAnonymeConcurrentTest(TransactionTestCase):
+    def test_requetes_simultanees_avec_le_meme_cookie(self):
+        user = Utilisateur.objects.create_user(username="client", email="client@test.com", password="Test12345!")
+        event = Evenement.objects.create(nom_evenement="Finale", lieu="Stade", date_evenement=timezone.localdate())
+        offre = Offre.objects.create(
+            evenement=event, createur=user, nom_offre="SOLO", prix=Decimal("10.00"), type_offre="SOLO",
+            stock_total=10, stock_disponible=10, date_debut_vente=timezone.now(), date_fin_vente=timezone.now(),
+        )
+        anonyme = APIClient()
+        anonyme.post("/api/paniers/public/add/", {"offer_id": offre.id, "qty": 2}, format="json")
+        cookie = anonyme.cookies["panier"].value
+
+        def lire_panier():
+            client = APIClient()
+            client.force_authenticate(user=user)
+            client.cookies["panier"] = cookie
+            try:
+                client.get("/api/paniers/public/")
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=lire_panier) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        offre.refresh_from_db()
+        self.assertEqual(offre.stock_disponible, 8)
+        self.assertEqual(LignePanier.objects.get(panier__utilisateur=user).quantite_reservee, 2)
@@ -1,8 +1,14 @@
 # paniers/urls.py
+from django.urls import path
 from rest_framework.routers import DefaultRouter
 from .views import PanierViewSet
+from .views_public import PublicPanierAddItemView, PublicPanierView
 
 router = DefaultRouter()
 router.register(r'', PanierViewSet, basename='paniers')  # <-- vide ici
 
-urlpatterns = router.urls
+# Avant le routeur : "public/" serait sinon pris pour un identifiant de panier
+urlpatterns = [
+    path("public/", PublicPanierView.as_view(), name="panier-public"),
+    path("public/add/", PublicPanierAddItemView.as_view(), name="panier-public-add"),
+] + router.urls
@@ -3,8 +3,10 @@ from django.db import transaction
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from . import panier_anonyme
 from .models import Panier, LignePanier
 from .serializers import PanierSerializer, LignePanierSerializer
+from .services import OffreNonDisponible, liberer_ligne, liberer_panier, panier_actif, reserver_ligne
 from users.permissions import IsOwnerOrReadOnly  #  Permission personnalisée
 
 
@@ -12,7 +14,7 @@ class PanierViewSet(viewsets.ModelViewSet):
     """
     ViewSet pour la gestion des paniers utilisateurs.
     - Chaque utilisateur ne peut accéder qu’à ses propres paniers.
-    - Vérifie le stock disponible avant tout ajout.
+    - Réserve le stock à l'ajout (UPDATE conditionnel, sans verrou lu-puis-écrit).
     - Un seul panier ACTIF par utilisateur (les doublons sont expirés).
     - Autorise seulement le propriétaire à modifier ou supprimer.
     """
@@ -26,9 +28,10 @@ class PanierViewSet(viewsets.ModelViewSet):
         Les administrateurs peuvent tout voir.
         """
         user = self.request.user
+        qs = Panier.objects.avec_lignes()
         if user.is_staff:
-            return Panier.objects.all()
-        return Panier.objects.filter(utilisateur=user)
+            return qs
+        return qs.filter(utilisateur=user)
 
     def perform_create(self, serializer):
         """
@@ -36,42 +39,33 @@ class PanierViewSet(viewsets.ModelViewSet):
         """
         serializer.save(utilisateur=self.request.user)
 
+    def perform_update(self, serializer):
+        """
+        Un panier qui quitte le statut ACTIF rend immédiatement son stock réservé.
+        """
+        panier = serializer.save()
+        if panier.statut != 'ACTIF':
+            liberer_panier(panier)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            liberer_panier(instance)
+            instance.delete()
+
     @action(detail=False, methods=['post'], url_path='add')
     def ajouter_au_panier(self, request):
         """
         Ajouter une offre au panier ACTIF de l'utilisateur.
         - Crée un panier ACTIF s'il n'en existe pas.
         - Si plusieurs paniers ACTIF existent (données héritées), garde le plus récent et expire les autres.
-        - Vérifie le stock avant ajout ou incrément.
+        - Réserve le stock à l'ajout (rendu à l'expiration du panier, voir paniers/services.py).
+        - Un panier anonyme (cookie) encore présent y est d'abord reporté.
         """
         user = request.user
         data = request.data
 
-        # Sécurise la sélection/création du panier actif
-        with transaction.atomic():
-            # Récupère le plus récent panier ACTIF
-            panier = (
-                Panier.objects
-                .filter(utilisateur=user, statut='ACTIF')
-                .order_by('-date_creation')
-                .first()
-            )
-
-            # S'il n'y en a pas, on en crée un
-            if not panier:
-                panier = Panier.objects.create(utilisateur=user, statut='ACTIF')
-            else:
-                # Expire d'éventuels doublons ACTIF
-                (
-                    Panier.objects
-                    .filter(utilisateur=user, statut='ACTIF')
-                    .exclude(pk=panier.pk)
-                    .update(statut='EXPIRE')
-                )
-
-            # Si le panier récupéré a été validé entre-temps, on en crée un nouveau propre
-            if panier.statut != 'ACTIF':
-                panier = Panier.objects.create(utilisateur=user, statut='ACTIF')
+        # Panier ACTIF le plus récent (créé au besoin, doublons expirés)
+        panier = panier_anonyme.materialiser_si_besoin(request) or panier_actif(user, creer=True)
 
         # Valide et extrait l'offre/quantité
         serializer = LignePanierSerializer(data=data)
@@ -81,49 +75,28 @@ class PanierViewSet(viewsets.ModelViewSet):
         offre = serializer.validated_data['offre']
         quantite = serializer.validated_data['quantite']
 
-        # Vérification du stock disponible
-        if offre.stock_disponible < quantite:
-            return Response(
-                {"detail": f"Stock insuffisant pour {offre.nom_offre} (disponible : {offre.stock_disponible})."},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        # Ajout ou incrément de la ligne panier
-        ligne, created = LignePanier.objects.get_or_create(
-            panier=panier,
-            offre=offre,
-            defaults={'quantite': quantite}
-        )
-
-        if not created:
-            nouvelle_quantite = ligne.quantite + quantite
-
-            if offre.stock_disponible < nouvelle_quantite:
-                return Response(
-                    {"detail": f"Stock insuffisant pour augmenter la quantité (max : {offre.stock_disponible})."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            ligne.quantite = nouvelle_quantite
-            ligne.save()
-
-        panier.recalc_montant()
+        # Réservation atomique du stock (UPDATE conditionnel) puis ajout/incrément de la ligne
+        try:
+            ligne = reserver_ligne(panier, offre, quantite)
+        except OffreNonDisponible as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response(
-            LignePanierSerializer(ligne).data,
-            status=status.HTTP_201_CREATED
+        return panier_anonyme.effacer_si_present(
+            request,
+            Response(LignePanierSerializer(ligne).data, status=status.HTTP_201_CREATED),
         )
 
     @action(detail=True, methods=['delete'], url_path='supprimer-ligne/(?P<ligne_id>[^/.]+)')
     def supprimer_ligne(self, request, pk=None, ligne_id=None):
         """
-        Supprime une ligne spécifique du panier et recalcule le montant.
+        Supprime une ligne spécifique du panier (le montant est décrémenté du sous-total de la ligne).
         """
         panier = self.get_object()
         try:
             ligne = panier.lignes.get(pk=ligne_id)
-            ligne.delete()
-            panier.recalc_montant()
+            with transaction.atomic():
+                liberer_ligne(ligne)
+                ligne.delete()
             return Response({"detail": "Produit supprimé du panier"}, status=status.HTTP_200_OK)
         except LignePanier.DoesNotExist:
             return Response({"detail": "Ligne introuvable"}, status=status.HTTP_404_NOT_FOUND)
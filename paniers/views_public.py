@@ -5,81 +5,87 @@ from rest_framework.permissions import AllowAny
 from rest_framework import status
 
 from django.shortcuts import get_object_or_404
-from django.db import transaction
 
 from offres.models import Offre
-from .models import Panier, LignePanier
+from . import panier_anonyme
+from .models import Panier
 from .serializers import PanierSerializer
-from .services import assert_offre_ajoutable, OffreNonDisponible
+from .services import assert_offre_ajoutable, panier_actif, reserver_ligne, OffreNonDisponible
 
 
-def get_or_create_panier(request) -> Panier:
-    # Auth user -> panier user (un panier ACTIF)
+def reponse_panier(request, panier, status_code=status.HTTP_200_OK):
+    """
+    Réponse au format PanierSerializer :
+    - utilisateur connecté : panier en base (2 requêtes), le cookie anonyme éventuel est effacé ;
+    - visiteur : panier du cookie, sans écriture.
+    """
     if request.user and request.user.is_authenticated:
-        panier, _ = Panier.objects.get_or_create(
-            utilisateur=request.user,
-            statut="ACTIF",
-            defaults={"session_key": None},
-        )
-        return panier
-
-    # Visiteur -> panier session
-    if not request.session.session_key:
-        request.session.save()
+        if panier is None:
+            data = panier_anonyme.representation({})
+        else:
+            data = PanierSerializer(Panier.objects.avec_lignes().get(pk=panier.pk)).data
+        return panier_anonyme.effacer_si_present(request, Response(data, status=status_code))
 
-    panier, _ = Panier.objects.get_or_create(
-        utilisateur=None,
-        session_key=request.session.session_key,
-        statut="ACTIF",
-    )
-    return panier
+    contenu = panier_anonyme.lire(request)
+    response = Response(panier_anonyme.representation(contenu), status=status_code)
+    panier_anonyme.ecrire(response, contenu)
+    return response
 
 
 class PublicPanierView(APIView):
+    """
+    GET /api/paniers/public/
+    Visiteur : panier lu depuis le cookie signé, aucune ligne créée en base.
+    Utilisateur connecté : panier ACTIF (le panier anonyme éventuel y est d'abord reporté).
+    """
     permission_classes = [AllowAny]
 
     def get(self, request):
-        panier = get_or_create_panier(request)
-        return Response(PanierSerializer(panier).data)
+        if not request.user.is_authenticated:
+            return reponse_panier(request, None)
+
+        panier = panier_anonyme.materialiser_si_besoin(request) or panier_actif(request.user)
+        return reponse_panier(request, panier)
 
 
 class PublicPanierAddItemView(APIView):
+    """
+    POST /api/paniers/public/add/  {"offer_id": <id>, "qty": <n>}
+    """
     permission_classes = [AllowAny]
 
-    @transaction.atomic
     def post(self, request):
         offer_id = request.data.get("offer_id")
-        qty = int(request.data.get("qty", 1))
+        try:
+            qty = int(request.data.get("qty", 1))
+        except (TypeError, ValueError):
+            return Response({"detail": "qty doit être un entier."}, status=status.HTTP_400_BAD_REQUEST)
 
         if not offer_id:
             return Response({"detail": "offer_id requis."}, status=status.HTTP_400_BAD_REQUEST)
+        if qty <= 0:
+            return Response({"detail": "Quantité invalide."}, status=status.HTTP_400_BAD_REQUEST)
 
-        offre = get_object_or_404(Offre.objects.select_related("evenement"), pk=offer_id)
-
-        try:
-            assert_offre_ajoutable(offre, qty)
-        except OffreNonDisponible as e:
-            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
-
-        panier = get_or_create_panier(request)
+        offre = get_object_or_404(Offre, pk=offer_id)
 
-        ligne, created = LignePanier.objects.get_or_create(
-            panier=panier,
-            offre=offre,
-            defaults={"quantite": qty},
-        )
-
-        if not created:
-            new_qty = ligne.quantite + qty
+        if request.user.is_authenticated:
+            panier = panier_anonyme.materialiser_si_besoin(request) or panier_actif(request.user, creer=True)
             try:
-                assert_offre_ajoutable(offre, new_qty)
+                reserver_ligne(panier, offre, qty)
             except OffreNonDisponible as e:
                 return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            return reponse_panier(request, panier, status.HTTP_201_CREATED)
 
-            ligne.quantite = new_qty
-            ligne.save()
-        else:
-            ligne.save()  # calc prix_unitaire + sous_total + recalcul panier
+        contenu = panier_anonyme.lire(request)
+        nouvelle_qty = contenu.get(offre.pk, 0) + qty
+        try:
+            assert_offre_ajoutable(offre, nouvelle_qty)
+        except OffreNonDisponible as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if offre.pk not in contenu and len(contenu) >= panier_anonyme.MAX_LIGNES:
+            return Response({"detail": "Panier plein."}, status=status.HTTP_400_BAD_REQUEST)
 
-        panier.refresh_from_db()
-        return Response(PanierSerializer(panier).data, status=status.HTTP_201_CREATED)
\ No newline at end of file
+        contenu[offre.pk] = nouvelle_qty
+        response = Response(panier_anonyme.representation(contenu), status=status.HTTP_201_CREATED)
+        panier_anonyme.ecrire(response, contenu)
+        return response